@@ -0,0 +1,276 @@
+# -*- coding:utf-8 -*-
+'''
+Benchmarks of the hot paths of IBClient, run offline against the local TWS stand-in (tests/tws_server.py).
+
+    python bench/bench_client.py                          # run and print the results
+    python bench/bench_client.py --save bench/baseline.json
+    python bench/bench_client.py --compare bench/baseline.json --tolerance 0.25
+
+Three groups are measured:
+    callbacks:  messages per second through the IBMsgWrapper callbacks, called directly on one thread
+    latency:    end-to-end latency of blocking IBClient calls against the stand-in server, in ms
+    dataframe:  time to build the DataFrame of large history pulls, in ms
+
+--compare exits with status 1 if any result is worse than the baseline by more than the tolerance.
+Results depend on the machine; save a baseline on the machine which runs the comparison.
+
+Created on 10/2026
+'''
+import sys
+import os
+import gc
+import json
+import time
+import argparse
+import platform
+import contextlib
+from os import path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+from ibclient import IBClient, LimitOrder, new_stock_contract
+from ibclient.utils import RequestDetails, ResponseDetails, BarBuffer
+from tests.tws_server import TWSServer
+
+
+@contextlib.contextmanager
+def quiet():
+    ''' Silence the prints of the callbacks; they are still paid for '''
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+
+def best_rate(func, count, repeat):
+    ''' Return the best messages per second of func(count) over repeat runs '''
+    best = 0.
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(count)
+        best = max(best, count / (time.perf_counter() - start))
+    return best
+
+
+def latency_stats(func, count):
+    ''' Call func() count times and return p50/p99/mean latency in ms '''
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.)
+    return {'p50': float(np.percentile(samples, 50)), 'p99': float(np.percentile(samples, 99)),
+            'mean': float(np.mean(samples)), 'count': count}
+
+
+def best_time(func, repeat):
+    ''' Return the best time of func() over repeat runs in ms '''
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000.
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Benchmarks(object):
+
+    def __init__(self, client, server, quick=False):
+        self.client = client
+        self.server = server
+        self.wrapper = client.wrapper
+        self.count = 20000 if quick else 200000
+        self.repeat = 3
+        self.samples = 10 if quick else 50
+
+    #
+    # callbacks
+    #
+    def bench_callbacks(self):
+        results = {}
+        client, wrapper = self.client, self.wrapper
+
+        req_id, _ = client.request_tick_data(new_stock_contract('IBM'))
+
+        def tick_price(n):
+            for i in range(n):
+                wrapper.tickPrice(req_id, 4, 100. + (i & 63) * 0.01, 1)
+
+        def tick_size(n):
+            for i in range(n):
+                wrapper.tickSize(req_id, 5, 100 + (i & 63))
+        results['tickPrice'] = best_rate(tick_price, self.count, self.repeat)
+        results['tickSize'] = best_rate(tick_size, self.count, self.repeat)
+        client.cancel_tick_request(req_id)
+
+        depth_id, _ = client.request_market_depth('IBM', 10)
+
+        def update_mkt_depth(n):
+            for i in range(n):
+                wrapper.updateMktDepth(depth_id, i % 10, 1, i & 1, 100. + (i % 10) * 0.01, 100 * (i & 63))
+        with quiet():
+            results['updateMktDepth'] = best_rate(update_mkt_depth, self.count, self.repeat)
+        client.cancel_market_depth(depth_id)
+
+        start = 1760000000
+
+        def historical_data(n):
+            hist_id = 10 ** 6
+            client.ipc_msg_dict.register(hist_id, RequestDetails('reqHistoricalData', '', None), ResponseDetails())
+            for i in range(n):
+                wrapper.historicalData(hist_id, str(start + 60 * i), 10., 11., 9., 10.5, 1000, 10, 10.2, False)
+            wrapper.historicalData(hist_id, 'finished', -1, -1, -1, -1, -1, -1, -1, False)
+        results['historicalData'] = best_rate(historical_data, self.count, self.repeat)
+
+        bar_id, _ = client.request_realtime_price(new_stock_contract('IBM'), bar_sizes=['1 min', '5 mins'])
+
+        def realtime_bar(n):
+            for i in range(n):
+                wrapper.realtimeBar(bar_id, start + 5 * i, 10., 11., 9., 10.5, 1000, 10.2, 10)
+        results['realtimeBar'] = best_rate(realtime_bar, self.count, self.repeat)
+        client.cancel_realtime_price(bar_id)
+
+        client_id = client.client_id
+
+        def order_status(n):
+            for i in range(n):
+                order_id = 10 ** 6 + (i & 1023)
+                wrapper.orderStatus(order_id, 'Submitted', 0, 100, 0., order_id, 0, 0., client_id, None)
+        results['orderStatus'] = best_rate(order_status, self.count, self.repeat)
+
+        return dict((name, {'value': value, 'unit': 'msg/s', 'higher_is_better': True})
+                    for name, value in results.items())
+
+    #
+    # end-to-end latency
+    #
+    def bench_latency(self):
+        results = {}
+        client = self.client
+        stock = new_stock_contract('IBM')
+
+        results['get_tick_snapshot'] = latency_stats(lambda: client.get_tick_snapshot(stock), self.samples)
+        universe = [new_stock_contract('S%03d' % i) for i in range(50)]
+        results['get_tick_snapshots(50 symbols)'] = latency_stats(lambda: client.get_tick_snapshots(universe),
+                                                                  self.samples)
+        results['get_price_history(1 Y daily)'] = latency_stats(
+            lambda: client.get_price_history(stock, '20261016 00:00:00', '1 Y', 'daily'), self.samples)
+        results['get_price_history(1 D minute)'] = latency_stats(
+            lambda: client.get_price_history(stock, '20261016 00:00:00', '1 D', 'minute'), self.samples)
+        results['order_amount'] = latency_stats(
+            lambda: client.order_amount(stock, 100, style=LimitOrder(100.)), self.samples)
+        basket = [(new_stock_contract('S%03d' % i), 100, LimitOrder(100.)) for i in range(50)]
+        results['order_basket(50 orders)'] = latency_stats(lambda: client.order_basket(basket), self.samples)
+
+        out = {}
+        for name, stats in results.items():
+            for key in ('p50', 'p99'):
+                out['%s.%s' % (name, key)] = {'value': stats[key], 'unit': 'ms', 'higher_is_better': False}
+        return out
+
+    #
+    # DataFrame build
+    #
+    def bench_dataframe(self):
+        results = {}
+        client = self.client
+        rng = np.random.default_rng(0)
+
+        def make_buffer(n, start=1760000000 * 10 ** 9):
+            buf = BarBuffer()
+            close = 100. + np.cumsum(rng.normal(0, 0.1, n))
+            for i in range(n):
+                c = close[i]
+                buf.append(start + i * 60 * 10 ** 9, c, c + 0.05, c - 0.05, c, 100.)
+            return buf
+
+        single = make_buffer(10 ** 5 if self.count < 200000 else 10 ** 6)
+        results['frame(1 symbol, %d bars)' % len(single)] = best_time(
+            lambda: client._build_price_frame(None, [single], tz_name='US/Eastern'), self.repeat)
+
+        symbols = ['S%03d' % i for i in range(500)]
+        hists = [make_buffer(2000) for _ in symbols]
+        results['frame(500 symbols x 2000 bars)'] = best_time(
+            lambda: client._build_price_frame(symbols, hists), self.repeat)
+        results['frame(500 symbols x 2000 bars, categorical, multi_index)'] = best_time(
+            lambda: client._build_price_frame(symbols, hists, categorical_symbol=True, multi_index=True),
+            self.repeat)
+
+        return dict((name, {'value': value, 'unit': 'ms', 'higher_is_better': False})
+                    for name, value in results.items())
+
+
+def compare(results, baseline, tolerance):
+    ''' Print results next to the baseline and return the names which regressed by more than tolerance '''
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print('%-60s %12.2f %-6s (new)' % (name, result['value'], result['unit']))
+            continue
+        ratio = result['value'] / base['value'] if base['value'] else float('inf')
+        worse = ratio < 1. - tolerance if result['higher_is_better'] else ratio > 1. + tolerance
+        print('%-60s %12.2f %-6s baseline %12.2f  x%.2f%s' % (name, result['value'], result['unit'],
+                                                             base['value'], ratio, '  REGRESSION' if worse else ''))
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of IBClient offline')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, e.g. for CI')
+    parser.add_argument('--save', metavar='FILE', help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with a JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--latency', type=float, default=0., help='reply latency of the stand-in server in seconds')
+    args = parser.parse_args(argv)
+
+    server = TWSServer(latency=args.latency, tick_count=0, depth_count=0, bar_count=0, fill_delay=None)
+    server.start()
+    with quiet():
+        client = IBClient(port=server.port, client_id=1, server_timezone='UTC')
+        client.connect()
+    try:
+        bench = Benchmarks(client, server, quick=args.quick)
+        results = {}
+        for group in ('callbacks', 'latency', 'dataframe'):
+            with quiet():
+                group_results = getattr(bench, 'bench_' + group)()
+            results.update(('%s.%s' % (group, name), result) for name, result in group_results.items())
+    finally:
+        client.disconnect()
+        server.stop()
+
+    report = {'meta': {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                       'quick': args.quick, 'latency': args.latency},
+              'results': results}
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+    else:
+        compare(results, {}, args.tolerance)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if regressions:
+        print('%d regression(s): %s' % (len(regressions), ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
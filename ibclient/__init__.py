@@ -10,7 +10,7 @@ __author__ = 'Jin Xu'
 
 __all__ = [
 
-    "contract", "account", "utils", "IBClient", "Portfolio", "Account", "Position"
+    "contract", "account", "utils", "IBClient", "AsyncIBClient", "Portfolio", "Account", "Position"
 ]
 
 import ibclient.account
@@ -22,6 +22,7 @@ import ibclient.contract
 # for IB client
 # """
 from ibclient.ib_client import (IBClient)
+from ibclient.async_client import (AsyncIBClient)
 
 #
 # """
@@ -29,7 +30,7 @@ from ibclient.ib_client import (IBClient)
 # """
 from ibclient.account import (Portfolio, Account, Position)
 
-from ibclient.orders import (OrderExecution, MarketOrder, LimitOrder)
+from ibclient.orders import (OrderExecution, OrderHandle, OrderBasket, MarketOrder, LimitOrder)
 from ibclient.contract import (new_contract, new_stock_contract,
                                new_futures_contract, new_option_contract,
                                )
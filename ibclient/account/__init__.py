@@ -1,5 +1,7 @@
 ﻿# coding=utf-8
 
-from .account import (Account)
+from .account import (Account, AccountSnapshot)
 from .portfolio import (Portfolio)
 from .position import (Position)
+from .position_table import (PositionTable)
+from .account_summary import (AccountSummaryTable)
@@ -11,6 +11,34 @@ from __future__ import print_function
 from __future__ import division
 
 
+class AccountSnapshot(object):
+    ''' An immutable copy of the values of an Account, published by Account.publish().
+        The attributes of Account listed in Account.SNAPSHOT_FIELDS can be read as attributes, e.g. net_liquidation.
+    '''
+    __slots__ = ('version', 'timestamp', 'account_id', 'currency', 'values', 'currency_values')
+
+    def __init__(self, version, timestamp, account_id, currency, values, currency_values):
+        object.__setattr__(self, 'version', version)                  # 1 for the first snapshot of the account
+        object.__setattr__(self, 'timestamp', timestamp)              # updateAccountTime of the batch, if any
+        object.__setattr__(self, 'account_id', account_id)
+        object.__setattr__(self, 'currency', currency)                # base currency of the account
+        object.__setattr__(self, 'values', values)                    # key: attribute name; value: float
+        object.__setattr__(self, 'currency_values', currency_values)  # key: currency; value: dict of IB key: value
+
+    def __getattr__(self, name):
+        try:
+            return self.values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AccountSnapshot is read-only')
+
+    def __repr__(self):
+        return 'AccountSnapshot(account_id={}, version={}, timestamp={}, net_liquidation={})'.format(
+            self.account_id, self.version, self.timestamp, self.values.get('net_liquidation'))
+
+
 class Account(object):
     '''
         Below is a table of account fields available to reference in a live trading algorithm with Interactive Brokers.
@@ -52,9 +80,25 @@ class Account(object):
         (Float) The sum of the absolute value of all stock and equity option positions.
     '''
 
-    KEYS = ['AvailableFunds', 'AccruedCash', 'BuyingPower', 'Cushion', 'EquityWithLoanValue',
-            'ExcessLiquidity', 'InitMarginReq', 'MaintMarginReq', 'NetLiquidation', 'RegTEquity',
-            'RegTMargin', 'SettledCash', 'GrossPositionValue']
+    # key of updateAccountValue: attribute it sets
+    FIELDS = {'AvailableFunds': 'available_fund',
+              'AccruedCash': 'accrued_interest',
+              'BuyingPower': 'buying_power',
+              'Cushion': 'cushion',
+              'EquityWithLoanValue': 'equity_with_loan',
+              'ExcessLiquidity': 'excess_liquidity',
+              'InitMarginReq': 'initial_margin_requirement',
+              'MaintMarginReq': 'maintenance_margin_requirement',
+              'NetLiquidation': 'net_liquidation',
+              'RegTEquity': 'regt_equity',
+              'RegTMargin': 'regt_margin',
+              'SettledCash': 'settled_cash',
+              'GrossPositionValue': 'total_positions_value'}
+
+    KEYS = list(FIELDS)
+
+    # attributes copied to AccountSnapshot.values
+    SNAPSHOT_FIELDS = tuple(FIELDS.values()) + ('leverage', 'day_trades_remaining', 'net_leverage')
 
     def __init__(self, account_id):
         self.account_id = account_id
@@ -66,7 +110,6 @@ class Account(object):
         self.equity_with_loan = 0.
         self.excess_liquidity = 0.
         self.initial_margin_requirement = 0.
-        self.leverage = 0.
         self.maintenance_margin_requirement = 0.
         self.net_leverage = 0.
         self.net_liquidation = 0.
@@ -76,35 +119,64 @@ class Account(object):
         self.total_positions_value = 0.
         self.available_fund = 0.
 
+        # all values from updateAccountValue; key: currency, e.g. 'USD' or 'BASE'; value: dict of IB key: value
+        self.currency_values = {}
+        self.version = 0        # version of the latest snapshot
+        self.snapshot = None    # the latest AccountSnapshot; see publish()
+
+    @property
+    def leverage(self):
+        # GrossLeverage (Float) Gross position value divided by net liquidation.
+        if self.net_liquidation != 0.:
+            return self.total_positions_value / self.net_liquidation
+        return 0.
+
     def update(self, key, value, currency, account_id):
+        ''' Apply one updateAccountValue message. Values are kept per currency; the keys in FIELDS, which TWS sends
+            in the base currency of the account, also set their attribute.
+            The attributes change as messages arrive; read snapshot for a consistent view.
+        '''
         # key, value, currency, accountName
-        self.account_currency = currency
         if account_id != self.account_id:
             print('Received incorrect IB account ID')
             return
 
-        if key == 'AvailableFunds':      self.available_fund = float(value)
-        if key == 'AccruedCash':         self.accrued_interest = float(value)
-        if key == 'BuyingPower':         self.buying_power = float(value)
-        if key == 'Cushion':             self.cushion = float(value)
-        if key == 'EquityWithLoanValue': self.equity_with_loan = float(value)
-        if key == 'ExcessLiquidity':     self.excess_liquidity = float(value)
-        if key == 'InitMarginReq':       self.initial_margin_requirement = float(value)
-        if key == 'MaintMarginReq':      self.maintenance_margin_requirement = float(value)
-        if key == 'NetLiquidation':      self.net_liquidation = float(value)
-        if key == 'RegTEquity':          self.regt_equity = float(value)
-        if key == 'RegTMargin':          self.regt_margin = float(value)
-        if key == 'SettledCash':         self.settled_cash = float(value)
-        if key == 'GrossPositionValue':  self.total_positions_value = float(value)
+        try:
+            value = float(value)
+        except ValueError:
+            pass    # e.g. AccountType, or a currency code
+        values = self.currency_values.get(currency)
+        if values is None:
+            values = self.currency_values[currency] = {}
+        values[key] = value
 
-        # GrossLeverage (Float) Gross position value divided by net liquidation.
-        if self.net_liquidation != 0.:
-            self.leverage = self.total_positions_value / self.net_liquidation
-        else:
-            self.leverage = 0.
+        attr = self.FIELDS.get(key)
+        if attr is not None:
+            setattr(self, attr, float(value))
+            self.account_currency = currency
         # if key == '':         self.day_trades_remaining            = float(value)
         # if key == '':         self.net_leverage    = float(value)
 
+    def publish(self, timestamp=None):
+        ''' Publish the current values as a new AccountSnapshot; called once per batch of updates, i.e. on
+            updateAccountTime and accountDownloadEnd. Replacing the snapshot reference is atomic, so other threads
+            read either the previous or the new snapshot as a whole, without locks.
+
+        Args:
+            timestamp: the updateAccountTime time stamp of the batch; None to keep the one of the last snapshot
+        Returns:
+            the new AccountSnapshot
+        '''
+        if timestamp is None and self.snapshot is not None:
+            timestamp = self.snapshot.timestamp
+        values = dict((attr, getattr(self, attr)) for attr in self.SNAPSHOT_FIELDS)
+        currency_values = dict((currency, dict(v)) for currency, v in self.currency_values.items())
+        snapshot = AccountSnapshot(self.version + 1, timestamp, self.account_id, self.account_currency,
+                                   values, currency_values)
+        self.version = snapshot.version
+        self.snapshot = snapshot
+        return snapshot
+
     def __str__(self):
 
         return '\n'.join([
@@ -0,0 +1,104 @@
+# coding=utf-8
+'''
+Account summary of many accounts, e.g. the managed accounts of an FA login
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import threading
+
+import pandas as pd
+
+from .account import Account
+
+
+class AccountSummaryTable(object):
+    ''' Values of one reqAccountSummary subscription: one row per account, one column per tag.
+
+        Each accountSummary message replaces one value in O(1) and updates the total of its (tag, currency)
+        over all accounts by the difference, so totals() never re-adds the table. Tags which are ratios or
+        counts, e.g. Cushion, are not totalled. ready is set by the first accountSummaryEnd.
+    '''
+
+    DEFAULT_TAGS = tuple(Account.KEYS) + ('TotalCashValue',)
+
+    # tags whose values cannot be added up over accounts
+    NON_ADDITIVE_TAGS = ('AccountType', 'Cushion', 'DayTradesRemaining', 'Leverage', 'LookAheadNextChange',
+                         'HighestSeverity', 'Currency')
+
+    def __init__(self, req_id, group='All', tags=DEFAULT_TAGS):
+        self.req_id = req_id
+        self.group = group
+        self.tags = tuple(tags)
+        self.ready = threading.Event()
+        self.version = 0  # number of messages applied
+        self._lock = threading.Lock()
+        self._values = {}   # key: (account, tag); value: (value, currency)
+        self._totals = {}   # key: (tag, currency); value: sum over accounts
+
+    def update(self, account, tag, value, currency):
+        ''' Apply one accountSummary message '''
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        key = (account, tag)
+        with self._lock:
+            old = self._values.get(key)
+            self._values[key] = (value, currency)
+            if tag not in self.NON_ADDITIVE_TAGS:
+                if old is not None and isinstance(old[0], float):
+                    self._add(tag, old[1], -old[0])
+                if isinstance(value, float):
+                    self._add(tag, currency, value)
+            self.version += 1
+
+    def _add(self, tag, currency, delta):
+        total_key = (tag, currency)
+        self._totals[total_key] = self._totals.get(total_key, 0.) + delta
+
+    @property
+    def accounts(self):
+        with self._lock:
+            return sorted(set(account for account, _ in self._values))
+
+    def value(self, account, tag):
+        ''' Return the value of a tag of an account; None if not received '''
+        with self._lock:
+            entry = self._values.get((account, tag))
+        return entry[0] if entry is not None else None
+
+    def total(self, tag, currency=None):
+        ''' Return the total of a tag over all accounts; currency None for the only or first currency of the tag '''
+        with self._lock:
+            if currency is not None:
+                return self._totals.get((tag, currency), 0.)
+            for (t, _), value in self._totals.items():
+                if t == tag:
+                    return value
+        return 0.
+
+    def totals(self):
+        ''' Return the totals over all accounts as a Series indexed by (tag, currency) '''
+        with self._lock:
+            totals = dict(self._totals)
+        index = pd.MultiIndex.from_tuples(list(totals), names=['tag', 'currency'])
+        return pd.Series(list(totals.values()), index=index, dtype=float).sort_index()
+
+    def to_frame(self):
+        ''' Return the values as a DataFrame with one row per account and one column per tag '''
+        with self._lock:
+            values = dict((key, value) for key, (value, _) in self._values.items())
+        series = pd.Series(values, dtype=object)
+        if series.empty:
+            return pd.DataFrame(index=pd.Index([], name='account'))
+        df = series.unstack()
+        df.index.name = 'account'
+        df.columns.name = 'tag'
+        return df.infer_objects()
+
+    def __repr__(self):
+        return 'AccountSummaryTable(req_id={}, accounts={}, version={})'.format(self.req_id, len(self.accounts),
+                                                                                self.version)
@@ -14,6 +14,7 @@ import numpy as np
 from ib.ext.Contract import Contract
 from .account import Account
 from .position import Position
+from .position_table import PositionTable
 
 class Portfolio(object):
     ''' Current assumption is 1 portfolio : 1 account.
@@ -45,6 +46,8 @@ class Portfolio(object):
         self.capital_used = float()
         self.pnl = float()
         self.positions = dict()
+        self.table = PositionTable()  # the positions keyed by conId, for vectorized reads; see position_frame()
+        self.account_time = None  # time of the last account update from TWS, e.g. '13:05'
         # self.portfolio_value = self.account.net_liquidation
         # self.positions_value = self.account.total_positions_value
         self.returns = float()
@@ -101,6 +104,8 @@ class Portfolio(object):
         sid = contract.m_conId
 
         self.positions[symbol] = Position(sid, position, marketPrice, averageCost, unrealizedPNL, realizedPNL)
+        self.table.update(sid, symbol, contract, float(position), float(marketPrice), float(marketValue),
+                          float(averageCost), float(unrealizedPNL), float(realizedPNL))
         # updatePortfolio <ib.ext.Contract.Contract object at 0x0000000003EDD390> <class 'ib.ext.Contract.Contract'>
         # 4 10223.178711 10225.35 DU264039
         # calc
@@ -120,6 +125,48 @@ class Portfolio(object):
         assert (self.starting_cash != 0)
         self.returns = self.portfolio_value / self.starting_cash
 
+    @staticmethod
+    def position_symbol(contract):
+        ''' Key of a contract in positions: the symbol of a stock, the local symbol of other contracts if any '''
+        if contract.m_secType != 'STK' and contract.m_localSymbol:
+            return contract.m_localSymbol
+        return contract.m_symbol
+
+    @staticmethod
+    def position_key(contract):
+        ''' Key to look a contract up in self.table: its conId if any, else its position_symbol '''
+        return contract.m_conId if contract.m_conId else Portfolio.position_symbol(contract)
+
+    def update_position_amount(self, symbol, contract, position, averageCost):
+        ''' Update the amount and cost of a position from a position message (reqPositions), which has no prices '''
+        if not isinstance(contract, Contract):
+            raise TypeError("contract must be a contract object")
+
+        sid = contract.m_conId
+        last = self.positions.get(symbol)
+        self.positions[symbol] = Position(sid, position, last.last_sale_price if last is not None else 0.,
+                                          averageCost, last.unrealized_pnl if last is not None else 0.,
+                                          last.realized_pnl if last is not None else 0.)
+        self.table.update(sid, symbol, contract, float(position), average_cost=float(averageCost))
+
+    def amounts(self, keys):
+        ''' Current amounts of keys (symbols or conIds, see position_key) as an int64 array;
+            0 for keys without a position
+        '''
+        return self.table.lookup('amount', keys, 0.).astype(np.int64)
+
+    def prices(self, keys):
+        ''' Last prices of keys (symbols or conIds) from updatePortfolio as a float64 array;
+            NaN for keys without a position
+        '''
+        return self.table.lookup('market_price', keys, np.nan)
+
+    def position_frame(self, nonzero=True):
+        ''' Return amount, market price and value, average cost and P&L of the positions as a DataFrame indexed
+            by conId; see PositionTable.to_frame
+        '''
+        return self.table.to_frame(nonzero)
+
     def print_summary(self):
         print('%s' % '-' * 60)
         print('portfolio_value            = %s' % (self.portfolio_value))
@@ -0,0 +1,140 @@
+# coding=utf-8
+'''
+conId-indexed table of positions
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class PositionTable(object):
+    ''' Positions of one account in typed NumPy columns, one row per conId.
+
+        update() writes one row in place, found through a conId-to-row dict, so each updatePortfolio or
+        position message is O(1); a new conId appends a row, and the columns grow by doubling.
+        Contracts without a conId (0) are keyed by symbol instead. Closed positions keep their row with amount 0.
+        Rows are looked up by conId, or by symbol when the symbol belongs to one row only.
+        to_frame() and column() copy the rows in use, so callers get consistent arrays for vectorized math
+        without holding the lock.
+    '''
+
+    AMBIGUOUS = -2
+
+    COLUMNS = ('con_id', 'amount', 'market_price', 'market_value', 'average_cost', 'unrealized_pnl', 'realized_pnl')
+    DTYPES = (np.int64, np.float64, np.float64, np.float64, np.float64, np.float64, np.float64)
+
+    def __init__(self, capacity=64):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._rows = {}         # key: conId, or symbol if conId is 0; value: row index
+        self._symbol_rows = {}  # key: symbol; value: row index, or AMBIGUOUS if several conIds share the symbol
+        self.symbols = []       # symbol of each row
+        self.contracts = []     # IB Contract object of each row
+        self._columns = dict((name, np.zeros(capacity, dtype=dtype)) for name, dtype in zip(self.COLUMNS, self.DTYPES))
+        self._columns['market_price'][:] = np.nan
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, con_id):
+        return con_id in self._rows
+
+    def _row(self, con_id, symbol, contract):
+        ''' Return the row of con_id, appending one if new; call with the lock held '''
+        key = con_id if con_id else symbol
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        row = self._size
+        capacity = len(self._columns['con_id'])
+        if row == capacity:
+            for name, values in self._columns.items():
+                grown = np.zeros(2 * capacity, dtype=values.dtype)
+                if name == 'market_price':
+                    grown[:] = np.nan
+                grown[:capacity] = values
+                self._columns[name] = grown
+        self._columns['con_id'][row] = con_id
+        self._rows[key] = row
+        self._symbol_rows[symbol] = self.AMBIGUOUS if symbol in self._symbol_rows else row
+        self.symbols.append(symbol)
+        self.contracts.append(contract)
+        self._size += 1
+        return row
+
+    def update(self, con_id, symbol, contract, amount, market_price=None, market_value=None, average_cost=None,
+               unrealized_pnl=None, realized_pnl=None):
+        ''' Write the values of one position; None leaves a value as it is, e.g. position messages have no prices '''
+        with self._lock:
+            row = self._row(con_id, symbol, contract)
+            columns = self._columns
+            columns['amount'][row] = amount
+            for name, value in (('market_price', market_price), ('market_value', market_value),
+                                ('average_cost', average_cost), ('unrealized_pnl', unrealized_pnl),
+                                ('realized_pnl', realized_pnl)):
+                if value is not None:
+                    columns[name][row] = value
+
+    def rows(self, keys):
+        ''' Return the row index of each key, a conId (int) or a symbol (str), as an int64 array;
+            -1 for keys without a row
+
+        Raises:
+            ValueError: a symbol is shared by several conIds, e.g. futures of different expiries
+        '''
+        rows, symbol_rows = self._rows, self._symbol_rows
+        out = np.fromiter((symbol_rows.get(key, -1) if isinstance(key, str) else rows.get(key, -1) for key in keys),
+                          dtype=np.int64, count=len(keys))
+        if (out == self.AMBIGUOUS).any():
+            symbols = [key for key, row in zip(keys, out) if row == self.AMBIGUOUS]
+            raise ValueError('several positions with symbol {}; look them up by conId'.format(', '.join(symbols)))
+        return out
+
+    def lookup(self, name, keys, default):
+        ''' Return the values of column name for keys (see rows) as an array; default for keys without a row '''
+        rows = self.rows(keys)
+        with self._lock:
+            values = self._columns[name][:self._size]
+            found = rows >= 0
+            out = np.full(len(rows), default, dtype=np.result_type(values.dtype, np.asarray(default).dtype))
+            out[found] = values[rows[found]]
+        return out
+
+    def column(self, name):
+        ''' Return a copy of one column of the rows in use '''
+        with self._lock:
+            return self._columns[name][:self._size].copy()
+
+    def to_frame(self, nonzero=False):
+        ''' Return the positions as a DataFrame indexed by conId
+
+        Args:
+            nonzero: True to leave out closed positions
+        '''
+        with self._lock:
+            n = self._size
+            data = dict((name, self._columns[name][:n].copy()) for name in self.COLUMNS[1:])
+            index = pd.Index(self._columns['con_id'][:n].copy(), name='con_id')
+            symbols = list(self.symbols)
+        df = pd.DataFrame(data, index=index, columns=self.COLUMNS[1:])
+        df.insert(0, 'symbol', symbols)
+        if nonzero:
+            df = df[df['amount'].values != 0]
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._rows.clear()
+            self._symbol_rows.clear()
+            del self.symbols[:]
+            del self.contracts[:]
+            for values in self._columns.values():
+                values[:] = 0
+            self._columns['market_price'][:] = np.nan
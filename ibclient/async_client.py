@@ -0,0 +1,260 @@
+# coding=utf-8
+
+'''
+asyncio front end of IBClient
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import asyncio
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .ib_client import IBClient
+from .orders import MarketOrder
+from .utils import (ResponseDetails, IBRequestError)
+from .utils.pacing import RequestClass
+
+
+class AsyncIBClient(object):
+    """ asyncio front end of IBClient; the coroutines mirror the IBClient methods and return the same values.
+
+        Requests which complete through a RequestFuture (tick snapshots, contract details and fundamentals)
+        do not hold a thread while waiting: the EClientSocket reader thread resolves the asyncio future
+        through loop.call_soon_threadsafe(), so one event loop can wait for thousands of them.
+        Sending a request may block on TWS pacing limits, so requests are sent from a small pool of
+        worker threads. History and order methods, which run several steps, also run on that pool, each
+        holding a worker until it returns, so at most max_workers of them are in progress at a time; raise
+        max_workers, or pass many symbols to one get_stock_price_history call with max_concurrent, to
+        download more history at once.
+    """
+
+    def __init__(self, client=None, max_workers=4, **kwargs):
+        """
+        Args:
+            client: an IBClient instance; None to create one with kwargs, e.g. host, port, client_id
+            max_workers: number of threads sending requests to TWS and running history and order methods
+        """
+        self.client = client if client is not None else IBClient(**kwargs)
+        self.max_workers = max_workers
+        self._executor = None  # created on first use, and again after disconnect()
+
+    @property
+    def connected(self):
+        return self.client.connected
+
+    async def connect(self):
+        """ Connect to socket host, e.g. TWS """
+        return await self._run(self.client.connect)
+
+    async def disconnect(self):
+        """ disconnect from IB host; the worker threads are stopped, and started again by the next call """
+        try:
+            await self._run(self.client.disconnect)
+        finally:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False)
+
+    async def _run(self, func, *args, **kwargs):
+        ''' Run a blocking IBClient method on the worker threads '''
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    @staticmethod
+    def _wrap(future):
+        ''' Return an asyncio future resolved from a RequestFuture in the thread of the running loop.
+            Cancelling the asyncio future cancels the RequestFuture, which removes the request from ipc_msg_dict.
+        '''
+        loop = asyncio.get_running_loop()
+        aio_future = loop.create_future()
+
+        def _copy_state(done):
+            if aio_future.done():
+                return
+            if done.cancelled():
+                aio_future.cancel()
+            elif done.exception() is not None:
+                aio_future.set_exception(done.exception())
+            else:
+                aio_future.set_result(done.result())
+
+        def _on_done(done):
+            # called from the socket reader thread
+            try:
+                loop.call_soon_threadsafe(_copy_state, done)
+            except RuntimeError:
+                pass  # the event loop is closed, so nobody awaits the result any more
+
+        def _on_cancel(done):
+            if done.cancelled():
+                future.cancel()
+
+        future.add_done_callback(_on_done)
+        aio_future.add_done_callback(_on_cancel)
+        return aio_future
+
+    async def _wait(self, future, max_wait_time):
+        ''' Await a RequestFuture; a timeout cancels it and raises asyncio.TimeoutError '''
+        try:
+            return await asyncio.wait_for(self._wrap(future), max_wait_time)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _wait_status(self, future, max_wait_time, cancel_method=None):
+        ''' Await a RequestFuture and return (status, result) like IBClient._wait_status '''
+        try:
+            return ResponseDetails.STATUS_FINISHED, await self._wait(future, max_wait_time)
+        except IBRequestError as e:
+            return e.code, None
+        except asyncio.TimeoutError:
+            if cancel_method is not None and self.connected:
+                await self._run(self.client._send_request, RequestClass.CANCEL, cancel_method, future.req_id)
+            return future.response.status, None
+
+    #
+    # Market Data Methods
+    #
+    async def get_tick_snapshot(self, contract, max_wait_time=5, quiet_time=None):
+        """ Get a snapshot with default tick types and corresponding tick data for a given contract;
+            see IBClient.get_tick_snapshot
+        Raises:
+            RuntimeError: the request is timeout
+            IBRequestError: TWS rejected the request
+        """
+        future = await self._run(self.client.get_tick_snapshot_async, contract, quiet_time)
+        try:
+            return await self._wait(future, max_wait_time)
+        except asyncio.TimeoutError:
+            raise RuntimeError('reqMktData (get_tick_snapshot) is timeout. max_wait_time=%d' % (max_wait_time))
+
+    async def get_tick_snapshots(self, contracts, max_wait_time=10, quiet_time=None):
+        """ See IBClient.get_tick_snapshots """
+        return await self._run(self.client.get_tick_snapshots, contracts, max_wait_time, quiet_time)
+
+    async def request_tick_data(self, contract, history_depth=None):
+        return await self._run(self.client.request_tick_data, contract, history_depth)
+
+    async def cancel_tick_request(self, tickerId):
+        return await self._run(self.client.cancel_tick_request, tickerId)
+
+    async def request_realtime_price(self, contract, price_type='TRADES', bar_sizes=None, on_bar=None,
+                                     bar_history=1000, depth=None):
+        """ See IBClient.request_realtime_price; on_bar runs on the socket reader thread """
+        return await self._run(self.client.request_realtime_price, contract, price_type, bar_sizes, on_bar,
+                               bar_history, depth)
+
+    async def cancel_realtime_price(self, req_id):
+        return await self._run(self.client.cancel_realtime_price, req_id)
+
+    #
+    # Historical Data Methods
+    #
+    async def get_price_history(self, contract, ts_end, duration='1 M', frequency='daily', max_wait_time=30,
+                                max_concurrent=5, progress=None):
+        """ See IBClient.get_price_history """
+        return await self._run(self.client.get_price_history, contract, ts_end, duration, frequency,
+                               max_wait_time, max_concurrent, progress)
+
+    async def get_stock_price_history(self, security_list, ts_end, duration='1 M', frequency='daily',
+                                      max_wait_time=30, max_concurrent=1, categorical_symbol=False,
+                                      multi_index=False):
+        """ See IBClient.get_stock_price_history """
+        return await self._run(self.client.get_stock_price_history, security_list, ts_end, duration, frequency,
+                               max_wait_time, max_concurrent, categorical_symbol, multi_index)
+
+    #
+    # Order Methods
+    #
+    async def order_amount(self, contract, amount, style=MarketOrder()):
+        return await self._run(self.client.order_amount, contract, amount, style)
+
+    async def place_order(self, contract, amount, style=MarketOrder()):
+        """ See IBClient.place_order; await handle.wait_filled_async(timeout) for the fill """
+        return await self._run(self.client.place_order, contract, amount, style)
+
+    async def order_basket(self, orders):
+        return await self._run(self.client.order_basket, list(orders))
+
+    async def order_value(self, contract, value, style=MarketOrder(), price=None):
+        return await self._run(self.client.order_value, contract, value, style, price)
+
+    async def order_target(self, contract, amount, style=MarketOrder()):
+        return await self._run(self.client.order_target, contract, amount, style)
+
+    async def order_target_value(self, contract, value, style=MarketOrder(), price=None):
+        return await self._run(self.client.order_target_value, contract, value, style, price)
+
+    async def order_targets(self, contracts, amounts, style=MarketOrder()):
+        return await self._run(self.client.order_targets, contracts, amounts, style)
+
+    async def order_target_values(self, contracts, values, style=MarketOrder(), prices=None):
+        return await self._run(self.client.order_target_values, contracts, values, style, prices)
+
+    async def order_target_weights(self, contracts, weights, style=MarketOrder(), prices=None, portfolio_value=None):
+        return await self._run(self.client.order_target_weights, contracts, weights, style, prices, portfolio_value)
+
+    async def combo_order_amount(self, contract, amount, style=MarketOrder()):
+        return await self._run(self.client.combo_order_amount, contract, amount, style)
+
+    async def modify_order(self, order_id, contract, amount, style=MarketOrder()):
+        return await self._run(self.client.modify_order, order_id, contract, amount, style)
+
+    async def cancel_order(self, order):
+        return await self._run(self.client.cancel_order, order)
+
+    async def get_open_orders(self):
+        return await self._run(self.client.get_open_orders)
+
+    def get_order_status(self, order_id):
+        return self.client.get_order_status(order_id)
+
+    def get_order_handle(self, order_id):
+        return self.client.get_order_handle(order_id)
+
+    #
+    # Fundamental Data and Contract Methods
+    #
+    async def get_financial_statements(self, symbol, max_wait_time=20):
+        future = await self._run(self.client.get_financial_statements_async, symbol)
+        return await self._wait_status(future, max_wait_time)
+
+    async def get_company_ownership(self, symbol, max_wait_time=60.0 * 5):
+        future = await self._run(self.client.get_company_ownership_async, symbol)
+        return await self._wait_status(future, max_wait_time)
+
+    async def get_analyst_estimates(self, symbol, max_wait_time=20):
+        future = await self._run(self.client.get_analyst_estimates_async, symbol)
+        return await self._wait_status(future, max_wait_time)
+
+    async def get_company_overview(self, symbol, max_wait_time=10):
+        future = await self._run(self.client.get_company_overview_async, symbol)
+        return await self._wait_status(future, max_wait_time)
+
+    async def get_financial_summary(self, symbol, max_wait_time=10):
+        future = await self._run(self.client.get_financial_summary_async, symbol)
+        return await self._wait_status(future, max_wait_time)
+
+    async def get_financial_ratios(self, symbol, max_wait_time=5):
+        future = await self._run(self.client.get_financial_ratios_async, symbol)
+        return (await self._wait_status(future, max_wait_time, 'cancelMktData'))[1]
+
+    async def get_dividends_info(self, symbol, max_wait_time=5):
+        future = await self._run(self.client.get_dividends_info_async, symbol)
+        return (await self._wait_status(future, max_wait_time, 'cancelMktData'))[1]
+
+    async def get_contract_details(self, contract, max_wait_time=5):
+        """ See IBClient.get_contract_details """
+        future = await self._run(self.client.get_contract_details_async, contract)
+        status, contract_list = await self._wait_status(future, max_wait_time)
+        return status, contract_list[0] if contract_list else None
+
+    async def get_full_contract(self, contract):
+        """ See IBClient.get_full_contract """
+        status, contract_details = await self.get_contract_details(contract)
+        return status, copy(contract_details.m_summary)
@@ -12,12 +12,16 @@ from __future__ import division
 
 from datetime import datetime
 from copy import copy
+from functools import partial
+from concurrent.futures import TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait as futures_wait
 import threading
 from threading import Event
-from time import sleep
+from time import sleep, time
+import numpy as np
 import pandas as pd
 
 from ib.ext.EClientSocket import EClientSocket
+from ib.ext.ExecutionFilter import ExecutionFilter
 #
 # from ibclient.msg_wrapper import IBMsgWrapper
 # from ibclient.utils import (RequestDetails,
@@ -29,21 +33,43 @@ from ib.ext.EClientSocket import EClientSocket
 
 from .msg_wrapper import IBMsgWrapper
 from .utils import (RequestDetails,
-                    ResponseDetails)
+                    ResponseDetails,
+                    BarBuffer,
+                    BarRingBuffer,
+                    BarAggregator,
+                    TickRingBuffer,
+                    RequestRegistry,
+                    IBRequestError,
+                    BarCache,
+                    OrderIdAllocator)
+from .utils.duration import (BAR_SIZE_TIMEDELTA,
+                             parse_ts_end,
+                             duration_start,
+                             format_duration,
+                             fits_one_request,
+                             split_duration)
+from .utils.fills import FillsStore
+from .utils.order_latency import (OrderLatencyTracker, LatencyExporter, ID_ALLOCATED, PLACE_SENT)
+from .utils.sizing import (value_to_amount, weight_to_amount, order_deltas)
+from .utils.pacing import (RequestClass,
+                           RequestScheduler,
+                           historical_request_class)
+from .utils.timestamps import (to_datetime_index,
+                               convert_wall_clock)
 
 from .parsers import (parse_ownership_report,
-                      parse_analyst_estimates,
-                      parse_fin_statements)
-from .constants import IB_FARM_NAME_LS, MarketDepth
+                      parse_analyst_estimates)
+from .constants import IB_FARM_NAME_LS, IBEXCHANGE, MarketDepth, TICK_FIELDS
 from .orders import *
 from .contract import *
-from .account import Portfolio
+from .account import Portfolio, AccountSummaryTable
 
 
 class IBClient(object):
     """IB Socket client"""
 
-    def __init__(self, host='localhost', port=7496, client_id=0, client_name='IB'):
+    def __init__(self, host='localhost', port=7496, client_id=0, client_name='IB', max_msg_rate=50,
+                 server_timezone=None):
         """
 
         Args:
@@ -51,17 +77,26 @@ class IBClient(object):
             port: TWS配置的接收外部API的端口.TWS default value: 7496; TWS demo account default value: 7497
             client_id: API<->TWS之间 sock连接的ID
             client_name: 本次连接的名字。可选
+            max_msg_rate: 每秒发送给TWS的最大消息数. TWS limit: 50 msgs/sec
+            server_timezone: TWS登录时选择的时区, e.g. 'Asia/Shanghai'; None 表示本机时区
         """
 
         self.client_name = client_name
         self.host = host  # host IP address in a string; e.g. '127.0.0.1', 'localhost'
         self.port = port  # socket port;
         self.client_id = client_id  # socket client id
+        self.server_timezone = server_timezone  # timezone of TWS; ts_end and bar times without timezone are in it
 
         self.tickerId = 0  # known as ticker ID or request ID
-        self.ipc_msg_dict = {}  # key: ticker ID or request ID; value: request and response objects; response objects ususally carrys data, Events, and Status
-        self.order_id = 0  # current available order ID
+        self.ipc_msg_dict = RequestRegistry()  # key: ticker ID or request ID; value: request and response objects; response objects ususally carrys data, Events, and Status
+        self.order_id = 0  # last nextValidId sent by TWS
+        self.order_ids = OrderIdAllocator()  # local source of order IDs, seeded by nextValidId
+        self.order_id_timeout = 5.  # sec to wait for nextValidId when the local order IDs are out of sync
         self.order_history = {}  # key: ticker ID or request ID; value: request and response objects; response objects ususally carrys data, Events, and Status
+        self.order_handles = {}  # key: (client_id, order_id); value: OrderHandle of the orders placed by this client
+        self.order_latency = OrderLatencyTracker()  # timestamps of the stages of the orders, see get_order_latency()
+        self.latency_exporter = None  # see enable_latency_export()
+        self.fills = FillsStore(server_timezone)  # executions joined with their commission reports, see get_fills()
 
         # dict to store market depth data; key: (client_id, request_id)
         self.market_depth_buffer = dict()
@@ -69,6 +104,14 @@ class IBClient(object):
         self.context = None  # key: ticker ID or request ID; value: request and response objects; response objects ususally carrys data, Events, and Status
         self.portfolio = None
         self.account = None
+        self.managed_accounts = []  # accounts of the login, from managedAccounts; see get_managed_accounts()
+        self.account_summaries = {}  # key: request ID; value: AccountSummaryTable, see request_account_summary()
+
+        self.bar_cache = None  # local store of historical bars; see enable_bar_cache()
+        self.realtime_bar_depth = 720  # 5 sec bars kept per request_realtime_price subscription, i.e. 1 hour
+        self.tick_history_depth = 0  # ticks kept per request_tick_data subscription by default; 0 for none
+        self.tick_snapshot_quiet_time = 0.05  # sec without ticks after tickSnapshotEnd before a snapshot is taken
+        self.tick_snapshot_settle_time = 0.5  # max sec to wait for late ticks after tickSnapshotEnd
 
         self.wrapper = IBMsgWrapper(self)  # the instance with IB message callback methods
         self.connection = EClientSocket(self.wrapper)  # low layer socket client
@@ -85,14 +128,16 @@ class IBClient(object):
 
         self.order_event = Event()
         self.account_event = Event()
+        self.portfolio_ready = Event()  # set by accountDownloadEnd; see wait_portfolio_ready()
+        self.positions_end_event = Event()  # set by positionEnd; see request_positions()
+        self.managed_accounts_event = Event()  # set by managedAccounts
         self.get_order_event = Event()
-        self.tick_snapshot_req_end = Event()
 
         # LOCKER
         self.req_id_locker = threading.Lock()
 
-        # Order ID cond
-        self.order_id_cond = threading.Condition()
+        # all requests to TWS go through the scheduler to stay within TWS pacing limits
+        self.scheduler = RequestScheduler(max_msg_rate)
 
         # CONSTANT VALUES
         self.PRICE_DF_HEADER1 = ['time', 'open', 'high', 'low', 'close', 'volume']
@@ -113,7 +158,9 @@ class IBClient(object):
             sleep(0.05)
 
         if self.connected:
-            self.order_id = self.connection.reqIds(-1)
+            # TWS sends nextValidId right after the handshake; ask again only if it did not arrive
+            if not self.order_ids.wait_synced(timeout):
+                self._send_request(RequestClass.ORDER, 'reqIds', -1)
         else:
             print('failed to connect.')
 
@@ -127,6 +174,11 @@ class IBClient(object):
         """ disconnect from IB host """
         # self.disable_account_info_update()
         self.connection.eDisconnect()
+        self.order_ids.invalidate()  # TWS sends a new nextValidId on the next connect
+        self.managed_accounts_event.clear()
+        if self.latency_exporter is not None:
+            self.latency_exporter.stop()
+            self.latency_exporter = None
 
     def __get_new_request_id(self):
         '''' generate a new request ID (ticker ID) in a thread safe way '''
@@ -136,6 +188,71 @@ class IBClient(object):
         self.req_id_locker.release()
         return __id
 
+    def enable_bar_cache(self, cache_dir):
+        """ Keep historical bars downloaded by get_price_history in a local on-disk cache.
+            Only contracts with a conId (e.g. from get_full_contract) are cached; repeated calls
+            download only the bars missing from the cache.
+
+        Args:
+            cache_dir: directory to store the bar files
+        Returns:
+            the BarCache instance
+        """
+        self.bar_cache = BarCache(cache_dir)
+        return self.bar_cache
+
+    def enable_fills_spill(self, path):
+        """ Append every execution and commission report to a JSON lines file, e.g. to keep the fills of a day
+            across restarts; FillsStore.load(path) reads it back
+
+        Args:
+            path: file to append to
+        Returns:
+            the FillsStore instance
+        """
+        self.fills.spill_to(path)
+        return self.fills
+
+    def enable_latency_export(self, path, interval=60.):
+        """ Append the order latency stats (see get_order_latency_stats) to a JSON lines file every interval seconds,
+            until disconnect()
+
+        Args:
+            path: file to append to
+            interval: seconds between two exports
+        Returns:
+            the LatencyExporter instance
+        """
+        if self.latency_exporter is not None:
+            self.latency_exporter.stop()
+        self.latency_exporter = LatencyExporter(self.order_latency, path, interval).start()
+        return self.latency_exporter
+
+    def _send_request(self, req_class, method, *args, **kwargs):
+        ''' Send a request to TWS through the request scheduler.
+            The call blocks while the request would break TWS pacing limits.
+
+        Args:
+            req_class: one of RequestClass values; decides the pacing rules and priority of the request
+            method: name of the EClientSocket method, e.g. 'reqMktData'
+            pacing_key: optional keyword; key of per-key pacing rules, e.g. a contract for historical data
+            args, kwargs: arguments of the EClientSocket method
+        Returns:
+            the return value of the EClientSocket method
+        '''
+        pacing_key = kwargs.pop('pacing_key', None)
+        self.scheduler.acquire(req_class, pacing_key)
+        return getattr(self.connection, method)(*args, **kwargs)
+
+    def _post_request(self, req_class, method, *args, **kwargs):
+        ''' Send a request from a new daemon thread instead of the caller's, for callers which must not block
+            on the pacing limits, e.g. IBMsgWrapper callbacks on the socket reader thread; see _send_request
+        '''
+        thread = threading.Thread(target=self._send_request, args=(req_class, method) + args, kwargs=kwargs,
+                                  name='IBClient-%s' % method)
+        thread.daemon = True
+        thread.start()
+
     def setup_account(self, account_id, starting_cash):
         self.portfolio = Portfolio(account_id, starting_cash)
         self.account = self.portfolio.account
@@ -146,10 +263,13 @@ class IBClient(object):
     #
     # Tick Data Methods
     #
-    def request_tick_data(self, contract):
-        """ Subscribe tick data for a specified contract
+    def request_tick_data(self, contract, history_depth=None):
+        """ Subscribe tick data for a specified contract.
+            Besides the latest quote, the latest price and size ticks can be kept in a ring buffer on request;
+            see get_tick_history. The buffer is only allocated and written when history_depth is positive.
         Args:
             contract: a legal IBPY Contract object or a string for U.S. stock only
+            history_depth: number of ticks to keep; None for tick_history_depth (0, no history, by default)
         Returns:
             tickerId:  the ID of this request. this ID could be used to cancel request later.
             tick_data: a reference to the tick data dictionary which will be updated with latest quote.
@@ -167,14 +287,30 @@ class IBClient(object):
         __id = self.__get_new_request_id()
         request = RequestDetails('reqMktData', 'Snapshot', contract)
         response = ResponseDetails()
+        if history_depth is None:
+            history_depth = self.tick_history_depth
+        if history_depth:
+            response.tick_history = TickRingBuffer(history_depth, [TICK_FIELDS[k] for k in sorted(TICK_FIELDS)])
         self.ipc_msg_dict[__id] = (request, response)
 
         # False - indicating request live quotes instead of a snapshot
-        self.connection.reqMktData(__id, contract, '', False)
+        self._send_request(RequestClass.MARKET_DATA, 'reqMktData', __id, contract, '', False)
 
         return __id, self.ipc_msg_dict[__id][1].tick_data
 
-    def get_tick_snapshot(self, contract, max_wait_time=5):
+    def get_tick_history(self, req_id):
+        """ Get the tick history of a request_tick_data subscription.
+        Args:
+            req_id: the ticker ID returned by request_tick_data
+        Returns:
+            a TickRingBuffer; use values(field, n), latest(n) or to_frame() to read it
+        """
+        tick_history = self.ipc_msg_dict[req_id][1].tick_history
+        if tick_history is None:
+            raise KeyError("request %s keeps no tick history" % req_id)
+        return tick_history
+
+    def get_tick_snapshot(self, contract, max_wait_time=5, quiet_time=None):
         """ Get a snapshot with default tick types and corresponding tick data for a given contract
 
         Note: 1) no generic ticks can be specified.
@@ -189,27 +325,44 @@ class IBClient(object):
 
         Args:
             contract: a legal IBPY Contract object or a string for U.S. stock only
+            max_wait_time: max num of sec to wait for the snapshot
+            quiet_time: grace window of this request; see get_tick_snapshot_async
 
         Returns:
             a copy of tick data dictionary
         Raises:
-            None
+            RuntimeError: the request is timeout
+            IBRequestError: TWS rejected the request
         """
-        if isinstance(contract, Contract):
-            pass
-        elif isinstance(contract, str):
-            contract = new_stock_contract(contract)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        future = self.get_tick_snapshot_async(contract, quiet_time)
+        try:
+            return future.result(max_wait_time)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RuntimeError('reqMktData (get_tick_snapshot) is timeout. max_wait_time=%d' % (max_wait_time))
 
+    def get_tick_snapshot_async(self, contract, quiet_time=None):
+        """ Request a tick snapshot without waiting for it; see get_tick_snapshot
+
+            Each snapshot completes on the tickSnapshotEnd of its own request ID, after a grace window for the
+            tickPrice and tickSize messages which may follow it, so any number of snapshots can be in flight.
+
+        Args:
+            contract: a legal IBPY Contract object or a string for U.S. stock only
+            quiet_time: sec without ticks of this request after its tickSnapshotEnd before the snapshot is taken,
+                        at most tick_snapshot_settle_time; None for tick_snapshot_quiet_time
+        Returns:
+            a RequestFuture; its result is a copy of tick data dictionary
+        """
+        contract = self._make_contract(contract)
         if not self.connected:
             raise RuntimeError('IB client is not connected to TWS')
 
         __id = self.__get_new_request_id()
-
         request = RequestDetails('reqMktData', 'Snapshot', contract)
         response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+        response.quiet_time = self.tick_snapshot_quiet_time if quiet_time is None else quiet_time
+        future = self.ipc_msg_dict.register(__id, request, response, finish=lambda response: copy(response.tick_data))
 
         # send reqMktData req
         # True - indicating request live quotes instead of a snapshot
@@ -217,22 +370,50 @@ class IBClient(object):
         # Important:
         # When set it to 'True', each regulatory snapshot made will incur a fee of 0.01 USD to the account.
         # This applies to both live and paper accounts.
-        self.connection.reqMktData(__id, contract, '', True)
-
-        response.event.wait(max_wait_time)
-        if response.event.is_set():
-            # tickPrice() and tickeSize() may write after tickSnapshotEnd() completed.
-            sleep(0.5)
-            snapshot = copy(response.tick_data)
-            # remove the from dict and free the memory
-            response.event.clear()
-            self.ipc_msg_dict.pop(__id)
-        else:
-            response.event.clear()
-            self.ipc_msg_dict.pop(__id)
-            raise RuntimeError('reqMktData (get_tick_snapshot) is timeout. max_wait_time=%d' % (max_wait_time))
+        self._send_request(RequestClass.MARKET_DATA, 'reqMktData', __id, contract, '', True)
+        return future
+
+    def get_tick_snapshots(self, contracts, max_wait_time=10, quiet_time=None):
+        """ Get tick snapshots of many contracts, e.g. a whole universe, in one table.
 
-        return snapshot
+            All reqMktData snapshot requests are sent at once, as fast as the message rate limit allows, and
+            each snapshot is collected as soon as its own tickSnapshotEnd settled; so the call takes about
+            len(contracts) / max_msg_rate sec plus one round trip, instead of one round trip per contract.
+
+        Args:
+            contracts: a list of legal IBPY Contract objects or strings for U.S. stock only
+            max_wait_time: max num of sec to wait for the snapshots after the last request is sent
+            quiet_time: grace window of each request; see get_tick_snapshot_async
+        Returns:
+            a DataFrame with one row per contract, in the order of contracts, so contracts which share a symbol,
+            e.g. on different exchanges, keep a row each: 'symbol', 'sec_type', 'exchange' and 'currency'
+            columns describe the contract, followed by one column per tick data field; NaN for fields not
+            received, and for all fields of a contract whose request failed or is timeout.
+            Use df.set_index('symbol') for a table indexed by symbol when the symbols are unique.
+        """
+        contracts = [self._make_contract(contract) for contract in contracts]
+        futures = [self.get_tick_snapshot_async(contract, quiet_time) for contract in contracts]
+        _, not_done = futures_wait(futures, timeout=max_wait_time)
+
+        rows = []
+        for contract, future in zip(contracts, futures):
+            if future in not_done:
+                future.cancel()
+                print('reqMktData (get_tick_snapshots) for %s is timeout. max_wait_time=%d'
+                      % (contract.m_symbol, max_wait_time))
+                rows.append({})
+            elif future.exception() is not None:
+                print('reqMktData (get_tick_snapshots) for %s failed: %s' % (contract.m_symbol, future.exception()))
+                rows.append({})
+            else:
+                rows.append(future.result())
+
+        df = pd.DataFrame(rows, columns=list(TICK_FIELDS.values()), dtype=float)
+        df = df.where(df != -1)
+        for i, (name, attr) in enumerate((('symbol', 'm_symbol'), ('sec_type', 'm_secType'),
+                                          ('exchange', 'm_exchange'), ('currency', 'm_currency'))):
+            df.insert(i, name, [getattr(contract, attr) for contract in contracts])
+        return df
 
     def cancel_tick_request(self, tickerId):
         """ Cancel tick data request for a given ticker ID (request ID)
@@ -248,19 +429,26 @@ class IBClient(object):
             raise RuntimeError('IB client is not connected to TWS')
 
         # TODO: check if tickerID is in the list
-        self.connection.cancelMktData(tickerId)
+        self._send_request(RequestClass.CANCEL, 'cancelMktData', tickerId)
         self.ipc_msg_dict.pop(tickerId)
         return
 
-    def request_realtime_price(self, contract, price_type='TRADES'):
+    def request_realtime_price(self, contract, price_type='TRADES', bar_sizes=None, on_bar=None, bar_history=1000,
+                               depth=None):
         """ Get real-time price/volume for a specific contract, e.g. stocks, futures and option contracts.
             IB API support only 5 sec duration between two real-time bar (price) records.
+            With bar_sizes, the 5 sec bars are also rolled up into longer bars as they arrive; see get_realtime_bars.
         Args:
             contract: one IB contract instance
             price_type: 'TRADES', 'MIDPOINT', 'BID',  'ASK'
+            bar_sizes: a list of bar sizes to aggregate, e.g. ['1 min', '5 mins', '15 mins']; None for 5 sec bars only
+            on_bar: callable(tickerId, bar_size, bar) called when an aggregated bar closes;
+                    bar is a (time, open, high, low, close, volume) tuple. It runs on the socket reader thread.
+            bar_history: number of closed bars kept for each of bar_sizes
+            depth: number of 5 sec bars kept; None for realtime_bar_depth. Older bars are dropped.
         Returns:
             tickerId: the request ID; it's also the key to get response msg from ipc_msg_dict
-            realtime_price: a reference to the real-time price (OCHL) list which will be updated
+            realtime_price: a reference to the real-time price (OCHL) BarRingBuffer which will be updated
                             with latest price (OCHL) record.
         Raises:
             None
@@ -281,14 +469,33 @@ class IBClient(object):
         __id = self.__get_new_request_id()
         request = RequestDetails('reqHistoricalData', price_type, contract)
         response = ResponseDetails()
+        # bars are stored in UTC; resolve the exchange timezone once to show them in exchange time
+        tz_name = IBEXCHANGE.get_timezone(contract.m_exchange)
+        response.rt_price = BarRingBuffer(depth or self.realtime_bar_depth, tz_name=tz_name)
+        if bar_sizes:
+            response.bar_aggregator = BarAggregator(bar_sizes, history=bar_history, tz_name=tz_name,
+                                                    on_bar=None if on_bar is None else partial(on_bar, __id))
         self.ipc_msg_dict[__id] = (request, response)
         # only 5 sec duration supported
         # price_type: 'TRADES', 'MIDPOINT', 'BID',  'ASK'
         # useRTH - set to True
-        self.connection.reqRealTimeBars(__id, contract, 5, price_type, True)
+        self._send_request(RequestClass.MARKET_DATA, 'reqRealTimeBars', __id, contract, 5, price_type, True)
 
         return __id, self.ipc_msg_dict[__id][1].rt_price
 
+    def get_realtime_bars(self, req_id, bar_size):
+        """ Get the closed bars aggregated by a request_realtime_price subscription.
+        Args:
+            req_id: the ticker ID returned by request_realtime_price
+            bar_size: one of the bar_sizes of the subscription, e.g. '1 min'
+        Returns:
+            a BarRingBuffer with up to bar_history bars; use to_frame() or column() to read it
+        """
+        aggregator = self.ipc_msg_dict[req_id][1].bar_aggregator
+        if aggregator is None or bar_size not in aggregator.bars:
+            raise KeyError("request %s does not aggregate %s bars" % (req_id, bar_size))
+        return aggregator.bars[bar_size]
+
     def cancel_realtime_price(self, req_id):
         """ Cancel realtime price/volumne request.
         Args:
@@ -298,7 +505,7 @@ class IBClient(object):
         """
         if not self.connected:
             raise RuntimeError('IB client is not connected to TWS')
-        self.connection.cancelRealTimeBars(req_id)
+        self._send_request(RequestClass.CANCEL, 'cancelRealTimeBars', req_id)
 
         # remove request/response data from ipc_msg_dict
         self.ipc_msg_dict.pop(req_id)
@@ -307,8 +514,12 @@ class IBClient(object):
     #
     # Historical Data Methods
     #
-    def get_price_history(self, contract, ts_end, duration='1 M', frequency='daily', max_wait_time=30):
+    def get_price_history(self, contract, ts_end, duration='1 M', frequency='daily', max_wait_time=30,
+                          max_concurrent=5, progress=None):
         """ Get price/volumne history for a specific contract, e.g. stocks, futures and option ocntract.
+            A duration longer than TWS accepts for the bar size, e.g. '1 Y' of minute bars, is split into
+            the largest legal requests, which are fetched in parallel within the historical data pacing limits
+            and stitched into one time-sorted frame without duplicated bars.
 
         Args:
             contract: one IB contract instance
@@ -321,6 +532,8 @@ class IBClient(object):
                         X Y	Year
             frequency: {‘daily’, ‘minute’}, optional; Resolution of the data to be returned.
             max_wait_time: int; max num of sec to wait after calling reqHistoricalData
+            max_concurrent: int; max num of requests in flight when the duration is split into several requests
+            progress: callable, optional; called as progress(num_finished, num_requests) after each request finished
         Returns:
             pandas Panel/DataFrame/Series – The pricing data that was requested.
 
@@ -362,53 +575,76 @@ class IBClient(object):
             print('get_price_history: incorrect ts_end format')
             return
 
-        __id = self.__get_new_request_id()
-        request = RequestDetails('reqHistoricalData', '', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+        if self.bar_cache is not None:
+            cache_key = BarCache.make_key(contract, bar_size)
+            if cache_key is not None:
+                return self._get_cached_price_history(cache_key, contract, ts_end, duration, bar_size, max_wait_time,
+                                                      max_concurrent, progress)
 
-        self.connection.reqHistoricalData(tickerId=__id, contract=contract, endDateTime=ts_end, durationStr=duration,
-                                          barSizeSetting=bar_size, whatToShow='TRADES', useRTH=0, formatDate=1)
-
-        df = None
-        response.event.wait(max_wait_time)
-        if response.event.is_set():
-            df = pd.DataFrame(response.price_hist, columns=self.PRICE_DF_HEADER1)
-            # clean up the time format
-            print(df.head(10))
-            print(response.price_hist)
-            date = df['time'][0]
-
-            if len(date) == 8:
-                df['time'] = pd.to_datetime(df['time'], format='%Y%m%d')
-            elif len(date) == 18:
-                # len('20161020 23:46:00') --> 2 Spaces!!!!!
-                # adj_date = datetime.strptime(date, "%Y%m%d  %H:%M:%S")
-                df['time'] = pd.to_datetime(df['time'], format="%Y%m%d  %H:%M:%S")
-            else:
-                # adj_date = datetime.strptime(date, "%Y%m%d %H:%M:%S")
-                df['time'] = pd.to_datetime(df['time'], format="%Y%m%d %H:%M:%S")
-
-            # TODO: check for timezone
-            # exchange = request.contract.m_exchange
-            # server_timezone = pytz.timezone("Asia/Shanghai")  # timezone where the server runs
-            # mkt_timezone = pytz.timezone(IBEXCHANGE.get_timezone(exchange))  # Get Exchange's timezone
-            # adj_date = server_timezone.localize(adj_date).astimezone(
-            #     mkt_timezone)  # covert server time to Exchange's time
-            # adj_date = adj_date.strftime("%Y%m%d %H:%M:%S")  # from datetime to string
-
-            df = df.set_index('time')
-            # remove the from dict and free the memory
-            response.event.clear()
-            self.ipc_msg_dict.pop(__id)
-        else:
-            self.ipc_msg_dict.pop(__id)
-            print('reqHistoricalData is timeout.')
-            raise RuntimeError('reqHistoricalData is timeout.')
+        return self._download_price_history(contract, ts_end, duration, bar_size, max_wait_time,
+                                            max_concurrent, progress)
 
+    def _download_price_history(self, contract, ts_end, duration, bar_size, max_wait_time,
+                                max_concurrent=1, progress=None):
+        """ Download bars and return them as a DataFrame indexed by time.
+            A duration longer than MAX_REQUEST_DURATION of the bar size is split into several requests.
+        """
+        end = parse_ts_end(ts_end)
+        start = duration_start(end, duration)
+        if fits_one_request(end, duration, bar_size):
+            chunks = [(ts_end, duration)]
+        else:
+            chunks = split_duration(end, start, bar_size)
+
+        jobs = [(i, contract, chunk_end, chunk_duration, bar_size)
+                for i, (chunk_end, chunk_duration) in enumerate(chunks)]
+        responses = self._request_price_histories(jobs, max_concurrent=max_concurrent,
+                                                  max_wait_time=max_wait_time, progress=progress)
+
+        # chunks are listed from the latest to the earliest one
+        df = self._build_price_frame(None, [responses[i].price_hist for i in reversed(range(len(jobs)))],
+                                     tz_name=self._bar_timezone(contract, bar_size))
+        df = df.set_index('time')
+        if len(jobs) > 1:
+            # neighbouring chunks may share bars, and the earliest chunk may go beyond the window;
+            # keep (start, end] like a single request
+            start = convert_wall_clock(start, self.server_timezone, self._bar_timezone(contract, bar_size))
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+            df = df[df.index > pd.Timestamp(start)]
         return df
 
-    def get_stock_price_history(self, security_list, ts_end, duration='1 M', frequency='daily', max_wait_time=30):
+    def _get_cached_price_history(self, cache_key, contract, ts_end, duration, bar_size, max_wait_time,
+                                  max_concurrent=1, progress=None):
+        """ Serve a get_price_history call from the local bar cache.
+            If the cache already covers the start of the window, only the missing tail
+            (from the last stored bar to ts_end) is downloaded; otherwise the full window is downloaded.
+            The downloaded bars are merged into the cache.
+        """
+        # ts_end is in TWS timezone, while the bars are in the exchange timezone
+        end = convert_wall_clock(parse_ts_end(ts_end), self.server_timezone, self._bar_timezone(contract, bar_size))
+        start = duration_start(end, duration)
+
+        coverage = self.bar_cache.coverage(cache_key)
+        if coverage is not None and coverage[0] <= start:
+            last = coverage[1]
+            if end < last + BAR_SIZE_TIMEDELTA[bar_size]:
+                # the whole window is in the cache; no request to TWS
+                return self.bar_cache.load(cache_key, start, end)
+
+            # download from the last stored bar (inclusive) to refresh a bar which might be incomplete
+            df = self._download_price_history(contract, ts_end,
+                                              format_duration(end - last + BAR_SIZE_TIMEDELTA[bar_size], bar_size),
+                                              bar_size, max_wait_time, max_concurrent, progress)
+            self.bar_cache.merge(cache_key, df, last)
+        else:
+            df = self._download_price_history(contract, ts_end, duration, bar_size, max_wait_time,
+                                              max_concurrent, progress)
+            self.bar_cache.merge(cache_key, df, start)
+
+        return self.bar_cache.load(cache_key, start, end)
+
+    def get_stock_price_history(self, security_list, ts_end, duration='1 M', frequency='daily', max_wait_time=30,
+                                max_concurrent=1, categorical_symbol=False, multi_index=False):
         """Get price/volumne history for a list of stocks.
 
         Args:
@@ -417,6 +653,11 @@ class IBClient(object):
             durationStr: see IB API doc.
             frequency: {‘daily’, ‘minute’}, optional; Resolution of the data to be returned.
             max_wait_time: int; max num of sec to wait after calling reqHistoricalData
+            max_concurrent: int; max num of reqHistoricalData requests in flight at the same time.
+                            1 means downloading one symbol after another.
+                            Note: TWS allows at most 50 simultaneous open historical data requests.
+            categorical_symbol: bool; store the 'symbol' column as pandas categorical data
+            multi_index: bool; index the result by ('symbol', 'time') instead of a column per field
         Returns:
             pandas Panel/DataFrame/Series – The pricing data that was requested.
         Raises:
@@ -449,79 +690,162 @@ class IBClient(object):
             print('get_stock_price_history: incorrect ts_end format')
             return
 
+        # one request per symbol; duplicated symbols are downloaded once
+        security_list = list(dict.fromkeys(security_list))
+        jobs = [(sec, new_stock_contract(sec), ts_end, duration, bar_size) for sec in security_list]
+        responses = self._request_price_histories(jobs, max_concurrent=max_concurrent, max_wait_time=max_wait_time)
+
         # ['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Volume']
-        df = pd.DataFrame(columns=self.PRICE_DF_HEADER2)
-        for sec in security_list:
+        df = self._build_price_frame(security_list, [responses[sec].price_hist for sec in security_list],
+                                     categorical_symbol=categorical_symbol, multi_index=multi_index,
+                                     tz_name=self._bar_timezone(jobs[0][1], bar_size))
+        return df
 
-            __id = self.__get_new_request_id()
+    def get_contract_price_history(self, contract, ts_end, duration='1 M', frequency='daily', max_wait_time=30):
+        # Same function as get_price_history
+        return self.get_price_history(contract, ts_end, duration, frequency, max_wait_time)
 
-            contract = new_stock_contract(sec)
-            request = RequestDetails('reqHistoricalData', '', contract)
-            response = ResponseDetails()
-            self.ipc_msg_dict[__id] = (request, response)
-
-            self.connection.reqHistoricalData(tickerId=__id, contract=contract, endDateTime=ts_end,
-                                              durationStr=duration, barSizeSetting=bar_size, whatToShow='TRADES',
-                                              useRTH=0, formatDate=1)
-
-            response.event.wait(max_wait_time)
-            if response.event.is_set():
-
-                df_tmp = pd.DataFrame(response.price_hist, columns=self.PRICE_DF_HEADER1)
-                # clean up the time format
-                date = df_tmp['time'][0]
-
-                if len(date) == 8:
-                    df_tmp['time'] = pd.to_datetime(df_tmp['time'], format='%Y%m%d')
-                elif len(date) == 18:
-                    # len('20161020 23:46:00') --> 2 Spaces!!!!!
-                    # adj_date = datetime.strptime(date, "%Y%m%d  %H:%M:%S")
-                    df_tmp['time'] = pd.to_datetime(df_tmp['time'], format="%Y%m%d  %H:%M:%S")
-                else:
-                    # adj_date = datetime.strptime(date, "%Y%m%d %H:%M:%S")
-                    df_tmp['time'] = pd.to_datetime(df_tmp['time'], format="%Y%m%d %H:%M:%S")
-
-                # TODO: check for timezone
-                # exchange = request.contract.m_exchange
-                # server_timezone = pytz.timezone("Asia/Shanghai")  # timezone where the server runs
-                # mkt_timezone = pytz.timezone(IBEXCHANGE.get_timezone(exchange))  # Get Exchange's timezone
-                # adj_date = server_timezone.localize(adj_date).astimezone(
-                #     mkt_timezone)  # covert server time to Exchange's time
-                # adj_date = adj_date.strftime("%Y%m%d %H:%M:%S")  # from datetime to string
-
-                df_tmp['symbol'] = pd.DataFrame([sec] * len(df_tmp))
-                df = df.append(df_tmp)
-                # remove the from dict and free the memory
-                self.ipc_msg_dict.pop(__id)
-                response.event.clear()
+    def _build_price_frame(self, symbols, price_hists, categorical_symbol=False, multi_index=False, tz_name=None):
+        """ Build one DataFrame from the bars collected by a list of reqHistoricalData requests.
+            Each column is taken from the typed NumPy columns of the price_hist buffers; a single
+            buffer is used without copying its price columns.
 
+        Args:
+            symbols: a list of symbols, one for each entry of price_hists; None to skip the 'symbol' column
+            price_hists: a list of BarBuffer instances, see IBMsgWrapper.historicalData
+            categorical_symbol: bool; store the 'symbol' column as pandas categorical data
+            multi_index: bool; index the frame by ('symbol', 'time')
+            tz_name: show the bar times (UTC nanoseconds) in this timezone; None for daily bars
+        Returns:
+            a DataFrame with PRICE_DF_HEADER2 columns, or PRICE_DF_HEADER1 columns if symbols is None
+        """
+        data = {}
+        for name in BarBuffer.COLUMNS:
+            if len(price_hists) == 1:
+                data[name] = price_hists[0].column(name)
             else:
-                self.ipc_msg_dict.pop(__id)
-                raise RuntimeError('reqHistoricalData is timeout.')
+                data[name] = np.concatenate([price_hist.column(name) for price_hist in price_hists]
+                                            or [np.empty(0)])
+        data['time'] = to_datetime_index(data['time'], tz_name).values
+
+        if symbols is None:
+            return pd.DataFrame(data, columns=self.PRICE_DF_HEADER1, copy=False)
 
+        codes = np.repeat(np.arange(len(symbols)), [len(price_hist) for price_hist in price_hists])
+        if categorical_symbol:
+            data['symbol'] = pd.Categorical.from_codes(codes, categories=symbols)
+        else:
+            data['symbol'] = np.asarray(symbols, dtype=object)[codes]
+
+        df = pd.DataFrame(data, columns=self.PRICE_DF_HEADER2, copy=False)
+        if multi_index:
+            df = df.set_index(['symbol', 'time'])
         return df
 
-    def get_contract_price_history(self, contract, ts_end, duration='1 M', frequency='daily', max_wait_time=30):
-        # Same function as get_price_history
-        return self.get_price_history(contract, ts_end, duration, frequency, max_wait_time)
+    @staticmethod
+    def _bar_timezone(contract, bar_size):
+        """ Timezone to show the intraday bars of a contract in; daily bars have no timezone """
+        if bar_size == '1 day':
+            return None
+        return IBEXCHANGE.get_timezone(contract.m_exchange)
+
+    def _request_price_histories(self, jobs, max_concurrent=1, max_wait_time=30, progress=None):
+        """ Send reqHistoricalData for a list of jobs and keep up to max_concurrent requests in flight.
+            Each request is registered in ipc_msg_dict as usual and waited for through its RequestFuture,
+            which removes it once the request finished or failed. Sending a request blocks while the
+            historical data pacing limits are reached.
+
+        Args:
+            jobs: a list of (key, contract, ts_end, duration, bar_size) tuples
+            max_concurrent: int; max num of requests waiting for TWS at the same time
+            max_wait_time: int; max num of sec to wait for each request after sending it
+            progress: callable, optional; called as progress(num_finished, num_jobs) after each request finished
+        Returns:
+            a dict; key: job key; value: the ResponseDetails instance of the finished request
+        Raises:
+            RuntimeError: if any request is timeout
+            IBRequestError: if TWS rejected any request, e.g. no data for the requested period
+        """
+        max_concurrent = max(1, int(max_concurrent))
+        pending = list(reversed(jobs))  # next job to send is at the tail
+        in_flight = {}  # key: RequestFuture; value: (job key, time of sending the request)
+        responses = {}
+
+        try:
+            while pending or in_flight:
+                # fill up the window of in-flight requests
+                while pending and len(in_flight) < max_concurrent:
+                    key, contract, ts_end, duration, bar_size = pending.pop()
+
+                    __id = self.__get_new_request_id()
+                    request = RequestDetails('reqHistoricalData', '', contract)
+                    future = self.ipc_msg_dict.register(__id, request, ResponseDetails())
+
+                    # bars of 30 secs or less: no more than 60 requests within any 10 minute period, and
+                    # no more than 5 requests for the same contract within 2 seconds
+                    pacing_key = (contract.m_conId, contract.m_symbol, contract.m_exchange, contract.m_secType)
+                    self._send_request(historical_request_class(bar_size), 'reqHistoricalData', pacing_key=pacing_key,
+                                       tickerId=__id, contract=contract, endDateTime=ts_end,
+                                       durationStr=duration, barSizeSetting=bar_size,
+                                       whatToShow='TRADES', useRTH=0, formatDate=2)
+                    in_flight[future] = (key, time())
+
+                # wait until any request finished or the oldest one is timeout
+                sent_at = min(sent_at for _, sent_at in in_flight.values())
+                remaining = sent_at + max_wait_time - time()
+                if remaining <= 0:
+                    print('reqHistoricalData is timeout.')
+                    raise RuntimeError('reqHistoricalData is timeout.')
+                finished, _ = futures_wait(list(in_flight), timeout=remaining, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    key, _ = in_flight.pop(future)
+                    responses[key] = future.result()
+                    if progress is not None:
+                        progress(len(responses), len(jobs))
+        finally:
+            # cancel and clean up the requests left behind by an error
+            for future in in_flight:
+                future.cancel()
+                if self.connected:
+                    self._send_request(RequestClass.CANCEL, 'cancelHistoricalData', future.req_id)
+
+        return responses
 
     #
     # Placing/Changing/Canceling Order Methods
     #
 
     def request_order_id(self):
-        """ request order id from TWS client """
-
-        # request next valid order ID from IB host; this request will update self.order_id
-        # details: https: // interactivebrokers.github.io / tws - api / order_submission.html
-        self.connection.reqIds(-1)
-
-        self.order_id_cond.acquire()
-        self.order_id_cond.wait()
-        new_order_id = self.order_id
-        self.order_id_cond.release()
-
-        return new_order_id
+        """ Allocate a new order ID locally from the nextValidId seeded by TWS.
+            TWS is asked for nextValidId again only when the local counter is out of sync, e.g. after an order ID error.
+            details: https://interactivebrokers.github.io/tws-api/order_submission.html
+        """
+        return self._request_order_ids(1)[0]
+
+    def _request_order_ids(self, count):
+        """ Allocate count consecutive order IDs; see request_order_id """
+        if not self.order_ids.synced:
+            self._send_request(RequestClass.ORDER, 'reqIds', -1)  # note: input param is always ignored;
+        order_ids = self.order_ids.next_ids(count, self.order_id_timeout)
+        for order_id in order_ids:
+            self.order_latency.mark((self.client_id, order_id), ID_ALLOCATED)
+        return order_ids
+
+    def _new_order(self, order_id, amount, style):
+        """ Build the IB Order of amount (positive means buy, negative means sell) in style """
+        order = Order()
+        order.m_orderId = order_id
+        order.m_client_id = self.client_id
+        order.m_action = 'BUY' if amount > 0 else 'SELL'
+        order.m_totalQuantity = abs(amount)
+        order.m_orderType = style.order_type
+        if style.limit_price is not None:
+            order.m_lmtPrice = style.limit_price
+        if style.stop_price is not None:
+            order.m_auxPrice = style.stop_price
+        order.m_overridePercentageConstraints = True  # override TWS order size constraints
+        return order
 
     def get_order_status(self, order_id):
         """
@@ -537,13 +861,55 @@ class IBClient(object):
 
         key = (self.client_id, order_id)
 
+        handle = self.order_handles.get(key)
+        if handle is not None:
+            return handle.status
+
         order_info = self.order_history.get(key, None)
 
-        if order_info:
-            return order_info['status']
+        if order_info and 'order_exec_obj' in order_info:
+            return order_info['order_exec_obj'].status
         else:
             return ""
 
+    def get_order_handle(self, order_id):
+        """ Return the OrderHandle of an order placed by this client; None if unknown """
+        return self.order_handles.get((self.client_id, order_id))
+
+    def get_fills(self):
+        """ Return the executions received so far, joined with their commission reports, as a DataFrame;
+            see FillsStore.to_frame
+        """
+        return self.fills.to_frame()
+
+    def get_executions(self, max_wait_time=5):
+        """ Request the executions of today from TWS, e.g. after a restart, and add them to self.fills
+
+        :param max_wait_time: max number of seconds to wait for execDetailsEnd
+        :return: (status, DataFrame of all fills); see get_fills
+        """
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+
+        __id = self.__get_new_request_id()
+        request = RequestDetails('reqExecutions', '', None)
+        future = self.ipc_msg_dict.register(__id, request, ResponseDetails(),
+                                            finish=lambda response: self.fills.to_frame())
+        self._send_request(RequestClass.ORDER, 'reqExecutions', __id, ExecutionFilter())
+        return self._wait_status(future, max_wait_time)
+
+    def get_order_latency(self, order_id):
+        """ Return the stages an order went through, e.g. 'place_sent', 'status:Submitted', 'exec_details',
+            as a dict of stage: ms since its order ID was allocated; see OrderLatencyTracker
+        """
+        return self.order_latency.timeline((self.client_id, order_id))
+
+    def get_order_latency_stats(self):
+        """ Return count, mean, p50, p99 and max latency in ms of each order stage over all orders as a DataFrame;
+            placeOrder send is measured from the order ID allocation, the other stages from placeOrder send
+        """
+        return self.order_latency.stats()
+
     def order_amount(self, contract, amount, style=MarketOrder()):
         ''' Place an order. Order X units of security Y.
             Warning: only mkt order and limited order work; calling stoploss/stoplimited order will result in IB disconnection.
@@ -554,10 +920,6 @@ class IBClient(object):
         '''
         if amount == 0:
             return -1
-        elif amount > 0:
-            action = 'BUY'
-        else:
-            action = 'SELL'
 
         if not self.connected:
             raise RuntimeError('IB client is not connected to TWS')
@@ -565,31 +927,64 @@ class IBClient(object):
         if not isinstance(contract, Contract):
             raise TypeError("contract must be a contract object")
 
-        order = Order()
+        return self._place_order(self.request_order_id(), contract, amount, style).order_id
 
-        # request next valid order ID from IB host; this request will update self.order_id
-        # details: https: // interactivebrokers.github.io / tws - api / order_submission.html
-        # self.connection.reqIds(-1)
-        # sleep(0.05)
-        order.m_orderId = self.request_order_id()
+    def place_order(self, contract, amount, style=MarketOrder()):
+        ''' Place an order like order_amount, and return its OrderHandle,
+            e.g. to wait for the fill with handle.wait_filled(timeout) or to register handle.on_fill(callback)
 
-        order.m_client_id = self.client_id
-        order.m_action = action
-        order.m_totalQuantity = abs(amount)
-        order.m_orderType = style.order_type
-        if style.limit_price is not None:
-            order.m_lmtPrice = style.limit_price
-        if style.stop_price is not None:
-            order.m_auxPrice = style.stop_price
-        order.m_overridePercentageConstraints = True  # override TWS order size constraints
+        :param contract: A IB Contract object.
+        :param amount: The integer amount of shares. Positive means buy, negative means sell.
+        :param style: market order or limited order
+        :return: an OrderHandle
+        '''
+        if amount == 0:
+            raise ValueError('amount must not be 0')
 
-        # place order
-        self.connection.placeOrder(order.m_orderId, contract, order)
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+
+        if not isinstance(contract, Contract):
+            raise TypeError("contract must be a contract object")
+
+        return self._place_order(self.request_order_id(), contract, amount, style)
+
+    def _place_order(self, order_id, contract, amount, style, order=None):
+        ''' Register the OrderHandle of a new order and send placeOrder; order is built from style if None '''
+        if order is None:
+            order = self._new_order(order_id, amount, style)
+        handle = OrderHandle(self.client_id, order_id, contract, amount)
+        # register the handle first, so no orderStatus is missed
+        self.order_handles[(self.client_id, order_id)] = handle
+        self._send_request(RequestClass.ORDER, 'placeOrder', order_id, contract, order)
+        self.order_latency.mark((self.client_id, order_id), PLACE_SENT)
+        return handle
+
+    def order_basket(self, orders):
+        ''' Place a basket of orders back to back, e.g. for a rebalance.
+            The order IDs are allocated in one go and the placeOrder messages are sent without waiting for any reply,
+            so the time to place the basket depends on the message rate limit only.
+
+        :param orders: iterable of (contract, amount) or (contract, amount, style); amount is the integer amount of
+                       shares, positive means buy, negative means sell; orders with amount 0 are skipped;
+                       style is MarketOrder() if omitted
+        :return: an OrderBasket which tracks the aggregate fill state of the orders
+        '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
 
-        # self.order_history[(self.order_id, self.client_id)] = order
+        legs = []
+        for item in orders:
+            contract, amount = item[0], item[1]
+            style = item[2] if len(item) > 2 else MarketOrder()
+            if not isinstance(contract, Contract):
+                raise TypeError("contract must be a contract object")
+            if amount != 0:
+                legs.append((contract, amount, style))
 
-        # TODO: wait for returns from orderStatus
-        return order.m_orderId
+        order_ids = self._request_order_ids(len(legs)) if legs else []
+        return OrderBasket([self._place_order(order_id, contract, amount, style)
+                            for order_id, (contract, amount, style) in zip(order_ids, legs)])
 
     def combo_order_amount(self, contract, amount, style=MarketOrder()):
         ''' Place an order
@@ -604,10 +999,6 @@ class IBClient(object):
 
         if amount == 0:
             return -1
-        elif amount > 0:
-            action = 'BUY'
-        else:
-            action = 'SELL'
 
         if isinstance(contract, Contract):
             if len(contract.m_comboLegs) == 0:
@@ -615,22 +1006,7 @@ class IBClient(object):
         else:
             raise TypeError("contract must be a contract object")
 
-        # request next valid order ID from IB host; this request will update self.order_id
-        self.connection.reqIds(-1)  # note: input param is always ignored;
-        sleep(0.05)
-
-        order = Order()
-        order.m_orderId = self.order_id
-        order.m_client_id = self.client_id
-        order.m_action = action
-        order.m_totalQuantity = abs(amount)
-        order.m_orderType = style.order_type
-        if style.limit_price is not None:
-            order.m_lmtPrice = style.limit_price
-        if style.stop_price is not None:
-            order.m_auxPrice = style.stop_price
-
-        order.m_overridePercentageConstraints = True  # override TWS order size constraints
+        order = self._new_order(self.request_order_id(), amount, style)
         '''
         # Advanced configuration. Not tested yet.
         if style.is_combo_order:
@@ -640,38 +1016,109 @@ class IBClient(object):
                 tag.m_value = "1"
                 order.m_smartComboRoutingParams = [tag]
         '''
-        self.connection.placeOrder(self.order_id, contract, order)
-        return self.order_id
+        return self._place_order(order.m_orderId, contract, amount, style, order).order_id
 
-    def order_value(self, contract, value, style):
-        ''' Reserve for future implementation
+    def order_value(self, contract, value, style=MarketOrder(), price=None):
+        ''' Place an order for a value of a security instead of a number of shares.
+            The amount is value / price rounded toward zero.
 
-        :param contract:
-        :param value:
-        :param style:
-        :return:
+        :param contract: A IB Contract object.
+        :param value: Value of shares to order. Positive means buy, negative means sell.
+        :param style: market order or limited order
+        :param price: price of the security; None to use the last price of the position in self.portfolio
+        :return: order ID; -1 if the amount is 0
         '''
-        pass
+        prices = self._order_prices([contract], None if price is None else [price])
+        return self.order_amount(contract, int(value_to_amount(value, prices)[0]), style)
 
-    def order_target(self, contract, amount, style):
+    def order_target(self, contract, amount, style=MarketOrder()):
         ''' Places an order to adjust a position to a target number of shares.
 
-        :param contract:
-        :param value:
-        :param style:
-        :return:
+        :param contract: A IB Contract object.
+        :param amount: target number of shares. Negative means short.
+        :param style: market order or limited order
+        :return: order ID; -1 if the position is at target already
         '''
-        pass
+        current = self._position_amounts([contract])
+        return self.order_amount(contract, int(order_deltas(current, [amount])[0]), style)
 
-    def order_target_value(self, contract, amount, style):
+    def order_target_value(self, contract, value, style=MarketOrder(), price=None):
         ''' Places an order to adjust a position to a target value.
 
-        :param contract:
-        :param value:
-        :param style:
-        :return:
+        :param contract: A IB Contract object.
+        :param value: target value of the position. Negative means short.
+        :param style: market order or limited order
+        :param price: price of the security; None to use the last price of the position in self.portfolio
+        :return: order ID; -1 if the position is at target already
+        '''
+        prices = self._order_prices([contract], None if price is None else [price])
+        return self.order_target(contract, int(value_to_amount(value, prices)[0]), style)
+
+    def order_targets(self, contracts, amounts, style=MarketOrder()):
+        ''' Adjust the positions of many securities to target numbers of shares in one basket.
+            Positions in securities which are not in contracts are left unchanged.
+
+        :param contracts: list of IB Contract objects
+        :param amounts: target numbers of shares, aligned with contracts
+        :param style: market order or limited order, used for all orders
+        :return: an OrderBasket, see order_basket()
         '''
-        pass
+        deltas = order_deltas(self._position_amounts(contracts), amounts)
+        return self.order_basket(zip(contracts, deltas.tolist(), [style] * len(contracts)))
+
+    def order_target_values(self, contracts, values, style=MarketOrder(), prices=None):
+        ''' Adjust the positions of many securities to target values in one basket; see order_targets()
+
+        :param contracts: list of IB Contract objects
+        :param values: target values of the positions, aligned with contracts
+        :param style: market order or limited order, used for all orders
+        :param prices: prices aligned with contracts; None or NaN entries use the last prices of the positions
+        :return: an OrderBasket, see order_basket()
+        '''
+        amounts = value_to_amount(values, self._order_prices(contracts, prices))
+        return self.order_targets(contracts, amounts, style)
+
+    def order_target_weights(self, contracts, weights, style=MarketOrder(), prices=None, portfolio_value=None):
+        ''' Rebalance the portfolio to target weights in one basket; see order_targets()
+
+        :param contracts: list of IB Contract objects
+        :param weights: target weights, i.e. fractions of portfolio_value, aligned with contracts; 0 closes a position
+        :param style: market order or limited order, used for all orders
+        :param prices: prices aligned with contracts; None or NaN entries use the last prices of the positions
+        :param portfolio_value: value the weights apply to; None to use self.portfolio.portfolio_value
+        :return: an OrderBasket, see order_basket()
+        '''
+        if portfolio_value is None:
+            portfolio_value = self._get_portfolio().portfolio_value
+        amounts = weight_to_amount(weights, self._order_prices(contracts, prices), portfolio_value)
+        return self.order_targets(contracts, amounts, style)
+
+    def _get_portfolio(self):
+        if self.portfolio is None:
+            raise RuntimeError('no portfolio to size orders against; call setup_account() first')
+        return self.portfolio
+
+    def _position_amounts(self, contracts):
+        ''' Current amounts of the positions in contracts as an int64 array '''
+        return self._get_portfolio().amounts([Portfolio.position_key(contract) for contract in contracts])
+
+    def _order_prices(self, contracts, prices=None):
+        ''' Prices of contracts as a float64 array; missing prices are taken from the positions in self.portfolio '''
+        if prices is None:
+            prices = np.full(len(contracts), np.nan)
+        else:
+            prices = np.array(prices, dtype=np.float64)
+            if prices.shape != (len(contracts),):
+                raise ValueError('prices must be aligned with contracts')
+        missing = np.isnan(prices)
+        if missing.any() and self.portfolio is not None:
+            keys = [Portfolio.position_key(contract) for contract in contracts]
+            prices[missing] = self.portfolio.prices(keys)[missing]
+            missing = np.isnan(prices)
+        if missing.any():
+            symbols = [contracts[i].m_symbol for i in np.flatnonzero(missing)]
+            raise ValueError('no price for {}'.format(', '.join(symbols)))
+        return prices
 
     def modify_order(self, order_id, contract, amount, style=MarketOrder()):
         ''' Change amount or order type (including limited price for limtied orders)
@@ -686,10 +1133,6 @@ class IBClient(object):
 
         if amount == 0:
             return -1
-        elif amount > 0:
-            action = 'BUY'
-        else:
-            action = 'SELL'
 
         if not self.connected:
             raise RuntimeError('IB client is not connected to TWS')
@@ -697,22 +1140,14 @@ class IBClient(object):
         if not isinstance(contract, Contract):
             raise TypeError("contract must be a contract object")
 
-        order = Order()
-        order.m_orderId = order_id
-        order.m_client_id = self.client_id
-        order.m_action = action
-        order.m_totalQuantity = abs(amount)
-        order.m_orderType = style.order_type
-        if style.limit_price is not None:
-            order.m_lmtPrice = style.limit_price
-        if style.stop_price is not None:
-            order.m_auxPrice = style.stop_price
-        order.m_overridePercentageConstraints = True  # override TWS order size constraints
+        order = self._new_order(order_id, amount, style)
+        handle = self.order_handles.get((self.client_id, order_id))
+        if handle is not None:
+            handle.amount = amount
 
         # place order
-        self.connection.placeOrder(self.order_id, contract, order)
-        # TODO: wait for returns from orderStatus
-        return self.order_id
+        self._send_request(RequestClass.ORDER, 'placeOrder', order_id, contract, order)
+        return order_id
 
     def cancel_order(self, order):
         ''' Attempts to cancel the specified order. Cancel is attempted asynchronously.
@@ -729,7 +1164,7 @@ class IBClient(object):
             order_id = order.m_orderId
         else:
             raise TypeError("order must be a order_id (int) or order object")
-        self.connection.cancelOrder(order_id)
+        self._send_request(RequestClass.ORDER, 'cancelOrder', order_id)
 
     def get_open_orders(self):
         ''' Attempts to get all open orders.
@@ -749,7 +1184,7 @@ class IBClient(object):
 
         # self.connection.reqOpenOrders()
         # self.reqAutoOpenOrders(True)
-        self.connection.reqAllOpenOrders()
+        self._send_request(RequestClass.ORDER, 'reqAllOpenOrders')
 
         max_wait_time = 3.
         self.get_order_event.wait(max_wait_time)
@@ -777,9 +1212,84 @@ class IBClient(object):
 
         # TODO: check self.IB_acct_id before using it
         # request IB host (e.g. TWS) push account info to IB client (socket client)
-        self.connection.reqAccountUpdates(True, self.account.account_id)
+        self.portfolio_ready.clear()
+        self._send_request(RequestClass.ACCOUNT, 'reqAccountUpdates', True, self.account.account_id)
         return
 
+    def get_account_snapshot(self):
+        ''' Return the latest AccountSnapshot, a consistent copy of the account values published once per batch
+            of account updates; None before the first batch
+        '''
+        return self.account.snapshot if self.account is not None else None
+
+    def wait_portfolio_ready(self, timeout=None):
+        ''' Block until TWS sent all account values and positions after enable_account_info_update(),
+            i.e. until accountDownloadEnd; return False on timeout
+        '''
+        return self.portfolio_ready.wait(timeout)
+
+    def request_positions(self, max_wait_time=5):
+        ''' Request the positions of all accounts (reqPositions) and wait for positionEnd.
+            The positions of self.portfolio's account update self.portfolio; TWS keeps sending changes until
+            cancel_positions().
+
+        :param max_wait_time: max number of seconds to wait for positionEnd
+        :return: DataFrame of the positions, see Portfolio.position_frame; None on timeout
+        '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+        if self.portfolio is None:
+            raise RuntimeError('no portfolio to update; call setup_account() first')
+
+        self.positions_end_event.clear()
+        self._send_request(RequestClass.ACCOUNT, 'reqPositions')
+        if not self.positions_end_event.wait(max_wait_time):
+            return None
+        return self.portfolio.position_frame()
+
+    def get_managed_accounts(self, max_wait_time=5):
+        ''' Return the accounts of the login, e.g. all accounts of an FA login.
+            TWS sends them right after connecting; they are requested again only if they did not arrive.
+        '''
+        if not self.managed_accounts_event.is_set():
+            if not self.connected:
+                raise RuntimeError('IB client is not connected to TWS')
+            self._send_request(RequestClass.ACCOUNT, 'reqManagedAccts')
+            self.managed_accounts_event.wait(max_wait_time)
+        return list(self.managed_accounts)
+
+    def request_account_summary(self, tags=AccountSummaryTable.DEFAULT_TAGS, group='All', max_wait_time=5):
+        ''' Subscribe the account summary of all accounts of group in one request (reqAccountSummary),
+            instead of one reqAccountUpdates stream per account. TWS sends the values of all accounts, then
+            accountSummaryEnd, and then changes every 3 minutes until cancel_account_summary().
+
+        :param tags: account summary tags, e.g. 'NetLiquidation', 'BuyingPower'
+        :param group: 'All' for all managed accounts, or the name of an FA group
+        :param max_wait_time: max number of seconds to wait for accountSummaryEnd
+        :return: (request ID, AccountSummaryTable); the table's ready event is not set on timeout
+        '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+
+        __id = self.__get_new_request_id()
+        table = AccountSummaryTable(__id, group, tags)
+        self.account_summaries[__id] = table
+        self._send_request(RequestClass.ACCOUNT, 'reqAccountSummary', __id, group, ','.join(table.tags))
+        table.ready.wait(max_wait_time)
+        return __id, table
+
+    def cancel_account_summary(self, req_id):
+        ''' Stop the account summary subscription of request_account_summary() '''
+        table = self.account_summaries.pop(req_id, None)
+        if table is not None and self.connected:
+            self._send_request(RequestClass.CANCEL, 'cancelAccountSummary', req_id)
+
+    def cancel_positions(self):
+        ''' Stop the position updates of request_positions() '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+        self._send_request(RequestClass.CANCEL, 'cancelPositions')
+
     def disable_account_info_update(self):
         ''' Turn off auto account update, meaning IB socket host will stop pushing account info
          to IB socket client.
@@ -789,7 +1299,7 @@ class IBClient(object):
 
         # TODO: check self.IB_acct_id before using it
         # stop IB host (e.g. TWS) to push account info to IB client (socket client)
-        self.connection.reqAccountUpdates(False, self.account.account_id)
+        self._send_request(RequestClass.ACCOUNT, 'reqAccountUpdates', False, self.account.account_id)
         return
 
     #
@@ -803,39 +1313,15 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        return self._wait_status(self.get_financial_statements_async(symbol), max_wait_time)
 
-        __id = self.__get_new_request_id()
+    def get_financial_statements_async(self, symbol):
+        ''' Request a company's financial statements without waiting; see get_financial_statements
 
-        request = RequestDetails('reqFundamentalData', 'ReportsFinStatements', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
-
-        self.connection.reqFundamentalData(__id, contract, 'ReportsFinStatements')
-
-        response.event.wait(max_wait_time)
-        raw_xml = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # covert from xml to dest. format
-                raw_xml = copy(response.fundamental_data)
-            else:
-                pass  # raise RuntimeError('get_financial_statements: reqFundamentalData got error. Security=%s Reason:%s' % (symbol, response.error_msg))
-        else:
-            # Timeout
-            pass  # ('get_financial_statements: reqFundamentalData is timeout. Security=%s' % symbol)
-
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-        return status, raw_xml
+        :return:
+            a RequestFuture; its result is a string of financial statements
+        '''
+        return self._request_fundamental_data_async(symbol, 'ReportsFinStatements', 'ReportsFinStatements')
 
     def get_company_ownership(self, symbol, max_wait_time=60.0 * 5):
         ''' Get a company's ownership report
@@ -846,39 +1332,16 @@ class IBClient(object):
         :return:
             a string of ownership report
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            # For US stock only
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
-
-        __id = self.__get_new_request_id()
+        return self._wait_status(self.get_company_ownership_async(symbol), max_wait_time)
 
-        request = RequestDetails('reqFundamentalData', 'ReportsOwnership', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
-
-        self.connection.reqFundamentalData(__id, contract, 'ReportsOwnership')
-
-        response.event.wait(max_wait_time)
-        report = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # covert from xml to dest. format
-                report = parse_ownership_report(response.fundamental_data)
-            else:
-                pass  # ('get_company_ownership: reqFundamentalData got error. Security=%s Reason:%s' % (symbol, response.error_msg))
-        else:
-            pass  # ('get_company_ownership: reqFundamentalData is timeout. Security=%s' % symbol)
+    def get_company_ownership_async(self, symbol):
+        ''' Request a company's ownership report without waiting; see get_company_ownership
 
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-        return status, report
+        :return:
+            a RequestFuture; its result is the parsed ownership report
+        '''
+        return self._request_fundamental_data_async(symbol, 'ReportsOwnership', 'ReportsOwnership',
+                                                    finish=parse_ownership_report)
 
     def get_analyst_estimates(self, symbol, max_wait_time=20):
         ''' Get analyst estimates report for a company
@@ -888,38 +1351,16 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
+        return self._wait_status(self.get_analyst_estimates_async(symbol), max_wait_time)
 
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
-
-        __id = self.__get_new_request_id()
-
-        request = RequestDetails('reqFundamentalData', 'RESC-Analyst Estimates', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+    def get_analyst_estimates_async(self, symbol):
+        ''' Request analyst estimates report for a company without waiting; see get_analyst_estimates
 
-        self.connection.reqFundamentalData(__id, contract, 'RESC')
-
-        response.event.wait(max_wait_time)
-        report = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # covert from xml to dest. format
-                report = parse_analyst_estimates(response.fundamental_data)
-            else:
-                pass  # ('get_analyst_estimates: reqFundamentalData got error. Security=%s Reason:%s' % (symbol, response.error_msg))
-        else:
-            pass  # ('get_analyst_estimates: reqFundamentalData is timeout. Security=%s' % symbol)
-
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-        return status, report
+        :return:
+            a RequestFuture; its result is the parsed analyst estimates
+        '''
+        return self._request_fundamental_data_async(symbol, 'RESC', 'RESC-Analyst Estimates',
+                                                    finish=parse_analyst_estimates)
 
     def get_company_overview(self, symbol, max_wait_time=10):
         ''' Get company overview infomration
@@ -929,41 +1370,17 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        # ReportsFinSummary	Financial summary
-
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        return self._wait_status(self.get_company_overview_async(symbol), max_wait_time)
 
-        __id = self.__get_new_request_id()
-
-        request = RequestDetails('reqFundamentalData', 'ReportSnapshot-Company overview', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+    def get_company_overview_async(self, symbol):
+        ''' Request company overview infomration without waiting; see get_company_overview
 
+        :return:
+            a RequestFuture; its result is a string of company overview
+        '''
         # ReportSnapshot	Company's financial overview
-        self.connection.reqFundamentalData(__id, contract, 'ReportSnapshot')
-
-        response.event.wait(max_wait_time)
-        report = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # TODO: covert from xml to dest. format
-                report = response.fundamental_data
-            else:
-                pass  # ('get_analyst_estimates: reqFundamentalData got error. Security=%s Reason:%s' % (symbol, response.error_msg))
-        else:
-            pass  # ('get_analyst_estimates: reqFundamentalData is timeout. Security=%s' % symbol)
-
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-        return status, report
+        # TODO: covert from xml to dest. format
+        return self._request_fundamental_data_async(symbol, 'ReportSnapshot', 'ReportSnapshot-Company overview')
 
     def get_financial_summary(self, symbol, max_wait_time=10):
         ''' Get company finanical summary information, such as revenue history, net profit, and dividends history.
@@ -973,38 +1390,16 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        return self._wait_status(self.get_financial_summary_async(symbol), max_wait_time)
 
-        __id = self.__get_new_request_id()
-
-        request = RequestDetails('reqFundamentalData', 'ReportsFinSummary-Financial summary', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
-
-        self.connection.reqFundamentalData(__id, contract, 'ReportsFinSummary')
+    def get_financial_summary_async(self, symbol):
+        ''' Request company finanical summary information without waiting; see get_financial_summary
 
-        response.event.wait(max_wait_time)
-        report = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # TODO: covert from xml to dest. format
-                report = response.fundamental_data
-            else:
-                pass
-        else:
-            pass
-
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-        return status, report
+        :return:
+            a RequestFuture; its result is a string of financial summary
+        '''
+        # TODO: covert from xml to dest. format
+        return self._request_fundamental_data_async(symbol, 'ReportsFinSummary', 'ReportsFinSummary-Financial summary')
 
     def get_financial_ratios(self, symbol, max_wait_time=5):
         ''' Get analyst estimates report for a company
@@ -1014,22 +1409,14 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        return self._wait_status(self.get_financial_ratios_async(symbol), max_wait_time, 'cancelMktData')[1]
 
-        __id = self.__get_new_request_id()
-
-        request = RequestDetails('reqFundamentalData', 'RESC-Analyst Estimates', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+    def get_financial_ratios_async(self, symbol):
+        ''' Request financial ratios of a company without waiting; see get_financial_ratios
 
+        :return:
+            a RequestFuture; its result is a string of financial ratios
+        '''
         # 258 - financial ratios
         '''
             TTMNPMGN=16.1298;NLOW=80.6;TTMPRCFPS=6.26675;TTMGROSMGN=60.76731;TTMCFSHR=15.004
@@ -1046,15 +1433,8 @@ class IBClient(object):
             6.66885;CURRENCY=HKD;DIVGRPCT=-8.33887;TTMEPSCHG=-32.80548;PEEXCLXOR=11.00609;QQUICKRATI=1.30087;
             TTMREVPS=67.30638;BETA=0.90979;TTMEBT=46463;ADIV5YAVG=3.1048;ANIACNORM=33008;QLTD2EQ=55.46377;NHIG=103.9
         '''
-        report = None
-        self.connection.reqMktData(__id, contract, "258", False)
-        response.event.wait(max_wait_time)
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # TODO: convert the format to a table alike
-                report = response.tick_str
-
-        return report
+        # TODO: convert the format to a table alike
+        return self._request_generic_tick_async(symbol, "258", 'RESC-Analyst Estimates')
 
     def get_dividends_info(self, symbol, max_wait_time=5):
         ''' Get analyst estimates report for a company
@@ -1064,21 +1444,14 @@ class IBClient(object):
         :return:
             a string of financial statements
         '''
-        if not self.connected:
-            raise RuntimeError('IB client is not connected to TWS')
-
-        if isinstance(symbol, Contract):
-            contract = symbol
-        elif isinstance(symbol, str):
-            contract = new_stock_contract(symbol)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        return self._wait_status(self.get_dividends_info_async(symbol), max_wait_time, 'cancelMktData')[1]
 
-        __id = self.__get_new_request_id()
-        request = RequestDetails('reqFundamentalData', 'RESC-Analyst Estimates', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
+    def get_dividends_info_async(self, symbol):
+        ''' Request dividends information of a company without waiting; see get_dividends_info
 
+        :return:
+            a RequestFuture; its result is a set of dividends information
+        '''
         # IB Dividends ("456")
         #
         # This tick type provides four different comma-separated elements:
@@ -1087,17 +1460,78 @@ class IBClient(object):
         # The next dividend date (20130219 in the example below).
         # The next single dividend amount (0.23 from the example below).
         # Example: 0.83,0.92,20130219,0.23
-        self.connection.reqMktData(__id, contract, "456", False)
-        result = None
-        response.event.wait(max_wait_time)
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                # TODO: convert the format
-                result = set(response.tick_str.split(','))
+        # TODO: convert the format
+        return self._request_generic_tick_async(symbol, "456", 'RESC-Analyst Estimates',
+                                                finish=lambda tick_str: set(tick_str.split(',')))
+
+    def _request_fundamental_data_async(self, symbol, report_type, req_type, finish=None):
+        ''' Send reqFundamentalData and return a RequestFuture of the report
+
+        :param:
+            symbol: stock symbol string, e.g. 'IBM'; or a IB contract object
+            report_type: reportType of reqFundamentalData, e.g. 'ReportsFinStatements'
+            req_type: description of the request in RequestDetails
+            finish: callable converting the xml string to the result; None returns the xml string
+        :return:
+            a RequestFuture
+        '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+        contract = self._make_contract(symbol)
+
+        __id = self.__get_new_request_id()
+        request = RequestDetails('reqFundamentalData', req_type, contract)
+        future = self.ipc_msg_dict.register(
+            __id, request, ResponseDetails(),
+            finish=lambda response: response.fundamental_data if finish is None else finish(response.fundamental_data))
 
-        self.ipc_msg_dict.pop(__id)
+        self._send_request(RequestClass.FUNDAMENTAL, 'reqFundamentalData', __id, contract, report_type)
+        return future
 
-        return result
+    def _request_generic_tick_async(self, symbol, generic_tick, req_type, finish=None):
+        ''' Subscribe a generic tick, e.g. "258" financial ratios, and return a RequestFuture of its tickString.
+            IBMsgWrapper.tickString cancels the subscription once the value arrived.
+        '''
+        if not self.connected:
+            raise RuntimeError('IB client is not connected to TWS')
+        contract = self._make_contract(symbol)
+
+        __id = self.__get_new_request_id()
+        request = RequestDetails('reqFundamentalData', req_type, contract)
+        future = self.ipc_msg_dict.register(
+            __id, request, ResponseDetails(),
+            finish=lambda response: response.tick_str if finish is None else finish(response.tick_str))
+
+        self._send_request(RequestClass.MARKET_DATA, 'reqMktData', __id, contract, generic_tick, False)
+        return future
+
+    def _wait_status(self, future, max_wait_time, cancel_method=None):
+        ''' Wait for a RequestFuture and return (status, result) like the blocking methods always did:
+            (ResponseDetails.STATUS_FINISHED, result) on success, (error code, None) if TWS rejected the request,
+            and (-1, None) on timeout. A timeout cancels the future, which removes it from ipc_msg_dict.
+
+        :param:
+            future: a RequestFuture
+            max_wait_time: max number of seconds to wait
+            cancel_method: EClientSocket method to cancel the request at TWS on timeout, e.g. 'cancelMktData'
+        '''
+        try:
+            return ResponseDetails.STATUS_FINISHED, future.result(max_wait_time)
+        except IBRequestError as e:
+            return e.code, None
+        except FutureTimeoutError:
+            future.cancel()
+            if cancel_method is not None and self.connected:
+                self._send_request(RequestClass.CANCEL, cancel_method, future.req_id)
+            return future.response.status, None
+
+    def _make_contract(self, contract):
+        ''' Return contract itself, or a U.S. stock contract for a symbol string '''
+        if isinstance(contract, Contract):
+            return contract
+        elif isinstance(contract, str):
+            return new_stock_contract(contract)
+        raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
 
     def get_contract_details(self, contract, max_wait_time=5):
         """ Get contract details for a specified contract
@@ -1107,39 +1541,28 @@ class IBClient(object):
             status: a reference to the tick data dictionary which will be updated with latest quote.
             contract_details: a contractDetails instance
         """
-        if isinstance(contract, Contract):
-            pass
-        elif isinstance(contract, str):
-            contract = new_stock_contract(contract)
-        else:
-            raise TypeError("contract must be a contract object or string (for U.S. stocks only).")
+        status, contract_list = self._wait_status(self.get_contract_details_async(contract), max_wait_time)
+        contract_details = contract_list[0] if contract_list else None
+        return status, contract_details
 
+    def get_contract_details_async(self, contract):
+        """ Request contract details without waiting; see get_contract_details
+        Args:
+            contract: a legal IBPY Contract object or a string for U.S. stock only
+        Returns:
+            a RequestFuture; its result is a list of contractDetails instances
+        """
+        contract = self._make_contract(contract)
         if not self.connected:
             raise RuntimeError('IB client is not connected to TWS')
 
         __id = self.__get_new_request_id()
         request = RequestDetails('reqContractDetails', '', contract)
-        response = ResponseDetails()
-        self.ipc_msg_dict[__id] = (request, response)
-
-        # False - indicating request live quotes instead of a snapshot
-        self.connection.reqContractDetails(__id, contract)
-
-        response.event.wait(max_wait_time)
-        contract_details = None
-        if response.event.is_set():
-            if response.status == ResponseDetails.STATUS_FINISHED:
-                if len(response.contract_list) > 0:
-                    contract_details = copy(response.contract_list[0])
-            else:
-                pass
-        else:
-            pass
+        future = self.ipc_msg_dict.register(__id, request, ResponseDetails(),
+                                            finish=lambda response: list(response.contract_list))
 
-        status = response.status
-        self.ipc_msg_dict.pop(__id)
-
-        return status, contract_details
+        self._send_request(RequestClass.CONTRACT, 'reqContractDetails', __id, contract)
+        return future
 
     def get_full_contract(self, contract):
         """ Subscribe tick data for a specified contract
@@ -1174,7 +1597,7 @@ class IBClient(object):
 
         __id = self.__get_new_request_id()
         self.market_depth_buffer[__id] = MarketDepth(__id)
-        self.connection.reqMktDepth(__id, contract, num_rows)
+        self._send_request(RequestClass.MARKET_DATA, 'reqMktDepth', __id, contract, num_rows)
 
         return __id, self.market_depth_buffer[__id]
 
@@ -1190,7 +1613,7 @@ class IBClient(object):
             raise RuntimeError('IB client is not connected to TWS')
 
         if request_id in self.market_depth_buffer.keys():
-            self.connection.cancelMktDepth(request_id)
+            self._send_request(RequestClass.CANCEL, 'cancelMktDepth', request_id)
             data = self.market_depth_buffer.pop(request_id)
             return data
         else:
@@ -10,14 +10,16 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
-import pytz
-from datetime import datetime
-from copy import copy
+from time import monotonic, time as time_now
 
 from ib.ext.EWrapper import EWrapper
 from ib.ext.EClientErrors import EClientErrors
-from .utils import (RequestDetails,ResponseDetails,CodeMsgPair, IBSystemErrors)
-from .account import (Account, Position, Portfolio)
+from .utils import (RequestDetails,CodeMsgPair, IBSystemErrors, IBRequestError, REQUEST_ERROR_CODES,
+                    ORDER_ID_ERROR_CODES)
+from .utils.pacing import RequestClass
+from .utils.timestamps import (parse_bar_time, NS_PER_SEC)
+from .utils.order_latency import (OPEN_ORDER, EXEC_DETAILS, COMMISSION_REPORT, STATUS_PREFIX)
+from .account import (Position, Portfolio)
 from .constants import *
 from .orders import OrderExecution
 
@@ -35,46 +37,44 @@ class IBMsgWrapper(EWrapper):
     #
     def historicalData(self, reqId, date, open, high, low, close, volume, count, WAP, hasGaps):
         ''' This callback function handles message.historicalData generated by reqHistoricalData API.
-            This handler parse price history data and append the record (type tuple) to data buffer list.
+            This handler parse price history data and append the record to the BarBuffer of the request.
+            The bar time is decoded to int64 nanoseconds as the bar arrives; see parse_bar_time.
 
         Returns:
             None
         '''
         #print((date, open, high, low, close, volume)
-        if reqId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[reqId][0]
-            response = self.ib_client.ipc_msg_dict[reqId][1]
-        else:
+        entry = self.ib_client.ipc_msg_dict.get(reqId)
+        if entry is None:
             print('historicalData: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId))
             return
+        response = entry[1]
 
         if int(high) != -1:
-            response.price_hist.append((date, open, high, low, close, volume))
+            response.price_hist.append(parse_bar_time(date, self.ib_client.server_timezone), open, high, low, close, volume)
         else:
             # end of receiving data
-            response.status = ResponseDetails.STATUS_FINISHED
-            response.event.set()
+            self.ib_client.ipc_msg_dict.finish(reqId)
 
     def realtimeBar(self, reqId, time, open, high, low, close, volume, wap, count):
-        """ generated source for method realtimeBar """
+        """ This callback function handles message.realtimeBar generated by reqRealTimeBars API.
+            time is in epoch seconds and stored as int64 nanoseconds (UTC). The BarBuffer of the
+            request carries the exchange timezone, and times are only formatted when read, see BarBuffer.to_frame.
+            The bar also feeds the BarAggregator of the subscription, if any.
+        """
         #print((reqId, time, open, high, low, close, volume)
 
-        if reqId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[reqId][0]
-            response = self.ib_client.ipc_msg_dict[reqId][1]
-        else:
+        # one lookup: cancel_realtime_price may remove the request between a membership test and an index
+        entry = self.ib_client.ipc_msg_dict.get(reqId)
+        if entry is None:
             print('realtimeBar: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId))
             return
+        response = entry[1]
 
-        # convert the time to market/exchange time
-        time = datetime.fromtimestamp(time)
-        exchange = request.contract.m_exchange
-        server_timezone = pytz.timezone("Asia/Shanghai")                        # timezone where the server runs
-        mkt_timezone = pytz.timezone(IBEXCHANGE.get_timezone(exchange))         # Get Exchange's timezone
-        adj_time = server_timezone.localize(time).astimezone(mkt_timezone)      # covert server time to Exchange's time
-        adj_time = adj_time.strftime("%Y%m%d %H:%M:%S")                          # from datetime to string
-
-        response.rt_price.append((adj_time, open, high, low, close, volume))
+        time = int(time) * NS_PER_SEC
+        response.rt_price.append(time, open, high, low, close, volume)
+        if response.bar_aggregator is not None:
+            response.bar_aggregator.update(time, open, high, low, close, volume)
         return
     #
     # Order message callbacks
@@ -85,6 +85,7 @@ class IBMsgWrapper(EWrapper):
         if clientId != self.ib_client.client_id:
             return
         key = (clientId, orderId)
+        self.ib_client.order_latency.mark(key, STATUS_PREFIX + status)
 
         if key not in self.ib_client.order_history:
             self.ib_client.order_history[key] = {}
@@ -102,6 +103,10 @@ class IBMsgWrapper(EWrapper):
                            clientId, whyHeld)
         #print(self.ib_client.order_history[key])
 
+        handle = self.ib_client.order_handles.get(key)
+        if handle is not None:
+            handle.update(status, filled, remaining, avgFillPrice, lastFillPrice)
+
     def openOrder(self, orderId, contract, order, orderState):
         """ generated source for method openOrder """
         clientId = order.m_clientId
@@ -109,6 +114,7 @@ class IBMsgWrapper(EWrapper):
             return
 
         key = (clientId, orderId)
+        self.ib_client.order_latency.mark(key, OPEN_ORDER)
         if key not in self.ib_client.order_history:
             self.ib_client.order_history[key] = {}
 
@@ -122,27 +128,20 @@ class IBMsgWrapper(EWrapper):
 
     def nextValidId(self, orderId):
         """ Get nextValid Order Id from IB host and update the order ID to the IB client instance"""
-        self.ib_client.order_id_cond.acquire()
-        # print("nextValidId: {}".format(orderId))
-
         self.ib_client.order_id = orderId
-        self.ib_client.order_id_cond.notify()
-        self.ib_client.order_id_cond.release()
+        self.ib_client.order_ids.seed(orderId)
 
     #
     # Fundamental Data Handler
     #
     def fundamentalData(self, reqId, data):
         """ generated source for method fundamentalData """
-        if reqId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[reqId][0]
-            response = self.ib_client.ipc_msg_dict[reqId][1]
-        else:
+        entry = self.ib_client.ipc_msg_dict.get(reqId)
+        if entry is None:
             print('fundamentalData: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId))
             return
-        response.fundamental_data = data
-        response.status = ResponseDetails.STATUS_FINISHED
-        response.event.set()
+        entry[1].fundamental_data = data
+        self.ib_client.ipc_msg_dict.finish(reqId)
 
     #
     # Tick messages handler
@@ -154,15 +153,18 @@ class IBMsgWrapper(EWrapper):
             print('tickPrice', tickerId, field, price)
             return
 
-        if tickerId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[tickerId][0]
-            response = self.ib_client.ipc_msg_dict[tickerId][1]
-        else:
+        # a single lookup: the entry of a snapshot may be removed by its settle timer at any time
+        entry = self.ib_client.ipc_msg_dict.get(tickerId)
+        if entry is None:
             print('tickPrice: reqId(%s) is not in ib_client.ipc_msg_dict' % str(tickerId))
             return
+        response = entry[1]
 
         field_id = TICK_FIELDS[field]
         response.tick_data[field_id] = price
+        response.last_update = monotonic()
+        if response.tick_history is not None:
+            response.tick_history.append(int(time_now() * NS_PER_SEC), field_id, price)
         return
 
     def tickSize(self, tickerId, field, size):
@@ -172,15 +174,18 @@ class IBMsgWrapper(EWrapper):
         if field not in TICK_FIELDS:
             return
 
-        if tickerId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[tickerId][0]
-            response = self.ib_client.ipc_msg_dict[tickerId][1]
-        else:
+        # a single lookup: the entry of a snapshot may be removed by its settle timer at any time
+        entry = self.ib_client.ipc_msg_dict.get(tickerId)
+        if entry is None:
             print('tickSize: reqId(%s) is not in ib_client.ipc_msg_dict' % str(tickerId))
             return
+        response = entry[1]
 
         field_id = TICK_FIELDS[field]
         response.tick_data[field_id] = size
+        response.last_update = monotonic()
+        if response.tick_history is not None:
+            response.tick_history.append(int(time_now() * NS_PER_SEC), field_id, size)
         return
 
     def tickOptionComputation(self, tickerId, field, impliedVol, delta, optPrice, pvDividend, gamma, vega, theta, undPrice):
@@ -203,21 +208,21 @@ class IBMsgWrapper(EWrapper):
         # IB_TICK_ID_DIVIDENDS    = 59
         # IB_TICK_ID_NEWS         = 62
 
-        if tickerId not in self.ib_client.ipc_msg_dict:
+        entry = self.ib_client.ipc_msg_dict.get(tickerId)
+        if entry is None:
             print('tickString: reqId(%s) is not in ib_client.ipc_msg_dict' % str(tickerId))
             return
         if tickType not in TICK_STRING_TYPES:
             print('tickString: tickType(%s) is not in target list: %s' % (str(tickType), TICK_STRING_TYPES))
             return
 
-        request = self.ib_client.ipc_msg_dict[tickerId][0]
-        response = self.ib_client.ipc_msg_dict[tickerId][1]
+        response = entry[1]
         response.tick_str = value
 
         if tickType == TICK_TYPE_FIN_RATIOS or tickType == TICK_TYPE_DIVIDENDS:
-            response.event.set()
-            response.status = ResponseDetails.STATUS_FINISHED
-            self.ib_client.connection.cancelMktData(tickerId)
+            self.ib_client.ipc_msg_dict.finish(tickerId)
+            # a paced request would block the reader thread; send the cancel from another thread
+            self.ib_client._post_request(RequestClass.CANCEL, 'cancelMktData', tickerId)
 
         return
 
@@ -225,13 +230,15 @@ class IBMsgWrapper(EWrapper):
         """ generated source for method tickSnapshotEnd """
         # print('tickSnapshotEnd:', reqId
 
-        # if reqId in self.ib_client.ipc_msg_dict:
-        #     response = self.ib_client.ipc_msg_dict[reqId][1]
-        #     response.snapshot_req_end.set()
-        # else:
-        #     print('tickSnapshotEnd: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId)
+        entry = self.ib_client.ipc_msg_dict.get(reqId)
+        if entry is None:
+            print('tickSnapshotEnd: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId))
+            return
 
-        self.ib_client.tick_snapshot_req_end.set()
+        # tickPrice() and tickSize() may write after tickSnapshotEnd(); take the snapshot once the ticks of this
+        # request settled, within its own grace window, so other snapshots in flight are not held up
+        quiet_time = entry[1].quiet_time
+        self.ib_client.ipc_msg_dict.settle(reqId, quiet_time, max(quiet_time, self.ib_client.tick_snapshot_settle_time))
         return
 
     def tickEFP(self, tickerId, tickType, basisPoints, formattedBasisPoints, impliedFuture, holdDays, futureExpiry, dividendImpact, dividendsToExpiry):
@@ -321,16 +328,16 @@ class IBMsgWrapper(EWrapper):
                     elif 'is broken' in errorMsg:
                         self.ib_client.hmdf_status_dict[farm] = 'BROKEN'
 
-        # Fundamentals Req
-        if errorCode == 200 or errorCode == 430:
+        # Errors which end a request, e.g. fundamentals and contract details requests
+        if errorCode in REQUEST_ERROR_CODES:
             # Sample: error: 3 200 No security definition has been found for the request
             # Sample: 4 430 We are sorry, but fundamentals data for the security specified is not available.failed to fetch
-            if id in self.ib_client.ipc_msg_dict:
-                response = self.ib_client.ipc_msg_dict[id][1]
-                response.request_id = id
-                response.status = errorCode
-                response.error_msg = errorMsg # 'RequestID=%d, ErrorCode=%d, Reason:%s' % (id, errorCode, errorMsg)
-                response.event.set()
+            self.ib_client.ipc_msg_dict.fail(id, IBRequestError(id, errorCode, errorMsg))
+
+        if errorCode in ORDER_ID_ERROR_CODES:
+            # Sample: error: 5 103 Duplicate order id
+            # the next request_order_id() asks TWS for nextValidId; no request is sent from the reader thread
+            self.ib_client.order_ids.invalidate()
 
         if errorCode == 399:
             # Sample: error: 1 399 Order Message:
@@ -356,7 +363,7 @@ class IBMsgWrapper(EWrapper):
     #
     def updateAccountValue(self, key, value, currency, accountName):
         """ generated source for method updateAccountValue """
-        if key in Account.KEYS:
+        if self.ib_client.account is not None:
             self.ib_client.account.update(key, value, currency, accountName)
 
     def updatePortfolio(self, contract, position, marketPrice, marketValue, averageCost, unrealizedPNL, realizedPNL, accountName):
@@ -385,36 +392,54 @@ class IBMsgWrapper(EWrapper):
         #         #self.ib_client.context.portfolio.update(symbol, contract, position, marketPrice, marketValue, averageCost, unrealizedPNL, realizedPNL, accountName)
         #         self.ib_client.portfolio.update_positions(symbol, contract, position, marketPrice,
         #                                                           marketValue, averageCost, unrealizedPNL, realizedPNL, accountName)
-        raise NotImplementedError
+        portfolio = self.ib_client.portfolio
+        if portfolio is None or accountName != portfolio.account.account_id:
+            return
+        portfolio.update_positions(Portfolio.position_symbol(contract), contract, position, marketPrice,
+                                   marketValue, averageCost, unrealizedPNL, realizedPNL, accountName)
 
     def updateAccountTime(self, timeStamp):
         """ generated source for method updateAccountTime """
         #print('updateAccountTime', timeStamp, type(timeStamp)
-        raise NotImplementedError
+        if self.ib_client.portfolio is not None:
+            self.ib_client.portfolio.account_time = timeStamp
+            self.ib_client.account.publish(timeStamp)
 
     def accountDownloadEnd(self, accountName):
-        """ generated source for method accountDownloadEnd """
-        raise NotImplementedError
+        """ All account values and positions of accountName were sent; see IBClient.wait_portfolio_ready """
+        portfolio = self.ib_client.portfolio
+        if portfolio is not None and accountName == portfolio.account.account_id:
+            portfolio.account.publish()
+            self.ib_client.portfolio_ready.set()
 
     def position(self, account, contract, pos, avgCost):
         """ generated source for method position """
         #print('postion', account, contract, pos, avgCost
-        raise NotImplementedError
+        portfolio = self.ib_client.portfolio
+        if portfolio is None or account != portfolio.account.account_id:
+            return
+        portfolio.update_position_amount(Portfolio.position_symbol(contract), contract, pos, avgCost)
 
     def positionEnd(self):
         """ generated source for method positionEnd """
         #print('positionEnd'
-        raise NotImplementedError
+        self.ib_client.positions_end_event.set()
 
     def accountSummary(self, reqId, account, tag, value, currency):
         """ generated source for method accountSummary """
         #print('accountSummary', reqId, account, tag, value, currency
-        raise NotImplementedError
+        table = self.ib_client.account_summaries.get(reqId)
+        if table is None:
+            print('accountSummary: reqId(%s) is not in ib_client.account_summaries' % str(reqId))
+            return
+        table.update(account, tag, value, currency)
 
     def accountSummaryEnd(self, reqId):
         """ generated source for method accountSummaryEnd """
         #print('accountSummaryEnd', reqId
-        raise NotImplementedError
+        table = self.ib_client.account_summaries.get(reqId)
+        if table is not None:
+            table.ready.set()
 
     #
     # Get Contract Info
@@ -442,25 +467,22 @@ class IBMsgWrapper(EWrapper):
 
     def contractDetailsEnd(self, reqId):
         """ generated source for method contractDetailsEnd """
-        if reqId in self.ib_client.ipc_msg_dict:
-            request = self.ib_client.ipc_msg_dict[reqId][0]
-            response = self.ib_client.ipc_msg_dict[reqId][1]
-        else:
+        if reqId not in self.ib_client.ipc_msg_dict:
             print('contractDetailsEnd: reqId(%s) is not in ib_client.ipc_msg_dict' % str(reqId))
             return
-        response.status = ResponseDetails.STATUS_FINISHED
-        response.event.set()
+        self.ib_client.ipc_msg_dict.finish(reqId)
 
     #
     # Others
     #
     def execDetails(self, reqId, contract, execution):
         """ generated source for method execDetails """
-        pass
+        key = self.ib_client.fills.add_execution(contract, execution)
+        self.ib_client.order_latency.mark(key, EXEC_DETAILS)
 
     def execDetailsEnd(self, reqId):
         """ generated source for method execDetailsEnd """
-        pass
+        self.ib_client.ipc_msg_dict.finish(reqId)
 
     def updateMktDepth(self, tickerId, position, operation, side, price, size):
         """ generated source for method updateMktDepth
@@ -510,8 +532,9 @@ class IBMsgWrapper(EWrapper):
         pass
 
     def managedAccounts(self, accountsList):
-        """ generated source for method managedAccounts """
-        pass
+        """ Comma separated list of the accounts of the login, sent after connecting and on reqManagedAccts """
+        self.ib_client.managed_accounts = [account for account in accountsList.split(',') if account]
+        self.ib_client.managed_accounts_event.set()
 
     def receiveFA(self, faDataType, xml):
         """ generated source for method receiveFA """
@@ -539,4 +562,6 @@ class IBMsgWrapper(EWrapper):
 
     def commissionReport(self, commissionReport):
         """ generated source for method commissionReport """
-        pass
+        key = self.ib_client.fills.add_commission(commissionReport)
+        if key is not None:
+            self.ib_client.order_latency.mark(key, COMMISSION_REPORT)
@@ -13,15 +13,32 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
+import asyncio
+import threading
+import traceback
+from concurrent.futures import Future
+from time import time as time_now
+
+import pandas as pd
 from ib.ext.Order import Order
 
 
 class OrderExecution():
     """ Order Execution Details """
-    Filled = "Filled"
+    ApiPending = "ApiPending"
+    PendingSubmit = "PendingSubmit"
+    PendingCancel = "PendingCancel"
     PreSubmitted = "PreSubmitted"
+    Submitted = "Submitted"
+    ApiCancelled = "ApiCancelled"
+    Cancelled = "Cancelled"
+    Filled = "Filled"
+    Inactive = "Inactive"
     NotFound = "NotFound"
 
+    # states after which TWS sends no more fills for an order
+    DONE_STATES = (Filled, Cancelled, ApiCancelled, Inactive)
+
     def __init__(self, orderId, status, filled, remaining,
                  avgFillPrice, permId, parentId,
                  lastFillPrice, clientId, whyHeld):
@@ -53,6 +70,203 @@ class OrderExecution():
             raise ValueError("Found clientId and/or orderId mismatch.")
 
 
+class OrderHandle(object):
+    """ Handle of an order placed by IBClient, e.g. with IBClient.place_order.
+
+        IBMsgWrapper.orderStatus drives its state through the OrderExecution states, e.g.
+        PendingSubmit -> PreSubmitted -> Submitted -> Filled. Once the order is in OrderExecution.DONE_STATES
+        (Filled, Cancelled, ApiCancelled or Inactive) late or duplicated messages no longer change its state.
+
+        Callers can block on wait_filled(timeout) / wait_for(states, timeout), register on_fill / on_status
+        callbacks, or await wait_filled_async(timeout) in asyncio code. Callbacks run on the socket reader thread.
+    """
+
+    def __init__(self, client_id, order_id, contract, amount):
+        """
+
+        :param client_id: client ID of the order
+        :param order_id: order ID
+        :param contract: IB Contract object of the order
+        :param amount: amount of the order; positive means buy, negative means sell
+        """
+        self.client_id = client_id
+        self.order_id = order_id
+        self.contract = contract
+        self.amount = amount
+
+        self.status = OrderExecution.PendingSubmit
+        self.filled = 0.
+        self.remaining = float(abs(amount))
+        self.avg_fill_price = 0.
+        self.last_fill_price = 0.
+        self.transitions = [(time_now(), self.status)]  # (timestamp, status) of each state change
+
+        # resolved with the handle itself once the order is in OrderExecution.DONE_STATES
+        self.future = Future()
+
+        self._cond = threading.Condition()
+        self._status_callbacks = []
+        self._fill_callbacks = []
+
+    @property
+    def done(self):
+        """ True if the order is filled, cancelled or inactive """
+        return self.status in OrderExecution.DONE_STATES
+
+    def update(self, status, filled, remaining, avg_fill_price, last_fill_price):
+        """ Apply an orderStatus message; called by IBMsgWrapper """
+        with self._cond:
+            if self.done and status != self.status:
+                return                          # a done order keeps its final state, e.g. no Cancelled after Filled
+            status_changed = status != self.status
+            fill_changed = float(filled) > self.filled
+            self.status = status
+            self.filled = float(filled)
+            self.remaining = float(remaining)
+            self.avg_fill_price = float(avg_fill_price)
+            self.last_fill_price = float(last_fill_price)
+            if status_changed:
+                self.transitions.append((time_now(), status))
+            self._cond.notify_all()
+            status_callbacks = list(self._status_callbacks) if status_changed else []
+            fill_callbacks = list(self._fill_callbacks) if fill_changed else []
+
+        # callbacks run without the lock, so they may call back into the handle
+        for callback in status_callbacks + fill_callbacks:
+            try:
+                callback(self)
+            except Exception:
+                # never let a broken callback break the socket reader thread
+                traceback.print_exc()
+        if status_changed and self.done and not self.future.done():
+            self.future.set_result(self)
+
+    def on_status(self, callback):
+        """ Call callback(handle) on each state change """
+        with self._cond:
+            self._status_callbacks.append(callback)
+
+    def on_fill(self, callback):
+        """ Call callback(handle) each time the filled amount grows, i.e. on every partial and the final fill """
+        with self._cond:
+            self._fill_callbacks.append(callback)
+
+    def wait_for(self, states, timeout=None):
+        """ Block until the order is in one of states or done; return True if it is in one of states """
+        with self._cond:
+            self._cond.wait_for(lambda: self.status in states or self.done, timeout)
+            return self.status in states
+
+    def wait_done(self, timeout=None):
+        """ Block until the order is filled, cancelled or inactive; return False on timeout """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def wait_filled(self, timeout=None):
+        """ Block until the order is done; return True if it was filled, False if cancelled, inactive or timed out """
+        return self.wait_for((OrderExecution.Filled,), timeout)
+
+    async def wait_filled_async(self, timeout=None):
+        """ asyncio version of wait_filled """
+        await asyncio.wait([asyncio.wrap_future(self.future)], timeout=timeout)
+        return self.status == OrderExecution.Filled
+
+    def __repr__(self):
+        return 'OrderHandle(order_id={}, symbol={}, amount={}, status={}, filled={})'.format(
+            self.order_id, self.contract.m_symbol, self.amount, self.status, self.filled)
+
+
+class OrderBasket(object):
+    """ Handle of a basket of orders placed back to back by IBClient.order_basket.
+        It follows the OrderHandle of each order and keeps the aggregate fill state.
+    """
+
+    def __init__(self, handles):
+        """
+
+        :param handles: list of OrderHandle
+        """
+        self.handles = list(handles)
+        self.order_ids = [handle.order_id for handle in self.handles]
+        self._by_id = dict((handle.order_id, handle) for handle in self.handles)
+
+        self._cond = threading.Condition()
+        self._pending = set(self.order_ids)  # orders not in OrderExecution.DONE_STATES yet
+        for handle in self.handles:
+            handle.on_status(self._on_status)
+            if handle.done:
+                self._on_status(handle)
+
+    def _on_status(self, handle):
+        if handle.done:
+            with self._cond:
+                self._pending.discard(handle.order_id)
+                if not self._pending:
+                    self._cond.notify_all()
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __contains__(self, order_id):
+        return order_id in self._by_id
+
+    def __getitem__(self, order_id):
+        return self._by_id[order_id]
+
+    @property
+    def done(self):
+        """ True if no order of the basket can be filled any more """
+        with self._cond:
+            return not self._pending
+
+    def wait(self, timeout=None):
+        """ Block until all orders are filled, cancelled or inactive; return False on timeout """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    async def wait_async(self, timeout=None):
+        """ asyncio version of wait """
+        if self.handles:
+            await asyncio.wait([asyncio.wrap_future(handle.future) for handle in self.handles], timeout=timeout)
+        return self.done
+
+    @property
+    def status(self):
+        """ Status of each order; key: order ID """
+        return dict((handle.order_id, handle.status) for handle in self.handles)
+
+    @property
+    def total_amount(self):
+        """ Sum of the absolute amounts of the orders """
+        return sum(abs(handle.amount) for handle in self.handles)
+
+    @property
+    def filled_amount(self):
+        """ Sum of the filled amounts of the orders, unsigned """
+        return sum(handle.filled for handle in self.handles)
+
+    @property
+    def fill_ratio(self):
+        """ filled_amount / total_amount """
+        total = self.total_amount
+        return self.filled_amount / total if total else 1.
+
+    def to_frame(self):
+        """ Return the state of the orders as a DataFrame indexed by order ID;
+            amount and filled are signed, positive means buy
+        """
+        handles = self.handles
+        data = {'symbol': [handle.contract.m_symbol for handle in handles],
+                'amount': [handle.amount for handle in handles],
+                'filled': [handle.filled if handle.amount > 0 else -handle.filled for handle in handles],
+                'avg_fill_price': [handle.avg_fill_price for handle in handles],
+                'status': [handle.status for handle in handles]}
+        return pd.DataFrame(data, index=pd.Index(self.order_ids, name='order_id'))
+
+    def __repr__(self):
+        return 'OrderBasket(orders={}, filled={:.0%}, done={})'.format(len(self), self.fill_ratio, self.done)
+
+
 class OrderType():
     """ Order Execution Status """
     Market = "MKT"
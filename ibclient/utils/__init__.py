@@ -3,4 +3,12 @@
 from .payload import (RequestDetails,
                       ResponseDetails)
 
-from .error_code import (CodeMsgPair, IBSystemErrors)
\ No newline at end of file
+from .error_code import (CodeMsgPair, IBSystemErrors, IBRequestError, REQUEST_ERROR_CODES, ORDER_ID_ERROR_CODES)
+
+from .ring_buffer import (RingBuffer, TickRingBuffer)
+from .bar_buffer import (BarBuffer, BarRingBuffer)
+from .bar_aggregator import (BarAggregator)
+from .bar_cache import (BarCache)
+from .registry import (RequestFuture, RequestRegistry)
+from .order_ids import (OrderIdAllocator)
+from .fills import (FillsStore)
\ No newline at end of file
@@ -0,0 +1,131 @@
+# coding=utf-8
+
+'''
+Roll real-time 5 sec bars up into longer bars as they arrive
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import traceback
+from datetime import datetime
+
+from .bar_buffer import BarRingBuffer
+from .duration import parse_bar_size
+from .timestamps import NS_PER_SEC, get_timezone
+
+NS_PER_DAY = 86400 * NS_PER_SEC
+OFFSET_STEP_NS = 900 * NS_PER_SEC   # UTC offsets only change at quarter hours, so they are cached per quarter hour
+
+
+class BarAggregator(object):
+    ''' Aggregate a stream of bars into several longer bar sizes at once, e.g. '1 min', '5 mins' and '15 mins'.
+
+        Every update() costs O(1) per bar size: the open bar of each size keeps running open/high/low/close/volume
+        values. A bar is closed as soon as the incoming bar reaches the end of its period, or when a bar of the
+        next period arrives, i.e. a gap in the stream never merges two periods. Closed bars are kept in a
+        BarRingBuffer per bar size and passed to on_bar(bar_size, bar).
+
+        Bars are aligned to multiples of the bar size since midnight in tz_name (UTC if None), so hour bars of
+        an exchange with a half-hour UTC offset start on its local hours, and '1 day' bars run from one local
+        midnight to the next (23 or 25 hours across a DST change). Bar sizes must divide a day.
+    '''
+
+    def __init__(self, bar_sizes, history=1000, on_bar=None, source_bar_size='5 secs', tz_name=None):
+        '''
+        Args:
+            bar_sizes: a list of barSizeSetting strings, e.g. ['1 min', '5 mins']
+            history: number of closed bars to keep for each bar size
+            on_bar: callable(bar_size, bar) called when a bar closes; bar is a (time, open, high, low, close, volume)
+                    tuple with the start time of the bar in int64 nanoseconds
+            source_bar_size: length of the incoming bars; reqRealTimeBars only sends 5 sec bars
+            tz_name: exchange timezone to align the bars in and to show the bar times in, see BarRingBuffer
+        Raises:
+            ValueError: a bar size is not a multiple of source_bar_size or does not divide a day
+        '''
+        source_ns = int(parse_bar_size(source_bar_size).total_seconds()) * NS_PER_SEC
+
+        self.bar_sizes = list(bar_sizes)
+        self.on_bar = on_bar
+        self.bars = {}                  # key: bar size; value: BarRingBuffer of closed bars
+        self._source_ns = source_ns
+        self._tz = None if tz_name is None else get_timezone(tz_name)
+        self._offsets = {}              # key: time // OFFSET_STEP_NS; value: UTC offset of self._tz in ns
+        self._periods = []              # [bar size, period in ns, open bar as a list or None, end of the open bar]
+        for bar_size in self.bar_sizes:
+            period_ns = int(parse_bar_size(bar_size).total_seconds()) * NS_PER_SEC
+            if period_ns < source_ns or period_ns % source_ns:
+                raise ValueError('bar size %s is not a multiple of %s' % (bar_size, source_bar_size))
+            if NS_PER_DAY % period_ns:
+                raise ValueError('bar size %s does not divide a day' % bar_size)
+            self.bars[bar_size] = BarRingBuffer(history, tz_name=tz_name)
+            self._periods.append([bar_size, period_ns, None, 0])
+
+    def update(self, time, open, high, low, close, volume):
+        ''' Feed one incoming bar; time is its start time in int64 nanoseconds '''
+        for period in self._periods:
+            bar_size, period_ns, bar, end = period
+            if bar is not None and not bar[0] <= time < end:
+                self._close(period)
+                bar = None
+
+            if bar is None:
+                # the timezone is only looked at when a bar opens, not on every incoming bar
+                start, end = self._bounds(time, period_ns)
+                period[2] = bar = [start, open, high, low, close, volume]
+                period[3] = end
+            else:
+                if high > bar[2]:
+                    bar[2] = high
+                if low < bar[3]:
+                    bar[3] = low
+                bar[4] = close
+                bar[5] += volume
+
+            if time + self._source_ns >= end:
+                self._close(period)
+
+    def _utc_offset(self, time):
+        ''' UTC offset of self._tz at time in nanoseconds '''
+        if self._tz is None:
+            return 0
+        step = time // OFFSET_STEP_NS
+        offset = self._offsets.get(step)
+        if offset is None:
+            if len(self._offsets) > 1000:
+                self._offsets.clear()
+            dt = datetime.fromtimestamp(step * OFFSET_STEP_NS // NS_PER_SEC, self._tz)
+            offset = self._offsets[step] = int(dt.utcoffset().total_seconds()) * NS_PER_SEC
+        return offset
+
+    def _bounds(self, time, period_ns):
+        ''' Return the start and end time (UTC) of the bar of period_ns which contains time '''
+        offset = self._utc_offset(time)
+        local_start = time + offset
+        local_start -= local_start % period_ns
+        # the offset may change within the bar, e.g. a DST change in a '1 day' bar
+        start = local_start - offset
+        start = local_start - self._utc_offset(start)
+        end = local_start + period_ns - offset
+        end = local_start + period_ns - self._utc_offset(end)
+        return start, end
+
+    def current(self, bar_size):
+        ''' Return the bar of bar_size which is still open as a tuple, or None '''
+        for size, _, bar, _ in self._periods:
+            if size == bar_size:
+                return None if bar is None else tuple(bar)
+        raise KeyError(bar_size)
+
+    def _close(self, period):
+        bar_size, _, bar, _ = period
+        period[2] = None
+        self.bars[bar_size].append(*bar)
+        if self.on_bar is not None:
+            try:
+                self.on_bar(bar_size, tuple(bar))
+            except Exception:
+                # never let a user callback break the socket reader thread
+                print('BarAggregator: on_bar callback failed for %s' % bar_size)
+                traceback.print_exc()
@@ -0,0 +1,148 @@
+# coding=utf-8
+
+'''
+Compact column buffers for price bars
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import numpy as np
+import pandas as pd
+
+from .ring_buffer import RingBuffer
+from .timestamps import to_datetime_index
+
+
+class BarBuffer(object):
+    ''' A growable buffer of (time, open, high, low, close, volume) bars stored in typed NumPy columns.
+        time is int64 nanoseconds; prices and volume are float64, i.e. 48 bytes per bar.
+
+        The columns are preallocated and doubled when full. Column views returned by column()
+        and to_frame() share memory with the buffer; appending more bars never changes them.
+
+        tz_name is the timezone the times are shown in, e.g. the exchange timezone of a real-time bar
+        subscription. It is resolved once when the buffer is created; times are only converted when read.
+    '''
+
+    COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+    DTYPES = ('i8', 'f8', 'f8', 'f8', 'f8', 'f8')
+    INITIAL_CAPACITY = 256
+
+    def __init__(self, tz_name=None):
+        self.tz_name = tz_name
+        self._size = 0
+        self._capacity = 0
+        self._columns = [np.empty(0, dtype=dtype) for dtype in self.DTYPES]
+
+    def _grow(self):
+        self._capacity = max(self.INITIAL_CAPACITY, 2 * self._capacity)
+        columns = []
+        for col in self._columns:
+            new_col = np.empty(self._capacity, dtype=col.dtype)
+            new_col[:self._size] = col[:self._size]
+            columns.append(new_col)
+        self._columns = columns
+
+    def append(self, time, open, high, low, close, volume):
+        ''' Append one bar; time is int64 nanoseconds '''
+        if self._size == self._capacity:
+            self._grow()
+        i = self._size
+        t, o, h, l, c, v = self._columns
+        t[i] = time
+        o[i] = open
+        h[i] = high
+        l[i] = low
+        c[i] = close
+        v[i] = volume
+        self._size = i + 1
+
+    def column(self, name):
+        ''' Return a view of one column, e.g. 'close' '''
+        return self._columns[self.COLUMNS.index(name)][:self._size]
+
+    def to_frame(self, tz_name=None):
+        ''' Return the bars as a DataFrame indexed by time, without copying the price columns.
+
+        Args:
+            tz_name: show the times (UTC nanoseconds) in this timezone; None means the tz_name of the buffer.
+                     If both are None, the times are kept as they are
+        Returns:
+            a DataFrame with 'open', 'high', 'low', 'close' and 'volume' columns
+        '''
+        if tz_name is None:
+            tz_name = self.tz_name
+        data = dict((name, self.column(name)) for name in self.COLUMNS[1:])
+        df = pd.DataFrame(data, columns=list(self.COLUMNS[1:]), copy=False)
+        df.index = to_datetime_index(self.column('time'), tz_name)
+        return df
+
+    def format_time(self, i, fmt='%Y%m%d %H:%M:%S'):
+        ''' Format the time of the i-th bar in the tz_name of the buffer, e.g. '20161020 09:30:05' '''
+        ts = pd.Timestamp(int(self[i][0]))
+        if self.tz_name is not None:
+            ts = ts.tz_localize('UTC').tz_convert(self.tz_name)
+        return ts.strftime(fmt)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('bar index out of range')
+        return tuple(col[i].item() for col in self._columns)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __repr__(self):
+        return 'BarBuffer(%d bars, tz_name=%s)' % (self._size, self.tz_name)
+
+
+class BarRingBuffer(RingBuffer):
+    ''' A fixed-capacity buffer of (time, open, high, low, close, volume) bars; once full, the oldest bar is dropped.
+        The latest N bars are one contiguous slice of each column, see RingBuffer.
+    '''
+
+    COLUMNS = BarBuffer.COLUMNS
+    DTYPES = BarBuffer.DTYPES
+
+    def __init__(self, capacity, tz_name=None):
+        super(BarRingBuffer, self).__init__(capacity)
+        self.tz_name = tz_name
+
+    def append(self, time, open, high, low, close, volume):
+        ''' Append one bar; time is int64 nanoseconds '''
+        i, j = self._pos, self._pos + self._slots
+        t, o, h, l, c, v = self._columns
+        t[i] = t[j] = time
+        o[i] = o[j] = open
+        h[i] = h[j] = high
+        l[i] = l[j] = low
+        c[i] = c[j] = close
+        v[i] = v[j] = volume
+        self._advance()
+
+    def to_frame(self, n=None, tz_name=None):
+        ''' Return a copy of the latest n bars as a DataFrame indexed by time, see BarBuffer.to_frame '''
+        if tz_name is None:
+            tz_name = self.tz_name
+        data = dict((name, self.column(name, n)) for name in self.COLUMNS[1:])
+        df = pd.DataFrame(data, columns=list(self.COLUMNS[1:]), copy=True)
+        df.index = to_datetime_index(self.column('time', n).copy(), tz_name)
+        return df
+
+    def format_time(self, i, fmt='%Y%m%d %H:%M:%S'):
+        ''' Format the time of the i-th stored bar in the tz_name of the buffer '''
+        ts = pd.Timestamp(int(self[i][0]))
+        if self.tz_name is not None:
+            ts = ts.tz_localize('UTC').tz_convert(self.tz_name)
+        return ts.strftime(fmt)
+
+    def __repr__(self):
+        return 'BarRingBuffer(%d/%d bars, tz_name=%s)' % (self._size, self.capacity, self.tz_name)
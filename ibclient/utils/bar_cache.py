@@ -0,0 +1,150 @@
+# coding=utf-8
+
+'''
+Local on-disk store for historical bars
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import os
+import numpy as np
+import pandas as pd
+
+
+class BarCache(object):
+    ''' Store historical bars on local disk, one memory-mapped NumPy file per
+        (conId, bar size, whatToShow, useRTH) key.
+
+        Bars are kept sorted by time in a structured array with
+        'time' (datetime64[ns] as int64), 'open', 'high', 'low', 'close' and 'volume' columns.
+        Reading a time window only touches the pages of the file it needs.
+        A small '.start' side file records the start of the time window covered by the stored bars,
+        which can be earlier than the first bar, e.g. a window starting on a weekend.
+    '''
+
+    DTYPE = np.dtype([('time', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'),
+                      ('close', 'f8'), ('volume', 'f8')])
+    COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        if not os.path.isdir(root_dir):
+            os.makedirs(root_dir)
+
+    @staticmethod
+    def make_key(contract, bar_size, what_to_show='TRADES', use_rth=0):
+        ''' Create the cache key for a contract; return None if the contract has no conId '''
+        con_id = int(contract.m_conId or 0)
+        if con_id <= 0:
+            return None
+        return con_id, bar_size, what_to_show, int(bool(use_rth))
+
+    def path(self, key):
+        con_id, bar_size, what_to_show, use_rth = key
+        filename = '%d_%s_%s_%d.npy' % (con_id, bar_size.replace(' ', ''), what_to_show, use_rth)
+        return os.path.join(self.root_dir, filename)
+
+    def _open(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def coverage(self, key):
+        ''' Return (start of the covered window, time of the last bar) for a key, or None if nothing is stored '''
+        bars = self._open(key)
+        if bars is None or len(bars) == 0:
+            return None
+
+        start = int(bars['time'][0])
+        start_path = self.path(key) + '.start'
+        if os.path.exists(start_path):
+            with open(start_path) as f:
+                start = min(start, int(f.read()))
+        return pd.Timestamp(start), pd.Timestamp(int(bars['time'][-1]))
+
+    def load(self, key, start=None, end=None):
+        ''' Load stored bars within (start, end] as a DataFrame indexed by time, like TWS returns a durationStr
+            window ending at endDateTime
+
+        Args:
+            key: cache key from make_key()
+            start: datetime; None means from the first stored bar
+            end: datetime; None means up to the last stored bar
+        Returns:
+            a DataFrame, or None if nothing is stored for the key
+        '''
+        bars = self._open(key)
+        if bars is None:
+            return None
+
+        times = bars['time']
+        lo = 0 if start is None else np.searchsorted(times, pd.Timestamp(start).value, side='right')
+        hi = len(bars) if end is None else np.searchsorted(times, pd.Timestamp(end).value, side='right')
+        window = bars[lo:hi]
+
+        df = pd.DataFrame({col: np.array(window[col]) for col in self.COLUMNS}, columns=self.COLUMNS)
+        df.index = pd.DatetimeIndex(np.array(window['time']).view('datetime64[ns]'), name='time')
+        return df
+
+    def store(self, key, df, start=None):
+        ''' Replace the bars stored for a key with a DataFrame indexed by time
+
+        Args:
+            key: cache key from make_key()
+            df: DataFrame with BarCache.COLUMNS columns, indexed by time
+            start: datetime; start of the time window covered by df. None means the first bar in df
+        '''
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+
+        bars = np.empty(len(df), dtype=self.DTYPE)
+        bars['time'] = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+        for col in self.COLUMNS:
+            bars[col] = df[col].to_numpy(dtype='f8')
+
+        # write to a temp file first so that readers never see a half written file
+        path = self.path(key)
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, bars)
+        os.replace(tmp_path, path)
+
+        start_path = path + '.start'
+        if start is not None:
+            with open(start_path, 'w') as f:
+                f.write(str(pd.Timestamp(start).value))
+        elif os.path.exists(start_path):
+            os.remove(start_path)
+
+    def merge(self, key, df, start=None):
+        ''' Merge newly downloaded bars into the store.
+            Newer bars overwrite stored bars with the same time. If the new window does not
+            overlap the stored one, the new bars replace the store, so that stored bars never have gaps.
+
+        Args:
+            key: cache key from make_key()
+            df: newly downloaded bars with BarCache.COLUMNS columns, indexed by time
+            start: datetime; start of the time window covered by df. None means the first bar in df
+        '''
+        if len(df) == 0:
+            return
+        if start is None:
+            start = df.index[0]
+
+        coverage = self.coverage(key)
+        if coverage is not None and start <= coverage[1] and df.index[-1] >= coverage[0]:
+            df = pd.concat([self.load(key), df[self.COLUMNS]])
+            start = min(coverage[0], start)
+        self.store(key, df[self.COLUMNS], start)
+
+    def clear(self, key=None):
+        ''' Remove the stored bars of one key, or of all keys if key is None '''
+        if key is not None:
+            paths = [self.path(key)]
+        else:
+            paths = [os.path.join(self.root_dir, f) for f in os.listdir(self.root_dir) if f.endswith('.npy')]
+        for path in paths:
+            for f in (path, path + '.start'):
+                if os.path.exists(f):
+                    os.remove(f)
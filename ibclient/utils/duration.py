@@ -0,0 +1,161 @@
+# coding=utf-8
+
+'''
+Convert between IB duration strings, bar size settings and python timedelta
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import calendar
+import math
+from datetime import datetime, timedelta
+
+
+# Length of one bar for the barSizeSetting values used by IBClient
+BAR_SIZE_TIMEDELTA = {'1 sec': timedelta(seconds=1),
+                      '5 secs': timedelta(seconds=5),
+                      '1 min': timedelta(minutes=1),
+                      '1 day': timedelta(days=1)}
+
+# Approximate length of a unit in IB durationStr; months and years are rounded up
+DURATION_UNIT_TIMEDELTA = {'S': timedelta(seconds=1),
+                           'D': timedelta(days=1),
+                           'W': timedelta(weeks=1),
+                           'M': timedelta(days=31),
+                           'Y': timedelta(days=366)}
+
+
+# Length of a unit in IB barSizeSetting strings, e.g. '5 secs', '15 mins', '1 hour'
+BAR_SIZE_UNIT_TIMEDELTA = {'sec': timedelta(seconds=1),
+                           'min': timedelta(minutes=1),
+                           'hour': timedelta(hours=1),
+                           'day': timedelta(days=1)}
+
+
+def parse_bar_size(bar_size):
+    ''' Convert IB barSizeSetting, e.g. '5 secs', '15 mins', '1 hour', to a timedelta instance
+
+    Args:
+        bar_size: string; 'X sec(s)', 'X min(s)', 'X hour(s)' or 'X day(s)'
+    Returns:
+        a timedelta instance
+    Raises:
+        ValueError: bar_size is not in a legal format
+    '''
+    try:
+        count, unit = bar_size.split()
+        period = int(count) * BAR_SIZE_UNIT_TIMEDELTA[unit.lower().rstrip('s')]
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError("incorrect bar size format: %s" % bar_size)
+    if period <= timedelta(0):
+        raise ValueError("incorrect bar size format: %s" % bar_size)
+    return period
+
+
+def parse_ts_end(ts_end):
+    ''' Convert ts_end string in '%Y%m%d %H:%M:%S' format to a datetime instance '''
+    return datetime.strptime(ts_end, '%Y%m%d %H:%M:%S')
+
+
+def parse_duration(duration):
+    ''' Convert IB durationStr, e.g. '3 D', '1 Y', to a timedelta instance
+
+    Args:
+        duration: string; 'X S', 'X D', 'X W', 'X M' or 'X Y'
+    Returns:
+        a timedelta instance
+    Raises:
+        ValueError: duration is not in a legal format
+    '''
+    try:
+        count, unit = duration.split()
+        return int(count) * DURATION_UNIT_TIMEDELTA[unit.upper()]
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError("incorrect duration format: %s" % duration)
+
+
+def _months_before(dt, months):
+    ''' Return dt moved back by a number of calendar months; the day is clipped to the length of the month '''
+    month = dt.month - 1 - months
+    year = dt.year + month // 12
+    month = month % 12 + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+
+def duration_start(end, duration):
+    ''' Return the start of the window of an IB durationStr ending at end.
+        Unlike parse_duration, months and years are counted on the calendar, e.g. '1 Y' before
+        2026-10-16 starts at 2025-10-16, and '12 M' is the same window as '1 Y'.
+
+    Args:
+        end: datetime; end of the window
+        duration: string; 'X S', 'X D', 'X W', 'X M' or 'X Y'
+    Returns:
+        a datetime
+    Raises:
+        ValueError: duration is not in a legal format
+    '''
+    period = parse_duration(duration)
+    count, unit = duration.split()
+    if unit.upper() == 'M':
+        return _months_before(end, int(count))
+    if unit.upper() == 'Y':
+        return _months_before(end, 12 * int(count))
+    return end - period
+
+
+def format_duration(period, bar_size):
+    ''' Convert a timedelta to the shortest IB durationStr which covers the period.
+        Intraday bars use seconds for periods up to one day; otherwise days (up to 365) or years are used.
+
+    Args:
+        period: timedelta instance
+        bar_size: barSizeSetting string, e.g. '1 min', '1 day'
+    Returns:
+        a durationStr, e.g. '3600 S', '5 D', '2 Y'
+    '''
+    seconds = max(period.total_seconds(), 1.)
+    if bar_size != '1 day' and seconds <= 86400:
+        return '%d S' % math.ceil(seconds)
+
+    days = math.ceil(seconds / 86400.)
+    if days <= 365:
+        return '%d D' % days
+    return '%d Y' % math.ceil(days / 365.)
+
+
+# The longest durationStr TWS accepts in one request for each bar size
+# https://interactivebrokers.github.io/tws-api/historical_limitations.html
+MAX_REQUEST_DURATION = {'1 sec': '1800 S',
+                        '5 secs': '3600 S',
+                        '1 min': '1 D',
+                        '1 day': '1 Y'}
+
+
+def fits_one_request(end, duration, bar_size):
+    ''' Return True if TWS accepts duration ending at end in one request for a bar size, e.g. '12 M' of daily bars '''
+    return duration_start(end, duration) >= duration_start(end, MAX_REQUEST_DURATION[bar_size])
+
+
+def split_duration(end, start, bar_size):
+    ''' Split a long time window into the largest requests TWS accepts for a bar size.
+        Chunks are listed from the latest to the earliest one; the earliest chunk may reach
+        beyond the start of the window.
+
+    Args:
+        end: datetime; end of the window
+        start: datetime; start of the window, e.g. from duration_start()
+        bar_size: barSizeSetting string, e.g. '1 min', '1 day'
+    Returns:
+        a list of (endDateTime, durationStr) tuples
+    '''
+    chunk_duration = MAX_REQUEST_DURATION[bar_size]
+
+    chunks = []
+    chunk_end = end
+    while chunk_end > start:
+        chunks.append((chunk_end.strftime('%Y%m%d %H:%M:%S'), chunk_duration))
+        chunk_end = duration_start(chunk_end, chunk_duration)
+    return chunks
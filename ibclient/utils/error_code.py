@@ -79,6 +79,29 @@ class IBSystemErrors(object):
                                   "Connectivity between TWS and server is broken. It will be restored automatically.")
 
 
+class IBRequestError(RuntimeError):
+    """ A TWS error message which ends a request, e.g. 200 No security definition has been found """
+
+    def __init__(self, req_id, code, msg):
+        super(IBRequestError, self).__init__('RequestID=%s, ErrorCode=%s, Reason:%s' % (req_id, code, msg))
+        self.req_id = req_id
+        self.code = code
+        self.msg = msg
+
+
+# Error codes which end the request with the same ID; its future fails with IBRequestError
+REQUEST_ERROR_CODES = (162,     # Historical market data service error, e.g. HMDS query returned no data
+                       200,     # No security definition has been found for the request
+                       321,     # Error validating request
+                       354,     # Requested market data is not subscribed
+                       430,     # fundamentals data for the security specified is not available
+                       )
+
+# Error codes which mean the local order ID counter is out of sync with TWS; see OrderIdAllocator
+ORDER_ID_ERROR_CODES = (103,    # Duplicate order id
+                        )
+
+
 TWSMessage = {
 
     1100: "Connectivity between IB and the TWS has been lost.",
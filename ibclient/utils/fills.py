@@ -0,0 +1,218 @@
+# coding=utf-8
+
+'''
+Columnar store of executions joined with their commission reports
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .timestamps import parse_bar_time
+
+
+# TWS sends Double.MAX_VALUE for commissions and realized P&L which are not known
+_UNSET = 1e300
+
+NAT = np.iinfo(np.int64).min  # int64 value of NaT
+
+
+def _number(value):
+    value = float(value)
+    return np.nan if abs(value) >= _UNSET else value
+
+
+class FillsStore(object):
+    ''' Executions (execDetails) joined with their commission reports (commissionReport) by execId.
+
+        Each execution is one row, stored in one list per column; the commission columns are NaN until the
+        commission report arrives, which may also come first. An execution sent again, e.g. in the reply to
+        reqExecutions, updates its row instead of adding one. to_frame() returns the table as a DataFrame,
+        so post-trade analysis is a vectorized query, e.g. see order_summary().
+
+        With spill_to(path), every execution and commission report is also appended to a JSON lines file,
+        one record per message; load(path) rebuilds the store from it.
+    '''
+
+    EXEC_COLUMNS = ('exec_id', 'time', 'account', 'client_id', 'order_id', 'perm_id', 'con_id', 'symbol',
+                    'sec_type', 'exchange', 'currency', 'side', 'shares', 'price', 'cum_qty', 'avg_price', 'order_ref')
+    COMMISSION_COLUMNS = ('commission', 'commission_currency', 'realized_pnl')
+    COLUMNS = EXEC_COLUMNS + COMMISSION_COLUMNS
+
+    def __init__(self, tz_name=None):
+        '''
+        Args:
+            tz_name: timezone of the execution times sent by TWS, e.g. IBClient.server_timezone
+        '''
+        self.tz_name = tz_name
+        self._lock = threading.Lock()
+        self._columns = dict((name, []) for name in self.COLUMNS)
+        self._rows = {}             # key: execId; value: row index
+        self._commissions = {}      # key: execId; value: commission record which arrived before its execution
+        self._spill = None          # file object of spill_to()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, exec_id):
+        return exec_id in self._rows
+
+    def add_execution(self, contract, execution):
+        ''' Add or update the row of an execution from execDetails
+
+        Returns:
+            (client_id, order_id) of the execution
+        '''
+        record = {'exec_id': execution.m_execId, 'time': self._parse_time(execution.m_time),
+                  'account': execution.m_acctNumber, 'client_id': int(execution.m_clientId), 'order_id': int(execution.m_orderId),
+                  'perm_id': int(execution.m_permId), 'con_id': int(contract.m_conId), 'symbol': contract.m_symbol,
+                  'sec_type': contract.m_secType, 'exchange': execution.m_exchange, 'currency': contract.m_currency,
+                  'side': execution.m_side, 'shares': float(execution.m_shares), 'price': float(execution.m_price),
+                  'cum_qty': float(execution.m_cumQty), 'avg_price': float(execution.m_avgPrice),
+                  'order_ref': execution.m_orderRef}
+        with self._lock:
+            self._add_execution(record)
+            self._write('exec', record)
+        return record['client_id'], record['order_id']
+
+    def add_commission(self, report):
+        ''' Add a commission report from commissionReport to the row of its execution
+
+        Returns:
+            (client_id, order_id) of the execution; None if the execution has not arrived yet
+        '''
+        record = {'exec_id': report.m_execId, 'commission': _number(report.m_commission),
+                  'commission_currency': report.m_currency, 'realized_pnl': _number(report.m_realizedPNL)}
+        with self._lock:
+            key = self._add_commission(record)
+            self._write('commission', record)
+        return key
+
+    def _parse_time(self, value):
+        ''' Convert the execution time, e.g. '20161020  23:46:00', to int64 nanoseconds in UTC '''
+        try:
+            return parse_bar_time(value, self.tz_name)
+        except ValueError:
+            return NAT
+
+    def _add_execution(self, record):
+        columns = self._columns
+        row = self._rows.get(record['exec_id'])
+        if row is None:
+            row = self._rows[record['exec_id']] = len(columns['exec_id'])
+            for name in self.EXEC_COLUMNS:
+                columns[name].append(record[name])
+            for name in self.COMMISSION_COLUMNS:
+                columns[name].append(np.nan if name != 'commission_currency' else '')
+        else:
+            for name in self.EXEC_COLUMNS:
+                columns[name][row] = record[name]
+
+        commission = self._commissions.pop(record['exec_id'], None)
+        if commission is not None:
+            self._add_commission(commission)
+
+    def _add_commission(self, record):
+        row = self._rows.get(record['exec_id'])
+        if row is None:
+            self._commissions[record['exec_id']] = record
+            return None
+        columns = self._columns
+        for name in self.COMMISSION_COLUMNS:
+            columns[name][row] = record[name]
+        return columns['client_id'][row], columns['order_id'][row]
+
+    def order_key(self, exec_id):
+        ''' Return (client_id, order_id) of an execution; None if unknown '''
+        with self._lock:
+            row = self._rows.get(exec_id)
+            if row is None:
+                return None
+            return self._columns['client_id'][row], self._columns['order_id'][row]
+
+    def to_frame(self):
+        ''' Return the fills as a DataFrame with one row per execution, in arrival order.
+            time is in UTC; signed_shares is shares with the sign of the side, positive for BOT.
+        '''
+        with self._lock:
+            data = dict((name, list(values)) for name, values in self._columns.items())
+        df = pd.DataFrame(data, columns=self.COLUMNS)
+        df['time'] = pd.to_datetime(np.asarray(data['time'], dtype=np.int64), utc=True)
+        df['signed_shares'] = np.where(df['side'].values == 'BOT', 1., -1.) * df['shares'].values
+        return df
+
+    def order_summary(self):
+        ''' Return filled shares (signed), VWAP, commission and realized P&L of each order as a DataFrame
+            indexed by (client_id, order_id)
+        '''
+        df = self.to_frame()
+        df['notional'] = df['shares'] * df['price']
+        grouped = df.groupby(['client_id', 'order_id'], sort=True)
+        summary = grouped.agg(symbol=('symbol', 'first'), shares=('signed_shares', 'sum'),
+                              volume=('shares', 'sum'), notional=('notional', 'sum'), commission=('commission', 'sum'),
+                              realized_pnl=('realized_pnl', 'sum'), executions=('exec_id', 'count'),
+                              first_time=('time', 'min'), last_time=('time', 'max'))
+        summary['vwap'] = summary['notional'] / summary['volume']
+        return summary.drop(columns=['volume', 'notional'])
+
+    #
+    # spill file
+    #
+    def spill_to(self, path):
+        ''' Append every fill to a JSON lines file from now on; the fills already in the store are written first '''
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+            self._spill = open(path, 'a')
+            columns = self._columns
+            for row in range(len(columns['exec_id'])):
+                record = dict((name, columns[name][row]) for name in self.EXEC_COLUMNS)
+                self._write('exec', record)
+                if not np.isnan(columns['commission'][row]) or columns['commission_currency'][row]:
+                    self._write('commission', dict((name, columns[name][row])
+                                                   for name in ('exec_id',) + self.COMMISSION_COLUMNS))
+            for record in self._commissions.values():
+                self._write('commission', record)
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def _write(self, kind, record):
+        if self._spill is None:
+            return
+        record = dict(record, type=kind)
+        for name, value in record.items():
+            if isinstance(value, float) and np.isnan(value):
+                record[name] = None
+            elif isinstance(value, np.integer):
+                record[name] = int(value)
+        self._spill.write(json.dumps(record) + '\n')
+        self._spill.flush()
+
+    @classmethod
+    def load(cls, path, tz_name=None):
+        ''' Rebuild a store from a spill file written by spill_to() '''
+        store = cls(tz_name)
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.pop('type')
+                if kind == 'exec':
+                    store._add_execution(record)
+                else:
+                    for name in ('commission', 'realized_pnl'):
+                        if record[name] is None:
+                            record[name] = np.nan
+                    store._add_commission(record)
+        return store
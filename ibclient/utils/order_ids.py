@@ -0,0 +1,81 @@
+# coding=utf-8
+
+'''
+Local allocation of TWS order IDs
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import threading
+
+
+class OrderIdAllocator(object):
+    ''' A thread-safe source of order IDs.
+
+        TWS sends nextValidId once a client connects and whenever reqIds is called. The allocator is seeded with
+        it and then hands out IDs by incrementing a local counter, so placing an order costs no round trip to TWS.
+        IDs never go backwards: a seed lower than the next local ID is ignored.
+
+        After an order ID error (e.g. 103 duplicate order id) or a reconnection, invalidate() marks the counter
+        stale; next_id() then waits until TWS sends a fresh nextValidId.
+    '''
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._next_id = 0
+        self._synced = False
+
+    @property
+    def synced(self):
+        ''' True if the counter was seeded by TWS since the last invalidate() '''
+        with self._cond:
+            return self._synced
+
+    def seed(self, next_valid_id):
+        ''' Seed the counter with nextValidId from TWS and wake up the waiting callers '''
+        with self._cond:
+            self._next_id = max(self._next_id, int(next_valid_id))
+            self._synced = True
+            self._cond.notify_all()
+
+    def invalidate(self):
+        ''' Mark the counter stale until the next seed() '''
+        with self._cond:
+            self._synced = False
+
+    def wait_synced(self, timeout=None):
+        ''' Block until the counter is seeded; return False on timeout '''
+        with self._cond:
+            return self._cond.wait_for(lambda: self._synced, timeout)
+
+    def next_ids(self, count, timeout=None):
+        ''' Allocate count consecutive order IDs
+
+        Args:
+            count: number of IDs
+            timeout: max number of seconds to wait for a seed from TWS; None to wait forever
+        Returns:
+            a range of order IDs
+        Raises:
+            RuntimeError: no nextValidId arrived within timeout
+        '''
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._synced, timeout):
+                raise RuntimeError('no nextValidId from TWS within %s seconds' % timeout)
+            first = self._next_id
+            self._next_id += count
+        return range(first, first + count)
+
+    def next_id(self, timeout=None):
+        ''' Allocate one order ID; see next_ids '''
+        return self.next_ids(1, timeout)[0]
+
+    def peek(self):
+        ''' Return the next ID which would be allocated, without allocating it '''
+        with self._cond:
+            return self._next_id
+
+    def __repr__(self):
+        return 'OrderIdAllocator(next_id=%d, synced=%s)' % (self._next_id, self._synced)
@@ -0,0 +1,162 @@
+# coding=utf-8
+
+'''
+Latency of the stages of orders, from order ID allocation to commission report
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import json
+import threading
+from collections import OrderedDict
+from time import monotonic, time as time_now
+
+import numpy as np
+import pandas as pd
+
+from .ring_buffer import RingBuffer
+
+
+# Stages of an order, in the order they usually happen; orderStatus transitions are recorded as
+# STATUS_PREFIX + status, e.g. 'status:Submitted'
+ID_ALLOCATED = 'id_allocated'
+PLACE_SENT = 'place_sent'
+OPEN_ORDER = 'open_order'
+EXEC_DETAILS = 'exec_details'
+COMMISSION_REPORT = 'commission_report'
+STATUS_PREFIX = 'status:'
+
+
+class LatencySamples(RingBuffer):
+    ''' The latest latency samples of one stage, in ms '''
+    COLUMNS = ('latency_ms',)
+    DTYPES = (np.float64,)
+
+
+class OrderLatencyTracker(object):
+    ''' Monotonic timestamps of the stages of each order, and latency histograms of the stages over all orders.
+
+        The latency of a stage is measured from the stage it follows: placeOrder send from the order ID
+        allocation, and all later stages from the placeOrder send. Only the first time an order reaches a stage
+        is recorded, e.g. the first execDetails of an order filled in several executions.
+
+        Stages are recorded by IBClient and IBMsgWrapper, on the caller and the socket reader threads.
+    '''
+
+    def __init__(self, max_orders=10000, max_samples=10000):
+        '''
+        Args:
+            max_orders: number of orders whose timelines are kept; the oldest are dropped first
+            max_samples: number of latency samples kept per stage for the aggregate statistics
+        '''
+        self.max_orders = max_orders
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._timelines = OrderedDict()  # key: (client_id, order_id); value: dict of stage: monotonic timestamp
+        self._samples = OrderedDict()    # key: stage; value: LatencySamples
+
+    @staticmethod
+    def origin(stage):
+        ''' Return the stage the latency of stage is measured from; None for the first stage '''
+        if stage == ID_ALLOCATED:
+            return None
+        if stage == PLACE_SENT:
+            return ID_ALLOCATED
+        return PLACE_SENT
+
+    def mark(self, key, stage, timestamp=None):
+        ''' Record that an order reached a stage
+
+        Args:
+            key: (client_id, order_id)
+            stage: one of the stage names, e.g. PLACE_SENT or STATUS_PREFIX + 'Filled'
+            timestamp: time.monotonic() of the stage; None for now
+        '''
+        if stage != ID_ALLOCATED and key not in self._timelines:
+            return  # fast path, without the lock, for the messages of orders which are not tracked
+        timestamp = monotonic() if timestamp is None else timestamp
+        with self._lock:
+            timeline = self._timelines.get(key)
+            if timeline is None:
+                if stage != ID_ALLOCATED:
+                    return  # an order not placed by this client, or one already dropped
+                timeline = self._timelines[key] = {}
+                if len(self._timelines) > self.max_orders:
+                    self._timelines.popitem(last=False)
+            if stage in timeline:
+                return
+            timeline[stage] = timestamp
+
+            start = timeline.get(self.origin(stage))
+            if start is not None:
+                samples = self._samples.get(stage)
+                if samples is None:
+                    samples = self._samples[stage] = LatencySamples(self.max_samples)
+                samples.append((timestamp - start) * 1000.)
+
+    def timeline(self, key):
+        ''' Return the stages of an order as a dict of stage: ms since the order ID allocation, in time order '''
+        with self._lock:
+            timeline = dict(self._timelines.get(key, {}))
+        start = timeline.get(ID_ALLOCATED)
+        if start is None:
+            return {}
+        return OrderedDict((stage, (ts - start) * 1000.) for stage, ts in sorted(timeline.items(), key=lambda x: x[1]))
+
+    def samples(self, stage):
+        ''' Return a copy of the latest latency samples of a stage in ms '''
+        with self._lock:
+            samples = self._samples.get(stage)
+            return samples.column('latency_ms').copy() if samples is not None else np.empty(0)
+
+    def histogram(self, stage, bins=20):
+        ''' Return np.histogram of the latency samples of a stage in ms '''
+        return np.histogram(self.samples(stage), bins=bins)
+
+    def stats(self):
+        ''' Return count, mean, p50, p99 and max latency in ms of each stage as a DataFrame indexed by stage '''
+        with self._lock:
+            data = [(stage, samples.column('latency_ms').copy()) for stage, samples in self._samples.items()]
+        rows = [(stage, len(values), values.mean(), np.percentile(values, 50), np.percentile(values, 99), values.max())
+                for stage, values in data if len(values)]
+        df = pd.DataFrame(rows, columns=['stage', 'count', 'mean', 'p50', 'p99', 'max'])
+        return df.set_index('stage')
+
+    def export(self, path):
+        ''' Append the current stats to path as one JSON line: {"time": epoch seconds, "stages": {stage: stats}} '''
+        record = {'time': time_now(), 'stages': self.stats().to_dict(orient='index')}
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+            self._samples.clear()
+
+
+class LatencyExporter(object):
+    ''' Export the stats of an OrderLatencyTracker to a JSON lines file every interval seconds, on a daemon thread '''
+
+    def __init__(self, tracker, path, interval=60.):
+        self.tracker = tracker
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='LatencyExporter', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        ''' Stop the thread and export once more '''
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.tracker.export(self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.tracker.export(self.path)
@@ -0,0 +1,205 @@
+# coding=utf-8
+
+'''
+Request pacing helpers to stay within TWS message rate limits
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import itertools
+import threading
+from collections import deque
+from datetime import timedelta
+from time import sleep, monotonic
+
+from .duration import parse_bar_size
+
+
+class RequestClass(object):
+    """ Classes of requests sent to TWS; each class has its own pacing rules and priority """
+    ORDER = 'order'
+    CANCEL = 'cancel'
+    ACCOUNT = 'account'
+    MARKET_DATA = 'market_data'
+    CONTRACT = 'contract'
+    FUNDAMENTAL = 'fundamental'
+    HISTORICAL = 'historical'
+    SMALL_BAR_HISTORICAL = 'small_bar_historical'  # historical data of bars of 30 secs or less
+
+    # lower value goes first when requests are queued
+    PRIORITY = {ORDER: 0, CANCEL: 0,
+                ACCOUNT: 1, MARKET_DATA: 1,
+                CONTRACT: 2, FUNDAMENTAL: 2, HISTORICAL: 2, SMALL_BAR_HISTORICAL: 2}
+
+
+# TWS applies its historical data pacing rules only to bars of this size or smaller
+# https://interactivebrokers.github.io/tws-api/historical_limitations.html
+SMALL_BAR_SIZE = timedelta(seconds=30)
+
+
+def historical_request_class(bar_size):
+    ''' Return the request class of a reqHistoricalData request for a barSizeSetting, e.g. '1 min' '''
+    if parse_bar_size(bar_size) <= SMALL_BAR_SIZE:
+        return RequestClass.SMALL_BAR_HISTORICAL
+    return RequestClass.HISTORICAL
+
+
+class TokenBucket(object):
+    ''' Allow requests at an average rate of `rate` per second, with bursts up to `capacity` requests. '''
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self):
+        ''' Number of seconds to wait before the next request is allowed '''
+        with self._lock:
+            self._refill(monotonic())
+            if self._tokens >= 1.:
+                return 0.
+            return (1. - self._tokens) / self.rate
+
+    def consume(self):
+        ''' Record one request; call it only after wait_time() returned 0 '''
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens -= 1.
+
+    def acquire(self):
+        ''' Block until one more request is allowed and record it '''
+        while True:
+            with self._lock:
+                self._refill(monotonic())
+                if self._tokens >= 1.:
+                    self._tokens -= 1.
+                    return
+                delay = (1. - self._tokens) / self.rate
+            sleep(delay)
+
+
+class SlidingWindowLimiter(object):
+    ''' Allow at most max_count requests within any period of `period` seconds.
+        e.g. TWS historical data pacing: no more than 60 requests within any 10 minute period.
+    '''
+
+    def __init__(self, max_count, period):
+        self.max_count = int(max_count)
+        self.period = float(period)
+        self._times = deque()  # monotonic time of the requests in the current window
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._times and self._times[0] <= now - self.period:
+            self._times.popleft()
+
+    def wait_time(self):
+        ''' Number of seconds to wait before the next request is allowed '''
+        with self._lock:
+            now = monotonic()
+            self._expire(now)
+            if len(self._times) < self.max_count:
+                return 0.
+            return self._times[0] + self.period - now
+
+    def consume(self):
+        ''' Record one request; call it only after wait_time() returned 0 '''
+        with self._lock:
+            self._times.append(monotonic())
+
+    def acquire(self):
+        ''' Block until one more request is allowed and record it '''
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._expire(now)
+                if len(self._times) < self.max_count:
+                    self._times.append(now)
+                    return
+                delay = self._times[0] + self.period - now
+            sleep(delay)
+
+
+class RequestScheduler(object):
+    ''' Pace all requests sent to TWS.
+
+        Every request passes a global token bucket (TWS allows about 50 messages per second),
+        plus the limiters of its request class and, optionally, limiters keyed by e.g. contract.
+        Requests which would break a limit are queued instead of being sent. When several requests
+        are queued, the first one in priority order (see RequestClass.PRIORITY) whose limiters allow it
+        is sent next, so orders go before market data and a request held back by the limits of its
+        own class does not hold back requests of other classes.
+    '''
+
+    def __init__(self, max_msg_rate=50):
+        self.global_limiter = TokenBucket(max_msg_rate)
+        # key: request class; value: a list of limiters shared by all requests of the class
+        self.class_limiters = {RequestClass.SMALL_BAR_HISTORICAL: [SlidingWindowLimiter(60, 600.)]}
+        # key: request class; value: a factory of limiters for each key of the class
+        self.keyed_limiter_factories = {RequestClass.SMALL_BAR_HISTORICAL: lambda: SlidingWindowLimiter(5, 2.)}
+        self._keyed_limiters = {}  # key: (request class, key); value: limiter
+
+        self._cond = threading.Condition()
+        self._waiting = []  # (priority, sequence no.) tickets of the queued requests
+        self._limiters = {}  # key: ticket; value: limiters the ticket needs
+        self._seq = itertools.count()
+
+    def _get_limiters(self, req_class, key):
+        limiters = [self.global_limiter] + self.class_limiters.get(req_class, [])
+        if key is not None and req_class in self.keyed_limiter_factories:
+            limiter = self._keyed_limiters.get((req_class, key))
+            if limiter is None:
+                limiter = self._keyed_limiters[(req_class, key)] = self.keyed_limiter_factories[req_class]()
+            limiters.append(limiter)
+        return limiters
+
+    @staticmethod
+    def _wait_time(limiters):
+        return max(limiter.wait_time() for limiter in limiters)
+
+    def acquire(self, req_class, key=None):
+        ''' Block until a request of the class (and key) can be sent, and record it.
+
+        Args:
+            req_class: one of RequestClass values
+            key: optional; e.g. a contract key for requests with per-contract pacing rules
+        '''
+        with self._cond:
+            ticket = (RequestClass.PRIORITY.get(req_class, 1), next(self._seq))
+            limiters = self._get_limiters(req_class, key)
+            self._waiting.append(ticket)
+            self._limiters[ticket] = limiters
+            try:
+                while True:
+                    delay = self._wait_time(limiters)
+                    if delay <= 0 and not self._is_anyone_ahead_ready(ticket):
+                        for limiter in limiters:
+                            limiter.consume()
+                        return
+                    # wake up when own limiters allow it, or when someone ahead has gone
+                    self._cond.wait(delay if delay > 0 else None)
+            finally:
+                self._waiting.remove(ticket)
+                self._limiters.pop(ticket)
+                self._cond.notify_all()
+
+    def _is_anyone_ahead_ready(self, ticket):
+        for other in sorted(self._waiting):
+            if other >= ticket:
+                return False
+            if self._wait_time(self._limiters[other]) <= 0:
+                return True
+        return False
+
+    def queue_length(self):
+        ''' Number of requests waiting to be sent '''
+        with self._cond:
+            return len(self._waiting)
@@ -11,6 +11,8 @@ from __future__ import print_function
 from __future__ import division
 from threading import Event
 
+from .bar_buffer import BarBuffer
+
 class RequestDetails():
     def __init__(self, req_name, req_type=None, contract=None):
         self.func_name = req_name
@@ -22,8 +24,9 @@ class ResponseDetails():
     STATUS_FINISHED = 0
 
     def __init__(self):
-        self.price_hist = []    # for historical price responses
-        self.rt_price = []      # for real-time bar responses
+        self.price_hist = BarBuffer()   # for historical price responses
+        self.rt_price = BarBuffer()     # for real-time bar responses
+        self.bar_aggregator = None      # BarAggregator of a real-time bar subscription, if any
         self.status = -1        # error_code in IBMsgWrapper
         self.request_id = -1
         self.error_msg = ''
@@ -31,6 +34,9 @@ class ResponseDetails():
         self.fundamental_data = ''
         self.contract_list = []
         self.tick_str = None
+        self.tick_history = None        # TickRingBuffer of a tick data subscription, if any
+        self.last_update = 0.           # time.monotonic() of the latest tick message; see RequestRegistry.settle
+        self.quiet_time = 0.            # sec without ticks after tickSnapshotEnd before a tick snapshot is taken
         # tick_data stores either live tick data or a tick snapshot
         self.tick_data = {'bidVolume1'  :  -1,  'bidPrice1'    :  -1,
                           'askPrice1'    :  -1, 'askVolume1'   :  -1,
@@ -0,0 +1,221 @@
+# coding=utf-8
+
+'''
+Per-request futures for TWS requests
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import threading
+import traceback
+from concurrent.futures import Future
+try:
+    from concurrent.futures import InvalidStateError
+except ImportError:  # Python < 3.8, where setting a cancelled future does not raise
+    InvalidStateError = RuntimeError
+from time import monotonic
+
+from .payload import ResponseDetails
+
+
+class RequestFuture(Future):
+    ''' The result of one TWS request.
+        A concurrent.futures.Future, so result(timeout), exception(timeout), add_done_callback(),
+        concurrent.futures.wait() and asyncio.wrap_future() all work with it.
+    '''
+
+    def __init__(self, req_id, request, response):
+        super(RequestFuture, self).__init__()
+        self.req_id = req_id
+        self.request = request
+        self.response = response
+
+
+def _set_outcome(future, result=None, exception=None):
+    ''' Set the result or exception of a future, unless the caller cancelled it meanwhile, e.g. on a timeout.
+        Never raises: it runs on the socket reader thread, where an exception closes the connection.
+    '''
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class RequestRegistry(object):
+    ''' A thread-safe replacement of the ipc_msg_dict dict: key: request ID; value: (RequestDetails, ResponseDetails).
+
+        register() also returns a RequestFuture. IBMsgWrapper completes it with finish() or fail() when the
+        last message of the request arrives, and the entry is removed as soon as the future is done, whether it
+        finished, failed or was cancelled after a timeout, so no entry is left behind on error paths.
+
+        Entries added with item assignment (e.g. market data subscriptions) have no future and stay until popped.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # key: request ID; value: (request, response)
+        self._futures = {}      # key: request ID; value: (RequestFuture, finish function)
+        self._timers = {}       # key: request ID; value: threading.Timer of a delayed finish()
+
+    def register(self, req_id, request, response, finish=None):
+        ''' Register a request and return its future.
+
+        Args:
+            req_id: request ID
+            request: RequestDetails instance
+            response: ResponseDetails instance which the callbacks fill in
+            finish: callable(response) returning the result of the future; None returns the response itself
+        Returns:
+            a RequestFuture
+        '''
+        future = RequestFuture(req_id, request, response)
+        with self._lock:
+            self._entries[req_id] = (request, response)
+            self._futures[req_id] = (future, finish)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def finish(self, req_id, delay=0.):
+        ''' Mark a request finished and set the result of its future.
+
+        Args:
+            req_id: request ID
+            delay: seconds to wait before the future is resolved, e.g. for ticks which arrive after tickSnapshotEnd;
+                   the entry stays registered meanwhile
+        '''
+        if delay > 0:
+            timer = threading.Timer(delay, self.finish, (req_id,))
+            timer.daemon = True
+            with self._lock:
+                if req_id not in self._entries:
+                    return
+                self._timers[req_id] = timer
+            timer.start()
+            return
+
+        with self._lock:
+            self._timers.pop(req_id, None)
+            entry = self._entries.get(req_id)
+            future, finish = self._futures.get(req_id, (None, None))
+        if entry is None:
+            return
+
+        response = entry[1]
+        response.status = ResponseDetails.STATUS_FINISHED
+        response.event.set()
+        if future is None or future.done():
+            return
+        try:
+            result = response if finish is None else finish(response)
+        except Exception as e:
+            # never let a broken finish function break the socket reader thread
+            traceback.print_exc()
+            _set_outcome(future, exception=e)
+        else:
+            _set_outcome(future, result)
+
+    def settle(self, req_id, quiet, max_delay):
+        ''' Finish a request once no message of it has arrived for quiet seconds, and at the latest max_delay seconds
+            from now. The callbacks stamp each message in response.last_update; e.g. tickPrice and tickSize may
+            still arrive after tickSnapshotEnd, and each of them restarts the quiet period of its own request only.
+
+        Args:
+            req_id: request ID
+            quiet: seconds without messages after which the request is finished; at least this long from now
+            max_delay: upper bound of the wait in seconds, for requests whose messages never stop
+        '''
+        now = monotonic()
+        self._settle(req_id, quiet, now, now + max_delay)
+
+    def _settle(self, req_id, quiet, start, deadline):
+        with self._lock:
+            entry = self._entries.get(req_id)
+            if entry is None:
+                return
+            wait = min(max(entry[1].last_update, start) + quiet, deadline) - monotonic()
+            if wait > 0:
+                timer = threading.Timer(wait, self._settle, (req_id, quiet, start, deadline))
+                timer.daemon = True
+                self._timers[req_id] = timer
+        if wait > 0:
+            timer.start()
+        else:
+            self.finish(req_id)
+
+    def fail(self, req_id, exc):
+        ''' Mark a request failed and set exc as the exception of its future.
+            The response gets the error code and message of exc, if any, like before futures existed.
+        '''
+        with self._lock:
+            entry = self._entries.get(req_id)
+            future = self._futures.get(req_id, (None, None))[0]
+        if entry is None:
+            return
+
+        response = entry[1]
+        response.request_id = req_id
+        response.status = getattr(exc, 'code', response.status)
+        response.error_msg = getattr(exc, 'msg', str(exc))
+        response.event.set()
+        if future is not None and not future.done():
+            _set_outcome(future, exception=exc)
+
+    def get(self, req_id, default=None):
+        ''' Return (request, response) of a request ID, or default if it's not registered '''
+        with self._lock:
+            return self._entries.get(req_id, default)
+
+    def future(self, req_id):
+        ''' Return the RequestFuture of a request ID, or None '''
+        with self._lock:
+            return self._futures.get(req_id, (None, None))[0]
+
+    def pop(self, req_id, *default):
+        with self._lock:
+            self._futures.pop(req_id, None)
+            timer = self._timers.pop(req_id, None)
+            if timer is not None:
+                timer.cancel()
+            return self._entries.pop(req_id, *default)
+
+    def _on_done(self, future):
+        with self._lock:
+            if self._futures.get(future.req_id, (None, None))[0] is future:
+                self._futures.pop(future.req_id)
+                self._entries.pop(future.req_id, None)
+                timer = self._timers.pop(future.req_id, None)
+                if timer is not None:
+                    timer.cancel()
+
+    def __setitem__(self, req_id, entry):
+        with self._lock:
+            self._entries[req_id] = entry
+
+    def __getitem__(self, req_id):
+        with self._lock:
+            return self._entries[req_id]
+
+    def __contains__(self, req_id):
+        with self._lock:
+            return req_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
@@ -0,0 +1,122 @@
+# coding=utf-8
+
+'''
+Fixed-capacity column buffers for streaming data
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import numpy as np
+import pandas as pd
+
+from .timestamps import to_datetime_index
+
+
+class RingBuffer(object):
+    ''' A fixed-capacity buffer of records stored in typed NumPy columns; once full, the oldest record is dropped.
+        Subclasses define COLUMNS and DTYPES.
+
+        The records are kept in capacity + 1 slots, and each record is written twice, at i and i + slots
+        of columns twice as long, so the latest N records are always one contiguous slice which the next
+        write does not touch. latest(n) and column() return views without copying; a view of n records
+        stays valid until capacity - n + 1 more records are appended. to_frame() copies.
+    '''
+
+    COLUMNS = ()
+    DTYPES = ()
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self._slots = capacity + 1  # one spare slot, so a full view never covers the next write
+        self._pos = 0               # index of the next write, in [0, slots)
+        self._size = 0
+        self._columns = [np.zeros(2 * self._slots, dtype=dtype) for dtype in self.DTYPES]
+
+    def append(self, *values):
+        ''' Append one record with a value for each of COLUMNS '''
+        i, j = self._pos, self._pos + self._slots
+        for col, value in zip(self._columns, values):
+            col[i] = col[j] = value
+        self._advance()
+
+    def _advance(self):
+        self._pos = (self._pos + 1) % self._slots
+        if self._size < self.capacity:
+            self._size += 1
+
+    def column(self, name, n=None):
+        ''' Return a view of the latest n values of one column, oldest first; n=None for all stored records '''
+        n = self._size if n is None else max(min(n, self._size), 0)
+        end = self._pos + self._slots
+        return self._columns[self.COLUMNS.index(name)][end - n:end]
+
+    def latest(self, n=None):
+        ''' Return the latest n records as a dict of column views, oldest first '''
+        return dict((name, self.column(name, n)) for name in self.COLUMNS)
+
+    def clear(self):
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('ring buffer index out of range')
+        k = self._pos + self._slots - self._size + i
+        return tuple(col[k].item() for col in self._columns)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __repr__(self):
+        return '%s(%d/%d records)' % (self.__class__.__name__, self._size, self.capacity)
+
+
+class TickRingBuffer(RingBuffer):
+    ''' A fixed-capacity history of (time, field, value) ticks from tickPrice and tickSize.
+        time is the receive time in int64 nanoseconds (UTC); field is a TICK_FIELDS id, e.g. 'lastPrice'.
+        Field names are stored as small integer codes, see fields.
+    '''
+
+    COLUMNS = ('time', 'field', 'value')
+    DTYPES = ('i8', 'i2', 'f8')
+
+    def __init__(self, capacity, fields):
+        '''
+        Args:
+            capacity: number of ticks to keep
+            fields: a list of field names; the code of a field is its position in the list
+        '''
+        super(TickRingBuffer, self).__init__(capacity)
+        self.fields = list(fields)
+        self._codes = dict((field, code) for code, field in enumerate(self.fields))
+
+    def append(self, time, field, value):
+        ''' Append one tick; field is a field name '''
+        i, j = self._pos, self._pos + self._slots
+        t, f, v = self._columns
+        t[i] = t[j] = time
+        f[i] = f[j] = self._codes[field]
+        v[i] = v[j] = value
+        self._advance()
+
+    def values(self, field, n=None):
+        ''' Return the values of one field among the latest n ticks, oldest first '''
+        mask = self.column('field', n) == self._codes[field]
+        return self.column('value', n)[mask]
+
+    def to_frame(self, n=None, tz_name=None):
+        ''' Return the latest n ticks as a DataFrame indexed by receive time, with a categorical 'field' column '''
+        df = pd.DataFrame({'field': pd.Categorical.from_codes(self.column('field', n), categories=self.fields),
+                           'value': self.column('value', n)}, columns=['field', 'value'], copy=True)
+        df.index = to_datetime_index(self.column('time', n).copy(), tz_name)
+        return df
@@ -0,0 +1,39 @@
+# coding=utf-8
+
+'''
+Vectorized order sizing: convert target values and weights to amounts of shares and order amounts
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import numpy as np
+
+
+def value_to_amount(values, prices):
+    ''' Convert values to whole numbers of shares at prices, rounded toward zero
+
+    Args:
+        values: scalar or array of values; negative means short
+        prices: scalar or array of prices, broadcast against values
+    Returns:
+        int64 array of amounts
+    Raises:
+        ValueError: a price is not positive or is NaN
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if not np.all(prices > 0):
+        raise ValueError('prices must be positive numbers')
+    return np.trunc(values / prices).astype(np.int64)
+
+
+def weight_to_amount(weights, prices, portfolio_value):
+    ''' Convert portfolio weights to whole numbers of shares, rounded toward zero; see value_to_amount '''
+    return value_to_amount(np.asarray(weights, dtype=np.float64) * float(portfolio_value), prices)
+
+
+def order_deltas(current, target):
+    ''' Return the order amounts which move current amounts to target amounts, as an int64 array '''
+    return np.asarray(target, dtype=np.int64) - np.asarray(current, dtype=np.int64)
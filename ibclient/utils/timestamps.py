@@ -0,0 +1,103 @@
+# coding=utf-8
+
+'''
+Decode the timestamps TWS sends with historical bars to int64 nanoseconds
+Created on 10/2026
+'''
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import pytz
+
+
+NS_PER_SEC = 10 ** 9
+NS_PER_DAY = 86400 * NS_PER_SEC
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_timezones = {}  # key: timezone name; value: pytz timezone instance
+
+
+def get_timezone(name):
+    ''' Return a pytz timezone instance; instances are created once per name '''
+    tz = _timezones.get(name)
+    if tz is None:
+        tz = _timezones[name] = pytz.timezone(name)
+    return tz
+
+
+def parse_bar_time(value, tz_name=None):
+    ''' Convert a bar time from TWS to int64 nanoseconds since epoch.
+
+        Supported formats:
+            '20161020'                      daily bars; returns midnight of the date (no timezone)
+            '1476979560'                    epoch seconds (formatDate=2); returns UTC time
+            '20161020 23:46:00'             formatDate=1, one or two spaces; the time is in tz_name
+            '20161020 23:46:00 US/Eastern'  time with timezone name
+        Intraday times are returned in UTC. Times without timezone are read in tz_name,
+        or in the local timezone of this machine if tz_name is None.
+
+    Args:
+        value: string or int from historicalData
+        tz_name: timezone name of times without timezone, e.g. the timezone TWS logs in with
+    Returns:
+        int; nanoseconds since 1970-01-01
+    Raises:
+        ValueError: the value is not in a supported format
+    '''
+    value = str(value).strip()
+    if value.isdigit():
+        if len(value) == 8:
+            d = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+            return (d.toordinal() - EPOCH_ORDINAL) * NS_PER_DAY
+        return int(value) * NS_PER_SEC
+
+    parts = value.split()
+    if len(parts) not in (2, 3) or len(parts[0]) != 8 or len(parts[1]) != 8:
+        raise ValueError("unknown bar time format: %s" % value)
+
+    d, t = parts[0], parts[1]
+    dt = datetime(int(d[:4]), int(d[4:6]), int(d[6:8]), int(t[:2]), int(t[3:5]), int(t[6:8]))
+    if len(parts) == 3:
+        tz_name = parts[2]
+    if tz_name is None:
+        return int(dt.timestamp()) * NS_PER_SEC
+    return int(get_timezone(tz_name).localize(dt).timestamp()) * NS_PER_SEC
+
+
+def to_datetime_index(times, tz_name=None):
+    ''' Convert int64 nanoseconds from parse_bar_time to a DatetimeIndex in one pass.
+
+    Args:
+        times: a sequence or array of int64 nanoseconds
+        tz_name: convert UTC times to the wall clock time of this timezone, e.g. the exchange timezone.
+                 None keeps the times as they are, e.g. for daily bars.
+    Returns:
+        a DatetimeIndex without timezone
+    '''
+    index = pd.DatetimeIndex(np.asarray(times, dtype='i8').view('datetime64[ns]'), name='time')
+    if tz_name is not None:
+        index = index.tz_localize('UTC').tz_convert(tz_name).tz_localize(None)
+    return index
+
+
+def convert_wall_clock(dt, from_tz_name, to_tz_name):
+    ''' Convert a datetime without timezone from the wall clock of one timezone to another.
+
+    Args:
+        dt: datetime without timezone
+        from_tz_name: timezone of dt; None means the local timezone of this machine
+        to_tz_name: target timezone; None returns dt unchanged, e.g. for daily bars
+    Returns:
+        a datetime without timezone
+    '''
+    if to_tz_name is None:
+        return dt
+    if from_tz_name is None:
+        aware = dt.astimezone()
+    else:
+        aware = get_timezone(from_tz_name).localize(dt)
+    return aware.astimezone(get_timezone(to_tz_name)).replace(tzinfo=None)
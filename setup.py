@@ -35,11 +35,10 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Topic :: Software Development :: Libraries :: Python Modules',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3.7',
     ],
+    python_requires='>=3.7',
     packages=find_packages(),
     install_requires=parse_requirements('requirements.txt'),
     tests_require=parse_requirements('requirements.txt'),
@@ -0,0 +1,963 @@
+# -*- coding:utf-8 -*-
+'''
+A local stand-in of TWS for offline tests and benchmarks.
+
+TWSServer speaks enough of the TWS socket protocol (server version 69) for IbPy's EClientSocket.eConnect,
+and answers market data, history, contract, fundamental and order requests with scripted or synthetic data.
+Replies are delayed by a configurable latency, and streams (ticks, market depth and real-time bars)
+are sent at configurable rates, so IBClient can be measured without a TWS login.
+
+    server = TWSServer(latency=0.01, tick_rate=100)
+    server.start()
+    client = IBClient(port=server.port, client_id=1)
+    client.connect()
+    ...
+    client.disconnect()
+    server.stop()
+
+Created on 10/2026
+'''
+import sys
+import heapq
+import random
+import socket
+import threading
+import time
+import traceback
+import zlib
+from datetime import datetime, timedelta
+from os import path
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+from ibclient.utils.duration import parse_bar_size, duration_start
+
+
+# incoming message IDs, see EClientSocket
+REQ_MKT_DATA = 1
+CANCEL_MKT_DATA = 2
+PLACE_ORDER = 3
+CANCEL_ORDER = 4
+REQ_OPEN_ORDERS = 5
+REQ_ACCOUNT_DATA = 6
+REQ_EXECUTIONS = 7
+REQ_IDS = 8
+REQ_CONTRACT_DATA = 9
+REQ_MKT_DEPTH = 10
+CANCEL_MKT_DEPTH = 11
+SET_SERVER_LOGLEVEL = 14
+REQ_ALL_OPEN_ORDERS = 16
+REQ_MANAGED_ACCTS = 17
+REQ_HISTORICAL_DATA = 20
+CANCEL_HISTORICAL_DATA = 25
+REQ_CURRENT_TIME = 49
+REQ_REAL_TIME_BARS = 50
+CANCEL_REAL_TIME_BARS = 51
+REQ_FUNDAMENTAL_DATA = 52
+CANCEL_FUNDAMENTAL_DATA = 53
+REQ_GLOBAL_CANCEL = 58
+REQ_MARKET_DATA_TYPE = 59
+REQ_POSITIONS = 61
+REQ_ACCOUNT_SUMMARY = 62
+CANCEL_ACCOUNT_SUMMARY = 63
+CANCEL_POSITIONS = 64
+
+# outgoing message IDs, see EReader
+TICK_PRICE = 1
+TICK_SIZE = 2
+ORDER_STATUS = 3
+ERR_MSG = 4
+ACCT_VALUE = 6
+PORTFOLIO_VALUE = 7
+ACCT_UPDATE_TIME = 8
+NEXT_VALID_ID = 9
+CONTRACT_DATA = 10
+EXECUTION_DATA = 11
+MARKET_DEPTH = 12
+MANAGED_ACCTS = 15
+HISTORICAL_DATA = 17
+TICK_STRING = 46
+CURRENT_TIME = 49
+REAL_TIME_BARS = 50
+FUNDAMENTAL_DATA = 51
+CONTRACT_DATA_END = 52
+OPEN_ORDER_END = 53
+ACCT_DOWNLOAD_END = 54
+EXECUTION_DATA_END = 55
+TICK_SNAPSHOT_END = 57
+COMMISSION_REPORT = 59
+POSITION = 61
+POSITION_END = 62
+ACCOUNT_SUMMARY = 63
+ACCOUNT_SUMMARY_END = 64
+
+# contract fields sent by each request, in wire order
+MKT_DATA_CONTRACT = ('conId', 'symbol', 'secType', 'expiry', 'strike', 'right', 'multiplier', 'exchange',
+                     'primaryExch', 'currency', 'localSymbol', 'tradingClass')
+DETAILS_CONTRACT = ('conId', 'symbol', 'secType', 'expiry', 'strike', 'right', 'multiplier', 'exchange',
+                    'currency', 'localSymbol', 'tradingClass')
+FUNDAMENTAL_CONTRACT = ('conId', 'symbol', 'secType', 'exchange', 'primaryExch', 'currency', 'localSymbol')
+ORDER_CONTRACT = MKT_DATA_CONTRACT + ('secIdType', 'secId')
+
+FIN_RATIOS = 'TTMNPMGN=16.1298;NLOW=80.6;QCURRATIO=1.42071;TTMREV=259842;MKTCAP=363007.5;BETA=0.90979;'
+DIVIDENDS = '0.83,0.92,20130219,0.23'
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _utc_now():
+    return EPOCH + timedelta(seconds=int(time.time()))
+
+
+def _encode(field):
+    ''' Encode one field like EClientSocket.send: bools as 1/0, None as an empty field '''
+    if field is None:
+        return '\0'
+    if isinstance(field, bool):
+        return '%d\0' % field
+    return '%s\0' % field
+
+
+class _FieldReader(object):
+    ''' Read the null terminated fields of the TWS protocol from a socket '''
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._buf = b''
+        self._pos = 0
+
+    def read(self):
+        while True:
+            end = self._buf.find(b'\0', self._pos)
+            if end >= 0:
+                field = self._buf[self._pos:end].decode('utf-8', 'replace')
+                self._pos = end + 1
+                return field
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise EOFError('client closed the connection')
+            self._buf = self._buf[self._pos:] + chunk
+            self._pos = 0
+
+    def read_int(self):
+        value = self.read()
+        return int(float(value)) if value else 0
+
+    def read_float(self):
+        value = self.read()
+        return float(value) if value else 0.
+
+    def read_bool(self):
+        return self.read() in ('1', 'True', 'true')
+
+    def read_fields(self, names):
+        return dict((name, self.read()) for name in names)
+
+
+class _Stream(object):
+    ''' A thread which calls step(i) at a fixed rate until stopped or count steps are done '''
+
+    def __init__(self, step, rate, count=None):
+        self._step = step
+        self._interval = 1. / rate if rate else 0.
+        self._count = count
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        i = 0
+        next_time = time.time()
+        while not self._stop.is_set() and (self._count is None or i < self._count):
+            if self._interval:
+                delay = next_time - time.time()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                next_time += self._interval
+            try:
+                self._step(i)
+            except (socket.error, EOFError):
+                break
+            i += 1
+
+
+class ClientSession(object):
+    ''' One connected client: reads its requests and sends the replies of the server '''
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.client_id = None
+        self._sock = sock
+        self._reader = _FieldReader(sock)
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._streams = {}          # key: (kind, request ID); value: _Stream
+        self._queue = []            # heap of (due time, seq, function, args) of delayed replies
+        self._queue_cond = threading.Condition()
+        self._seq = 0
+        self._handlers = {
+            REQ_MKT_DATA: self._req_mkt_data,
+            CANCEL_MKT_DATA: self._cancel_stream('tick'),
+            PLACE_ORDER: self._place_order,
+            CANCEL_ORDER: self._cancel_order,
+            REQ_OPEN_ORDERS: self._req_open_orders,
+            REQ_ACCOUNT_DATA: self._req_account_data,
+            REQ_EXECUTIONS: self._req_executions,
+            REQ_IDS: self._req_ids,
+            REQ_CONTRACT_DATA: self._req_contract_data,
+            REQ_MKT_DEPTH: self._req_mkt_depth,
+            CANCEL_MKT_DEPTH: self._cancel_stream('depth'),
+            SET_SERVER_LOGLEVEL: self._ignore(1),
+            REQ_ALL_OPEN_ORDERS: self._req_open_orders,
+            REQ_MANAGED_ACCTS: self._req_managed_accts,
+            REQ_HISTORICAL_DATA: self._req_historical_data,
+            CANCEL_HISTORICAL_DATA: self._ignore(1),
+            REQ_CURRENT_TIME: self._req_current_time,
+            REQ_REAL_TIME_BARS: self._req_real_time_bars,
+            CANCEL_REAL_TIME_BARS: self._cancel_stream('bar'),
+            REQ_FUNDAMENTAL_DATA: self._req_fundamental_data,
+            CANCEL_FUNDAMENTAL_DATA: self._ignore(1),
+            REQ_GLOBAL_CANCEL: self._ignore(0),
+            REQ_MARKET_DATA_TYPE: self._ignore(1),
+            REQ_POSITIONS: self._req_positions,
+            REQ_ACCOUNT_SUMMARY: self._req_account_summary,
+            CANCEL_ACCOUNT_SUMMARY: self._ignore(1),
+            CANCEL_POSITIONS: self._ignore(0),
+        }
+
+    #
+    # connection
+    #
+    def run(self):
+        worker = threading.Thread(target=self._run_queue)
+        worker.daemon = True
+        try:
+            self._handshake()
+            worker.start()
+            while not self._closed.is_set():
+                msg_id = self._reader.read_int()
+                self._reader.read_int()         # version of the message
+                handler = self._handlers.get(msg_id)
+                if handler is None:
+                    # the fields of an unknown message can't be skipped, so the connection is lost
+                    print('TWSServer: unsupported message %d, closing the connection' % msg_id)
+                    break
+                handler()
+        except (socket.error, EOFError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def _handshake(self):
+        self._reader.read_int()                 # client version
+        now = _utc_now().strftime('%Y%m%d %H:%M:%S')
+        self.send(self.server.SERVER_VERSION, now + ' UTC')
+        self.client_id = self._reader.read_int()
+        self.send(NEXT_VALID_ID, 1, self.server.next_order_id())
+        self.send(MANAGED_ACCTS, 1, ','.join(self.server.accounts))
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for stream in list(self._streams.values()):
+            stream.stop()
+        with self._queue_cond:
+            self._queue_cond.notify()
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._sock.close()
+        self.server._remove_session(self)
+
+    def send(self, *fields):
+        ''' Send one message; None and empty strings are sent as empty fields '''
+        data = ''.join(_encode(f) for f in fields).encode('utf-8')
+        with self._send_lock:
+            if self._closed.is_set():
+                raise EOFError('connection closed')
+            self._sock.sendall(data)
+            self.server.messages_sent += 1
+
+    def later(self, func, *args):
+        ''' Run func(*args) after the latency of the server; replies keep the order of the requests '''
+        due = time.time() + self.server.latency
+        if self.server.jitter:
+            due += random.uniform(0, self.server.jitter)
+        with self._queue_cond:
+            self._seq += 1
+            heapq.heappush(self._queue, (due, self._seq, func, args))
+            self._queue_cond.notify()
+
+    def _run_queue(self):
+        while not self._closed.is_set():
+            with self._queue_cond:
+                while not self._queue and not self._closed.is_set():
+                    self._queue_cond.wait()
+                if self._closed.is_set():
+                    return
+                due, _, func, args = self._queue[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._queue_cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+            try:
+                func(*args)
+            except (socket.error, EOFError):
+                return
+            except Exception:
+                traceback.print_exc()
+
+    def _start_stream(self, kind, req_id, step, rate, count=None):
+        self._stop_stream(kind, req_id)
+        self._streams[(kind, req_id)] = _Stream(step, rate, count).start()
+
+    def _stop_stream(self, kind, req_id):
+        stream = self._streams.pop((kind, req_id), None)
+        if stream is not None:
+            stream.stop()
+
+    def _cancel_stream(self, kind):
+        def cancel():
+            req_id = self._reader.read_int()
+            self.server._record('cancel', kind=kind, req_id=req_id)
+            self._stop_stream(kind, req_id)
+        return cancel
+
+    def _ignore(self, num_fields):
+        def ignore():
+            for _ in range(num_fields):
+                self._reader.read()
+        return ignore
+
+    def _read_combo_legs(self, fields_per_leg):
+        return [[self._reader.read() for _ in range(fields_per_leg)] for _ in range(self._reader.read_int())]
+
+    def _read_under_comp(self):
+        if self._reader.read_bool():
+            self._reader.read_fields(('conId', 'delta', 'price'))
+
+    def _error(self, req_id, code, msg):
+        self.send(ERR_MSG, 2, req_id, code, msg)
+
+    def _scripted_error(self, req_id, contract):
+        ''' Send the error scripted for the symbol of a request, if any, and return True '''
+        error = self.server.errors.get(contract.get('symbol'))
+        if error is None:
+            return False
+        self.later(self._error, req_id, error[0], error[1])
+        return True
+
+    #
+    # market data
+    #
+    def _req_mkt_data(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(MKT_DATA_CONTRACT)
+        if contract['secType'].upper() == 'BAG':
+            self._read_combo_legs(4)
+        self._read_under_comp()
+        generic_ticks = r.read()
+        snapshot = r.read_bool()
+        self.server._record('reqMktData', req_id=req_id, contract=contract, generic_ticks=generic_ticks,
+                            snapshot=snapshot)
+        if self._scripted_error(req_id, contract):
+            return
+
+        quote = self.server.quote(contract['symbol'])
+        if snapshot:
+            self.later(self._send_snapshot, req_id, quote)
+            return
+        if generic_ticks:
+            self.later(self._send_generic_ticks, req_id, generic_ticks)
+            return
+        self.later(self._start_stream, 'tick', req_id, self._tick_step(req_id, quote),
+                   self.server.tick_rate, self.server.tick_count)
+
+    def _send_snapshot(self, req_id, quote):
+        for tick_type in (1, 2, 4):
+            self.send(TICK_PRICE, 3, req_id, tick_type, quote[tick_type], quote['size'], 1)
+        for tick_type in (6, 7, 9, 14):
+            self.send(TICK_PRICE, 3, req_id, tick_type, quote[tick_type], 0, 0)
+        self.send(TICK_SIZE, 1, req_id, 8, quote['volume'])
+        self.send(TICK_SNAPSHOT_END, 1, req_id)
+
+    def _send_generic_ticks(self, req_id, generic_ticks):
+        for tick in generic_ticks.split(','):
+            if tick == '258':
+                self.send(TICK_STRING, 6, req_id, 47, self.server.fin_ratios)
+            elif tick == '456':
+                self.send(TICK_STRING, 6, req_id, 59, self.server.dividends)
+
+    def _tick_step(self, req_id, quote):
+        rng = random.Random(req_id)
+        price = [quote[4]]
+
+        def step(i):
+            # a random walk of the last price; bid and ask follow it
+            kind = i % 3
+            if kind == 0:
+                price[0] = round(max(0.01, price[0] + rng.choice((-0.01, 0., 0.01))), 2)
+                self.send(TICK_PRICE, 3, req_id, 4, price[0], rng.randint(1, 10) * 100, 1)
+            elif kind == 1:
+                self.send(TICK_PRICE, 3, req_id, 1, round(price[0] - 0.01, 2), rng.randint(1, 50) * 100, 1)
+            else:
+                self.send(TICK_PRICE, 3, req_id, 2, round(price[0] + 0.01, 2), rng.randint(1, 50) * 100, 1)
+        return step
+
+    def _req_mkt_depth(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(DETAILS_CONTRACT)
+        num_rows = r.read_int()
+        self.server._record('reqMktDepth', req_id=req_id, contract=contract, num_rows=num_rows)
+        if self._scripted_error(req_id, contract):
+            return
+        self.later(self._start_stream, 'depth', req_id,
+                   self._depth_step(req_id, self.server.quote(contract['symbol'])[4], num_rows),
+                   self.server.depth_rate, self.server.depth_count)
+
+    def _depth_step(self, req_id, price, num_rows):
+        rng = random.Random(req_id)
+
+        def step(i):
+            # the first 2 * num_rows updates insert the book; the later ones update random rows
+            operation = 0 if i < 2 * num_rows else 1
+            position = (i // 2) % num_rows
+            side = i % 2                        # 0: ask, 1: bid
+            row_price = round(price + (0.01 * (position + 1) if side == 0 else -0.01 * (position + 1)), 2)
+            self.send(MARKET_DEPTH, 1, req_id, position, operation, side, row_price, rng.randint(1, 100) * 100)
+        return step
+
+    def _req_real_time_bars(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(MKT_DATA_CONTRACT)
+        bar_size = r.read_int()
+        what_to_show = r.read()
+        use_rth = r.read_int()
+        self.server._record('reqRealTimeBars', req_id=req_id, contract=contract, bar_size=bar_size,
+                            what_to_show=what_to_show, use_rth=use_rth)
+        if self._scripted_error(req_id, contract):
+            return
+        self.later(self._start_stream, 'bar', req_id,
+                   self._bar_step(req_id, self.server.quote(contract['symbol'])[4]),
+                   1. / self.server.bar_interval if self.server.bar_interval else 0, self.server.bar_count)
+
+    def _bar_step(self, req_id, price):
+        rng = random.Random(req_id)
+        start = int(time.time()) // 5 * 5
+        last = [price]
+
+        def step(i):
+            open = last[0]
+            close = round(max(0.01, open + rng.choice((-0.02, -0.01, 0., 0.01, 0.02))), 2)
+            high = round(max(open, close) + rng.choice((0., 0.01)), 2)
+            low = round(min(open, close) - rng.choice((0., 0.01)), 2)
+            last[0] = close
+            volume = rng.randint(1, 20) * 100
+            self.send(REAL_TIME_BARS, 3, req_id, start + 5 * i, open, high, low, close, volume,
+                      round((open + close) / 2, 4), rng.randint(1, 20))
+        return step
+
+    #
+    # historical data
+    #
+    def _req_historical_data(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(MKT_DATA_CONTRACT)
+        r.read()                                # includeExpired
+        end = r.read()
+        bar_size = r.read()
+        duration = r.read()
+        use_rth = r.read_int()
+        what_to_show = r.read()
+        format_date = r.read_int()
+        if contract['secType'].upper() == 'BAG':
+            self._read_combo_legs(4)
+        self.server._record('reqHistoricalData', req_id=req_id, contract=contract, end=end, bar_size=bar_size,
+                            duration=duration, use_rth=use_rth, what_to_show=what_to_show,
+                            format_date=format_date)
+        if self._scripted_error(req_id, contract):
+            return
+
+        bars = self.server.history.get(contract['symbol'])
+        if bars is None:
+            bars = self.server.synthetic_history(contract['symbol'], end, duration, bar_size, format_date)
+        self.later(self._send_history, req_id, bars)
+
+    def _send_history(self, req_id, bars):
+        fields = [HISTORICAL_DATA, 3, req_id, bars[0][0] if bars else '', bars[-1][0] if bars else '', len(bars)]
+        for date, open, high, low, close, volume in bars:
+            fields.extend((date, open, high, low, close, int(volume), round((high + low) / 2, 4), 'false', 1))
+        self.send(*fields)
+
+    #
+    # contract and fundamental data
+    #
+    def _req_contract_data(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(DETAILS_CONTRACT + ('includeExpired', 'secIdType', 'secId'))
+        self.server._record('reqContractDetails', req_id=req_id, contract=contract)
+        if self._scripted_error(req_id, contract):
+            return
+        self.later(self._send_contract_details, req_id, self.server.contract_details(contract))
+
+    def _send_contract_details(self, req_id, d):
+        self.send(CONTRACT_DATA, 8, req_id, d['symbol'], d['secType'], d['expiry'], d['strike'], d['right'],
+                  d['exchange'], d['currency'], d['localSymbol'], d['marketName'], d['tradingClass'], d['conId'],
+                  d['minTick'], d['multiplier'], d['orderTypes'], d['validExchanges'], 1, 0, d['longName'],
+                  d['primaryExch'], '', d['industry'], d['category'], d['subcategory'], d['timeZoneId'],
+                  d['tradingHours'], d['liquidHours'], '', '', 0)
+        self.send(CONTRACT_DATA_END, 1, req_id)
+
+    def _req_fundamental_data(self):
+        r = self._reader
+        req_id = r.read_int()
+        contract = r.read_fields(FUNDAMENTAL_CONTRACT)
+        report_type = r.read()
+        self.server._record('reqFundamentalData', req_id=req_id, contract=contract, report_type=report_type)
+        if self._scripted_error(req_id, contract):
+            return
+        data = self.server.fundamentals.get(report_type)
+        if data is None:
+            data = '<?xml version="1.0" encoding="UTF-8"?><%s symbol="%s"/>' % (report_type, contract['symbol'])
+        self.later(self.send, FUNDAMENTAL_DATA, 1, req_id, data)
+
+    #
+    # orders
+    #
+    def _req_ids(self):
+        num_ids = self._reader.read_int()
+        self.server._record('reqIds', num_ids=num_ids)
+        self.later(lambda: self.send(NEXT_VALID_ID, 1, self.server.next_order_id()))
+
+    def _place_order(self):
+        r = self._reader
+        order_id = r.read_int()
+        contract = r.read_fields(ORDER_CONTRACT)
+        order = r.read_fields(('action', 'totalQuantity', 'orderType', 'lmtPrice', 'auxPrice', 'tif', 'ocaGroup',
+                               'account', 'openClose', 'origin', 'orderRef', 'transmit', 'parentId',
+                               'blockOrder', 'sweepToFill', 'displaySize', 'triggerMethod', 'outsideRth',
+                               'hidden'))
+        if contract['secType'].upper() == 'BAG':
+            contract['comboLegs'] = self._read_combo_legs(8)
+            self._read_combo_legs(1)            # order combo leg prices
+            self._read_combo_legs(2)            # smart combo routing params
+        r.read_fields(('', 'discretionaryAmt', 'goodAfterTime', 'goodTillDate', 'faGroup', 'faMethod',
+                       'faPercentage', 'faProfile', 'shortSaleSlot', 'designatedLocation', 'exemptCode',
+                       'ocaType', 'rule80A', 'settlingFirm', 'allOrNone', 'minQty', 'percentOffset',
+                       'eTradeOnly', 'firmQuoteOnly', 'nbboPriceCap', 'auctionStrategy', 'startingPrice',
+                       'stockRefPrice', 'delta', 'stockRangeLower', 'stockRangeUpper',
+                       'overridePercentageConstraints', 'volatility', 'volatilityType'))
+        if r.read():                            # deltaNeutralOrderType
+            r.read_fields(('auxPrice', 'conId', 'settlingFirm', 'clearingAccount', 'clearingIntent',
+                           'openClose', 'shortSale', 'shortSaleSlot', 'designatedLocation'))
+        else:
+            r.read()                            # deltaNeutralAuxPrice
+        r.read_fields(('continuousUpdate', 'referencePriceType', 'trailStopPrice', 'trailingPercent',
+                       'scaleInitLevelSize', 'scaleSubsLevelSize'))
+        scale_price_increment = r.read()
+        if scale_price_increment and float(scale_price_increment) > 0:
+            r.read_fields(('adjustValue', 'adjustInterval', 'profitOffset', 'autoReset', 'initPosition',
+                           'initFillQty', 'randomPercent'))
+        r.read_fields(('scaleTable', 'activeStartTime', 'activeStopTime'))
+        if r.read():                            # hedgeType
+            r.read()                            # hedgeParam
+        r.read_fields(('optOutSmartRouting', 'clearingAccount', 'clearingIntent', 'notHeld'))
+        self._read_under_comp()
+        if r.read():                            # algoStrategy
+            self._read_combo_legs(2)            # algo params
+        r.read()                                # whatIf
+
+        order['orderId'] = order_id
+        order['totalQuantity'] = int(float(order['totalQuantity']))
+        self.server._record('placeOrder', order_id=order_id, contract=contract, order=order)
+        self.server.order_placed(order_id)
+        if self._scripted_error(order_id, contract):
+            return
+        self.later(self._submit_order, order_id, contract, order)
+
+    def _submit_order(self, order_id, contract, order):
+        quantity = order['totalQuantity']
+        perm_id = self.server.perm_id(order_id)
+        self.send(ORDER_STATUS, 6, order_id, 'Submitted', 0, quantity, 0., perm_id, 0, 0., self.client_id, '')
+        if self.server.fill_delay is not None:
+            timer = threading.Timer(self.server.fill_delay, self._fill_order, (order_id, contract, order))
+            timer.daemon = True
+            timer.start()
+
+    def _fill_order(self, order_id, contract, order):
+        if not self.server._fill(self.client_id, order_id):
+            return                              # cancelled meanwhile
+        quantity = order['totalQuantity']
+        if order['orderType'] == 'LMT' and order['lmtPrice']:
+            price = float(order['lmtPrice'])
+        else:
+            price = self.server.quote(contract['symbol'])[4]
+        conId = contract['conId'] if contract['conId'] not in ('', '0') else self.server.con_id(contract['symbol'])
+        account = order['account'] or self.server.accounts[0]
+        exec_id = '%08x.%d.01' % (self.server.perm_id(order_id), order_id)
+        side = 'BOT' if order['action'] == 'BUY' else 'SLD'
+        execution = (order_id, conId, contract['symbol'], contract['secType'], contract['expiry'],
+                     contract['strike'] or 0., contract['right'], contract['multiplier'], contract['exchange'],
+                     contract['currency'], contract['localSymbol'], contract['tradingClass'], exec_id,
+                     _utc_now().strftime('%Y%m%d  %H:%M:%S'), account, contract['exchange'], side, quantity,
+                     price, self.server.perm_id(order_id), self.client_id, 0, quantity, price,
+                     order['orderRef'], '', '')
+        self.server.executions.append(execution)
+        self.server.update_position(account, contract, conId, quantity if side == 'BOT' else -quantity, price)
+
+        try:
+            self.send(EXECUTION_DATA, 10, -1, *execution)
+            self.send(ORDER_STATUS, 6, order_id, 'Filled', quantity, 0, price, self.server.perm_id(order_id), 0,
+                      price, self.client_id, '')
+            self.send(COMMISSION_REPORT, 1, exec_id, self.server.commission * quantity,
+                      contract['currency'] or 'USD', '', '', '')
+        except (socket.error, EOFError):
+            pass                                # the client disconnected before the fill timer fired
+
+    def _cancel_order(self):
+        order_id = self._reader.read_int()
+        self.server._record('cancelOrder', order_id=order_id)
+        self.later(self._send_cancel, order_id)
+
+    def _send_cancel(self, order_id):
+        if self.server._fill(self.client_id, order_id, status='Cancelled'):
+            self.send(ORDER_STATUS, 6, order_id, 'Cancelled', 0, 0, 0., self.server.perm_id(order_id), 0, 0.,
+                      self.client_id, '')
+        else:
+            self._error(order_id, 10147, 'OrderId %d that needs to be cancelled is not found.' % order_id)
+
+    def _req_open_orders(self):
+        self.server._record('reqOpenOrders')
+        self.later(self.send, OPEN_ORDER_END, 1)
+
+    def _req_executions(self):
+        r = self._reader
+        req_id = r.read_int()
+        r.read_fields(('clientId', 'acctCode', 'time', 'symbol', 'secType', 'exchange', 'side'))
+        self.server._record('reqExecutions', req_id=req_id)
+        self.later(self._send_executions, req_id)
+
+    def _send_executions(self, req_id):
+        for execution in list(self.server.executions):
+            self.send(EXECUTION_DATA, 10, req_id, *execution)
+        self.send(EXECUTION_DATA_END, 1, req_id)
+
+    #
+    # account
+    #
+    def _req_managed_accts(self):
+        self.later(self.send, MANAGED_ACCTS, 1, ','.join(self.server.accounts))
+
+    def _req_current_time(self):
+        self.later(lambda: self.send(CURRENT_TIME, 1, int(time.time())))
+
+    def _req_account_data(self):
+        subscribe = self._reader.read_bool()
+        account = self._reader.read() or self.server.accounts[0]
+        self.server._record('reqAccountUpdates', subscribe=subscribe, account=account)
+        if subscribe:
+            self.later(self._send_account_data, account)
+
+    def _send_account_data(self, account):
+        for key, (value, currency) in sorted(self.server.account_values.items()):
+            self.send(ACCT_VALUE, 2, key, value, currency, account)
+        for (acct, conId), p in sorted(self.server.positions.items()):
+            if acct != account:
+                continue
+            price = self.server.quote(p['symbol'])[4]
+            self.send(PORTFOLIO_VALUE, 8, conId, p['symbol'], p['secType'], p['expiry'], p['strike'] or 0.,
+                      p['right'], p['multiplier'], p['primaryExch'], p['currency'], p['localSymbol'],
+                      p['tradingClass'], p['position'], price, price * p['position'], p['avgCost'],
+                      (price - p['avgCost']) * p['position'], 0., account)
+        self.send(ACCT_UPDATE_TIME, 1, _utc_now().strftime('%H:%M'))
+        self.send(ACCT_DOWNLOAD_END, 1, account)
+
+    def _req_positions(self):
+        self.server._record('reqPositions')
+        self.later(self._send_positions)
+
+    def _send_positions(self):
+        for (account, conId), p in sorted(self.server.positions.items()):
+            self.send(POSITION, 3, account, conId, p['symbol'], p['secType'], p['expiry'], p['strike'] or 0.,
+                      p['right'], p['multiplier'], p['exchange'], p['currency'], p['localSymbol'],
+                      p['tradingClass'], p['position'], p['avgCost'])
+        self.send(POSITION_END, 1)
+
+    def _req_account_summary(self):
+        r = self._reader
+        req_id = r.read_int()
+        group = r.read()
+        tags = r.read()
+        self.server._record('reqAccountSummary', req_id=req_id, group=group, tags=tags)
+        self.later(self._send_account_summary, req_id, tags.split(','))
+
+    def _send_account_summary(self, req_id, tags):
+        for account in self.server.accounts:
+            for tag in tags:
+                if tag in self.server.account_values:
+                    value, currency = self.server.account_values[tag]
+                    self.send(ACCOUNT_SUMMARY, 1, req_id, account, tag, value, currency)
+        self.send(ACCOUNT_SUMMARY_END, 1, req_id)
+
+
+class TWSServer(object):
+    ''' A local TWS stand-in listening on host:port; port 0 picks a free port, see the port attribute.
+
+        Timing:
+            latency: seconds before each request is answered; replies keep the order of the requests
+            jitter: up to this many seconds are added to the latency at random
+            tick_rate, depth_rate: messages per second of each reqMktData / reqMktDepth subscription;
+                                   0 sends as fast as possible
+            tick_count, depth_count, bar_count: number of messages of each subscription; None streams until
+                                                cancelled
+            bar_interval: seconds between real-time bars; TWS sends one 5 sec bar every 5 seconds
+            fill_delay: seconds before a submitted order is filled; None leaves orders working
+
+        Scripted data (synthetic data is used for anything not scripted):
+            quotes: key: symbol; value: dict of tick type to price, e.g. {1: 9.99, 2: 10.01, 4: 10.}
+            history: key: symbol; value: list of (date string, open, high, low, close, volume) bars
+            contracts: key: symbol; value: dict of contract details fields, e.g. {'conId': 8314, 'longName': 'IBM'}
+            fundamentals: key: reportType; value: xml string
+            errors: key: symbol; value: (error code, message) sent to any request of the symbol
+            account_values: key: account value key; value: (value, currency)
+
+        received is the list of (message name, fields) of all requests, for assertions.
+    '''
+
+    SERVER_VERSION = 69
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0., jitter=0., tick_rate=10., tick_count=None,
+                 depth_rate=10., depth_count=None, bar_interval=5., bar_count=None, fill_delay=0.,
+                 commission=0.005, accounts=('DU000001',), seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.tick_rate = tick_rate
+        self.tick_count = tick_count
+        self.depth_rate = depth_rate
+        self.depth_count = depth_count
+        self.bar_interval = bar_interval
+        self.bar_count = bar_count
+        self.fill_delay = fill_delay
+        self.commission = commission
+        self.accounts = list(accounts)
+        self.seed = seed
+
+        self.quotes = {}
+        self.history = {}
+        self.contracts = {}
+        self.fundamentals = {}
+        self.errors = {}
+        self.fin_ratios = FIN_RATIOS
+        self.dividends = DIVIDENDS
+        self.account_values = {'NetLiquidation': ('1000000.00', 'USD'),
+                               'TotalCashValue': ('1000000.00', 'USD'),
+                               'BuyingPower': ('4000000.00', 'USD'),
+                               'AvailableFunds': ('1000000.00', 'USD')}
+        self.positions = {}                     # key: (account, conId); value: dict of contract fields and position
+        self.executions = []
+        self.received = []
+        self.messages_sent = 0
+
+        self._lock = threading.Lock()
+        self._next_order_id = 1
+        self._orders = {}                       # key: (client ID, order ID); value: status
+        self._sessions = []
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(5)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._sock is None:
+            return
+        sock, self._sock = self._sock, None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        sock.close()
+        for session in list(self._sessions):
+            session.close()
+        self._thread.join(1.)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept(self):
+        while self._sock is not None:
+            try:
+                sock, _ = self._sock.accept()
+            except (socket.error, AttributeError):
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = ClientSession(self, sock)
+            with self._lock:
+                self._sessions.append(session)
+            thread = threading.Thread(target=session.run)
+            thread.daemon = True
+            thread.start()
+
+    def _remove_session(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _record(self, name, **fields):
+        self.received.append((name, fields))
+
+    def requests(self, name):
+        ''' Return the fields of all received requests of a message name, e.g. 'placeOrder' '''
+        return [fields for n, fields in self.received if n == name]
+
+    #
+    # orders
+    #
+    def next_order_id(self):
+        with self._lock:
+            return self._next_order_id
+
+    def order_placed(self, order_id):
+        with self._lock:
+            self._next_order_id = max(self._next_order_id, order_id + 1)
+            self._orders.setdefault(order_id, 'Submitted')
+
+    def _fill(self, client_id, order_id, status='Filled'):
+        ''' Move a working order to a final status; False if it's not working '''
+        with self._lock:
+            if self._orders.get(order_id) != 'Submitted':
+                return False
+            self._orders[order_id] = status
+            return True
+
+    def perm_id(self, order_id):
+        return 100000000 + order_id
+
+    def update_position(self, account, contract, conId, quantity, price):
+        with self._lock:
+            p = self.positions.get((account, conId))
+            if p is None:
+                p = dict(contract, position=0, avgCost=0.)
+                self.positions[(account, conId)] = p
+            position = p['position'] + quantity
+            if position and (p['position'] == 0 or (quantity > 0) == (p['position'] > 0)):
+                p['avgCost'] = (p['avgCost'] * p['position'] + price * quantity) / position
+            p['position'] = position
+
+    #
+    # synthetic data
+    #
+    def con_id(self, symbol):
+        return zlib.crc32(symbol.encode('utf-8')) % 100000000 + 1
+
+    def _rng(self, symbol):
+        return random.Random(self.seed ^ zlib.crc32(symbol.encode('utf-8')))
+
+    def quote(self, symbol):
+        ''' Return the snapshot quote of a symbol: dict of tick type to price, plus 'size' and 'volume' '''
+        rng = self._rng(symbol)
+        last = round(rng.uniform(10, 500), 2)
+        quote = {1: round(last - 0.01, 2), 2: round(last + 0.01, 2), 4: last,
+                 6: round(last * 1.01, 2), 7: round(last * 0.99, 2), 9: round(last * 0.995, 2),
+                 14: round(last * 1.002, 2), 'size': rng.randint(1, 50) * 100, 'volume': rng.randint(1, 100000) * 100}
+        quote.update(self.quotes.get(symbol, {}))
+        return quote
+
+    def contract_details(self, contract):
+        symbol = contract['symbol']
+        d = {'symbol': symbol, 'secType': contract['secType'] or 'STK', 'expiry': contract['expiry'],
+             'strike': contract['strike'] or 0., 'right': contract['right'],
+             'exchange': contract['exchange'] or 'SMART', 'currency': contract['currency'] or 'USD',
+             'localSymbol': contract['localSymbol'] or symbol, 'marketName': symbol,
+             'tradingClass': contract['tradingClass'] or symbol,
+             'conId': int(contract['conId'] or 0) or self.con_id(symbol), 'minTick': 0.01,
+             'multiplier': contract['multiplier'], 'orderTypes': 'LMT,MKT,STP,STPLMT,TRAIL',
+             'validExchanges': 'SMART,NYSE,ARCA,ISLAND', 'longName': '%s INC' % symbol,
+             'primaryExch': 'NYSE', 'industry': 'Technology', 'category': 'Computers',
+             'subcategory': 'Computer Services', 'timeZoneId': 'EST5EDT',
+             'tradingHours': '20261019:0400-2000', 'liquidHours': '20261019:0930-1600'}
+        d.update(self.contracts.get(symbol, {}))
+        return d
+
+    def synthetic_history(self, symbol, end, duration, bar_size, format_date=1, max_bars=5000):
+        ''' Return a random walk of bars covering duration up to end (UTC), at most max_bars of the latest ones.
+            Daily bars skip weekends and are dated 'YYYYMMDD'; intraday bars are dated by format_date.
+        '''
+        try:
+            end = datetime.strptime(end.strip()[:17], '%Y%m%d %H:%M:%S')
+        except ValueError:
+            end = _utc_now().replace(microsecond=0)
+        start = duration_start(end, duration)
+        step = parse_bar_size(bar_size)
+        daily = step >= timedelta(days=1)
+
+        times = []
+        t = end.replace(hour=0, minute=0, second=0) if daily else \
+            EPOCH + timedelta(seconds=int((end - EPOCH).total_seconds()) // int(step.total_seconds()) *
+                              int(step.total_seconds()))
+        while t > start and len(times) < max_bars:
+            if not daily or t.weekday() < 5:
+                times.append(t)
+            t -= step
+        times.reverse()
+
+        rng = self._rng(symbol)
+        price = self.quote(symbol)[4]
+        bars = []
+        for t in times:
+            open = price
+            close = round(max(0.01, open * (1 + rng.gauss(0, 0.01 if daily else 0.001))), 2)
+            high = round(max(open, close) * (1 + abs(rng.gauss(0, 0.002))), 2)
+            low = round(min(open, close) * (1 - abs(rng.gauss(0, 0.002))), 2)
+            price = close
+            if daily:
+                date = t.strftime('%Y%m%d')
+            elif format_date == 2:
+                date = str(int((t - EPOCH).total_seconds()))
+            else:
+                date = t.strftime('%Y%m%d  %H:%M:%S')
+            bars.append((date, open, high, low, close, rng.randint(1, 1000) * 100))
+        return bars
+
+
+if __name__ == "__main__":
+    ''' Run a stand-in TWS, e.g. python tests/tws_server.py 7497 '''
+    server = TWSServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 7497)
+    server.start()
+    print('TWS stand-in listening on %s:%d' % (server.host, server.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,514 @@
+# -*- coding:utf-8 -*-
+'''
+Offline tests of IBClient against the local TWS stand-in, see tests/tws_server.py
+
+Created on 10/2026
+'''
+import sys
+from os import path
+import unittest
+import time
+import asyncio
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ibclient import (IBClient, AsyncIBClient, Portfolio, LimitOrder, new_stock_contract, new_futures_contract)
+from ibclient.utils.pacing import (RequestClass, RequestScheduler, historical_request_class)
+from ibclient.utils.bar_buffer import BarRingBuffer
+from ibclient.account import PositionTable
+from ibclient.utils.timestamps import (NS_PER_SEC, parse_bar_time, to_datetime_index)
+from ibclient.utils import (RequestDetails, ResponseDetails, RequestRegistry, BarAggregator)
+
+sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
+from tests.tws_server import TWSServer
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TWSServer(latency=0.01, tick_rate=200, bar_interval=0.01, fill_delay=0.05)
+        self.server.history['HIST'] = [('20261014', 10., 11., 9., 10.5, 1000),
+                                       ('20261015', 10.5, 12., 10., 11.5, 2000)]
+        self.server.errors['BAD'] = (200, 'No security definition has been found for the request')
+        self.server.start()
+
+        self.con = IBClient(port=self.server.port, client_id=7, server_timezone='UTC')
+        self.assertTrue(self.con.connect())
+        self.stock = new_stock_contract('IBM')
+
+    def tearDown(self):
+        self.con.disconnect()
+        self.server.stop()
+
+    def test_tick_snapshot(self):
+        self.server.quotes['IBM'] = {1: 99.99, 2: 100.01, 4: 100.}
+        data = self.con.get_tick_snapshot(self.stock)
+        self.assertEqual(data['bidPrice1'], 99.99)
+        self.assertEqual(data['askPrice1'], 100.01)
+        self.assertEqual(data['lastPrice'], 100.)
+        self.assertEqual(len(self.con.ipc_msg_dict), 0)
+
+    def test_tick_snapshots(self):
+        self.server.quotes['IBM'] = {1: 99.99, 2: 100.01, 4: 100.}
+        symbols = ['IBM'] + ['S%03d' % i for i in range(30)]
+        df = self.con.get_tick_snapshots(symbols).set_index('symbol')
+        self.assertEqual(list(df.index), symbols)
+        self.assertEqual(df.loc['IBM', 'bidPrice1'], 99.99)
+        self.assertEqual(df.loc['IBM', 'lastPrice'], 100.)
+        self.assertEqual(df.loc['S007', 'lastPrice'], self.server.quote('S007')[4])
+        self.assertTrue(np.isnan(df.loc['IBM', 'openInterest']))
+
+        # contracts which share a symbol keep a row each
+        island = new_stock_contract('IBM')
+        island.m_exchange = 'ISLAND'
+        df = self.con.get_tick_snapshots([self.stock, island])
+        self.assertEqual(list(df['exchange']), ['SMART', 'ISLAND'])
+        self.assertEqual(list(df['lastPrice']), [100., 100.])
+        self.assertEqual(len(self.con.ipc_msg_dict), 0)
+
+    def test_tick_snapshots_in_flight(self):
+        symbols = ['S%03d' % i for i in range(20)]
+        futures = [self.con.get_tick_snapshot_async(symbol) for symbol in symbols]
+        for symbol, future in zip(symbols, futures):
+            self.assertEqual(future.result(5)['lastPrice'], self.server.quote(symbol)[4])
+
+        # each request settles on its own; a late tick is kept within the grace window of its request
+        slow = self.con.get_tick_snapshot_async(self.stock, quiet_time=0.3)
+        fast = self.con.get_tick_snapshot_async('S001', quiet_time=0.01)
+        fast.result(5)
+        self.assertFalse(slow.done())
+        self.con.wrapper.tickPrice(slow.req_id, 4, 123.45, 0)
+        self.assertEqual(slow.result(5)['lastPrice'], 123.45)
+        self.assertEqual(len(self.con.ipc_msg_dict), 0)
+
+    def test_tick_stream(self):
+        req_id, _ = self.con.request_tick_data(self.stock, history_depth=1000)
+        time.sleep(0.3)
+        self.assertGreater(len(self.con.get_tick_history(req_id)), 10)
+        self.con.cancel_tick_request(req_id)
+
+        req_id, quote = self.con.request_tick_data(self.stock)
+        time.sleep(0.1)
+        self.assertIn('lastPrice', quote)
+        self.assertRaises(KeyError, self.con.get_tick_history, req_id)
+        self.con.cancel_tick_request(req_id)
+
+    def test_price_history(self):
+        df = self.con.get_price_history(new_stock_contract('HIST'), '20261016 00:00:00', '1 W', 'daily')
+        self.assertEqual(list(df['close']), [10.5, 11.5])
+
+        df = self.con.get_price_history(self.stock, '20261016 00:00:00', '3600 S', 'minute')
+        self.assertEqual(len(df), 60)
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    def test_stock_price_history(self):
+        symbols = ['S%03d' % i for i in range(10)]
+        self.server.latency = 0.2
+        started = time.time()
+        df = self.con.get_stock_price_history(symbols + ['S000'], '20261016 00:00:00', '1 W', 'daily',
+                                              max_concurrent=10)
+        # all requests are in flight at once: about one round trip instead of one per symbol
+        self.assertLess(time.time() - started, 1.)
+        self.assertEqual(list(df['symbol'].unique()), symbols)
+        self.assertEqual(len(df), 50)
+        self.assertEqual(len(self.server.requests('reqHistoricalData')), 10)
+        self.assertEqual(len(self.con.ipc_msg_dict), 0)
+
+    def test_stock_price_history_frame(self):
+        df = self.con.get_stock_price_history(['HIST', 'S001'], '20261016 00:00:00', '1 W', 'daily',
+                                              categorical_symbol=True)
+        self.assertEqual(str(df['symbol'].dtype), 'category')
+        self.assertEqual(list(df.columns), ['symbol', 'time', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(list(df['close'][:2]), [10.5, 11.5])
+
+        df = self.con.get_stock_price_history(['HIST', 'S001'], '20261016 00:00:00', '1 W', 'daily',
+                                              categorical_symbol=True, multi_index=True)
+        self.assertEqual(list(df.index.names), ['symbol', 'time'])
+        self.assertEqual(str(df.index.levels[0].dtype), 'category')
+        self.assertEqual(list(df.loc['HIST', 'close']), [10.5, 11.5])
+        self.assertEqual(len(df.loc['S001']), 5)
+
+    def test_price_history_chunks(self):
+        # a week of minute bars takes 7 requests of '1 D', the longest TWS accepts
+        progress = []
+        df = self.con.get_price_history(self.stock, '20261016 00:00:00', '1 W', 'minute', max_concurrent=3,
+                                        progress=lambda done, total: progress.append((done, total)))
+        requests = self.server.requests('reqHistoricalData')
+        self.assertEqual([r['duration'] for r in requests], ['1 D'] * 7)
+        self.assertEqual(progress[-1], (7, 7))
+        self.assertEqual(len(progress), 7)
+        self.assertEqual(len(df), 7 * 1440)
+        self.assertTrue(df.index.is_monotonic_increasing)
+        self.assertTrue(df.index.is_unique)
+
+    def test_parse_bar_time(self):
+        utc = parse_bar_time('1476979560')
+        self.assertEqual(to_datetime_index([utc])[0], np.datetime64('2016-10-20T16:06:00'))
+        # formatDate=1 times are in the given timezone, or in the one named after the time
+        self.assertEqual(parse_bar_time('20161020 12:06:00', 'US/Eastern'), utc)
+        self.assertEqual(parse_bar_time('20161020  12:06:00', 'US/Eastern'), utc)
+        self.assertEqual(parse_bar_time('20161020 12:06:00 US/Eastern', 'Asia/Hong_Kong'), utc)
+        self.assertEqual(parse_bar_time('20161021 00:06:00', 'Asia/Hong_Kong'), utc)
+        self.assertEqual(parse_bar_time('20161020 16:06:00', 'UTC'), utc)
+        # daily bars are dated at midnight without timezone
+        self.assertEqual(to_datetime_index([parse_bar_time('20161020')])[0], np.datetime64('2016-10-20'))
+        self.assertEqual(to_datetime_index([utc], 'US/Eastern')[0], np.datetime64('2016-10-20T12:06:00'))
+        with self.assertRaises(ValueError):
+            parse_bar_time('2016-10-20 12:06')
+
+    def test_price_history_calendar_durations(self):
+        # a year of daily bars fits one request, however it is spelled; longer windows are split by calendar year
+        one_year = self.con.get_price_history(self.stock, '20261016 00:00:00', '1 Y', 'daily')
+        twelve_months = self.con.get_price_history(self.stock, '20261016 00:00:00', '12 M', 'daily')
+        two_years = self.con.get_price_history(self.stock, '20261016 00:00:00', '2 Y', 'daily')
+        requests = self.server.requests('reqHistoricalData')
+        self.assertEqual([(r['end'], r['duration']) for r in requests],
+                         [('20261016 00:00:00', '1 Y'), ('20261016 00:00:00', '12 M'),
+                          ('20261016 00:00:00', '1 Y'), ('20251016 00:00:00', '1 Y')])
+        self.assertTrue(one_year.index.equals(twelve_months.index))
+        self.assertEqual(len(one_year), 261)
+        self.assertEqual(two_years.index[0], pd.Timestamp('20241017'))  # the first weekday after 2024-10-16
+        self.assertTrue(two_years.index.is_unique)
+
+    def test_bar_cache(self):
+        contract = new_stock_contract('IBM')
+        contract.m_conId = 8314
+        windows = [('20261016 12:00:00', '3600 S'), ('20261016 12:00:00', '1 D'), ('20261016 14:00:00', '1 D')]
+        uncached = [self.con.get_price_history(contract, ts_end, duration, 'minute') for ts_end, duration in windows]
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.con.enable_bar_cache(cache_dir)
+            # a full download, a hit, a wider window, a window served by downloading its tail only, and a hit
+            # within the stored bars
+            cached = [self.con.get_price_history(contract, ts_end, duration, 'minute')
+                      for ts_end, duration in windows[:1] + windows + windows[:1]]
+            self.con.bar_cache = None
+
+        self.assertEqual(len(cached[0]), 60)
+        self.assertTrue(cached[0].equals(uncached[0]))
+        self.assertTrue(cached[1].equals(uncached[0]))
+        self.assertEqual(len(cached[3]), 1440)
+        # the stand-in makes up new prices for each request, so only the bar times of a merged window can match
+        self.assertTrue(cached[3].index.equals(uncached[2].index))
+        self.assertTrue(cached[4].index.equals(uncached[0].index))
+        self.assertEqual(len(self.server.requests('reqHistoricalData')), 6)
+
+    def test_history_pacing(self):
+        # TWS paces only bars of 30 secs or less, so the 1 Y chunks of daily bars of one contract are not held
+        # back by the 5 requests / 2 secs limit per contract
+        started = time.time()
+        self.con.get_price_history(self.stock, '20261016 00:00:00', '10 Y', 'daily')
+        self.assertLess(time.time() - started, 1.5)
+        self.assertGreater(len(self.server.requests('reqHistoricalData')), 5)
+        self.assertEqual(historical_request_class('1 day'), RequestClass.HISTORICAL)
+        self.assertEqual(historical_request_class('30 secs'), RequestClass.SMALL_BAR_HISTORICAL)
+
+    def test_scheduler(self):
+        scheduler = RequestScheduler(max_msg_rate=10)
+        for _ in range(10):
+            scheduler.acquire(RequestClass.MARKET_DATA)
+
+        # with the message rate used up, queued requests go in priority order: orders before history
+        sent = []
+
+        def acquire(req_class):
+            scheduler.acquire(req_class)
+            sent.append(req_class)
+
+        threads = []
+        for req_class in (RequestClass.HISTORICAL, RequestClass.ORDER):
+            threads.append(threading.Thread(target=acquire, args=(req_class,)))
+            threads[-1].start()
+            while scheduler.queue_length() < len(threads):
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sent, [RequestClass.ORDER, RequestClass.HISTORICAL])
+
+        # a request held back by the pacing of its own class does not hold back other classes
+        scheduler = RequestScheduler(max_msg_rate=50)
+        for _ in range(5):
+            scheduler.acquire(RequestClass.SMALL_BAR_HISTORICAL, 'IBM')
+        thread = threading.Thread(target=scheduler.acquire, args=(RequestClass.SMALL_BAR_HISTORICAL, 'IBM'))
+        thread.daemon = True
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(scheduler.queue_length(), 1)
+        started = time.time()
+        scheduler.acquire(RequestClass.SMALL_BAR_HISTORICAL, 'AAPL')
+        scheduler.acquire(RequestClass.ORDER)
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual(scheduler.queue_length(), 1)
+
+    def test_realtime_bars(self):
+        req_id, bars = self.con.request_realtime_price(self.stock, bar_sizes=['1 min'])
+        time.sleep(0.5)
+        self.assertGreater(len(bars), 12)
+        self.assertGreater(len(self.con.get_realtime_bars(req_id, '1 min')), 0)
+        self.con.cancel_realtime_price(req_id)
+
+    def test_bar_aggregator_alignment(self):
+        def feed(aggregator, start, count, step):
+            for i in range(count):
+                aggregator.update(ns(start) + i * step * NS_PER_SEC, 10., 11., 9., 10.5, 1)
+
+        def ns(value):
+            return int(pd.Timestamp(value, tz='UTC').value)
+
+        # India is UTC+5:30, so hour bars start at half past the UTC hour
+        aggregator = BarAggregator(['1 hour'], tz_name='Asia/Kolkata')
+        feed(aggregator, '2026-10-16 03:30', 2 * 720, 5)
+        self.assertEqual(list(aggregator.bars['1 hour'].column('time')),
+                         [ns('2026-10-16 03:30'), ns('2026-10-16 04:30')])
+
+        # day bars run from midnight to midnight in the exchange timezone; 1 Nov 2026 has 25 hours in New York
+        aggregator = BarAggregator(['1 day'], source_bar_size='1 hour', tz_name='US/Eastern')
+        feed(aggregator, '2026-11-01 04:00', 25 + 24, 3600)
+        self.assertEqual(list(aggregator.bars['1 day'].column('time')),
+                         [ns('2026-11-01 04:00'), ns('2026-11-02 05:00')])
+        self.assertEqual(list(aggregator.bars['1 day'].column('volume')), [25, 24])
+
+        self.assertRaises(ValueError, BarAggregator, ['7 hours'])
+
+    def test_ring_buffer_views(self):
+        bars = BarRingBuffer(4)
+        for i in range(6):
+            bars.append(i, i, i, i, i, i)
+        view = bars.column('close')
+        df = bars.to_frame()
+        self.assertEqual(list(view), [2, 3, 4, 5])
+
+        # a full view is not touched by the next record, and a frame never changes
+        bars.append(6, 6, 6, 6, 6, 6)
+        self.assertEqual(list(view), [2, 3, 4, 5])
+        self.assertEqual(list(bars.column('close')), [3, 4, 5, 6])
+        for i in range(7, 10):
+            bars.append(i, i, i, i, i, i)
+        self.assertEqual(list(df['close']), [2, 3, 4, 5])
+        self.assertEqual(list(bars), [(i, i, i, i, i, i) for i in range(6, 10)])
+
+    def test_registry_cancelled_future(self):
+        # the caller may cancel a future, e.g. on a timeout, while the reader thread is building its result
+        registry = RequestRegistry()
+        futures = []
+
+        def finish(response):
+            futures[0].cancel()
+            return response
+
+        futures.append(registry.register(1, RequestDetails('reqHistoricalData'), ResponseDetails(), finish=finish))
+        registry.finish(1)
+        self.assertTrue(futures[0].cancelled())
+        self.assertEqual(len(registry), 0)
+
+    def test_contract_details(self):
+        status, details = self.con.get_contract_details(self.stock)
+        self.assertEqual(details.m_summary.m_symbol, 'IBM')
+        self.assertEqual(details.m_summary.m_conId, self.server.con_id('IBM'))
+
+        status, details = self.con.get_contract_details(new_stock_contract('BAD'))
+        self.assertEqual(status, 200)
+        self.assertIsNone(details)
+
+    def test_fundamental_data(self):
+        self.server.fundamentals['ReportsFinStatements'] = '<ReportsFinStatements/>'
+        status, data = self.con.get_financial_statements('IBM')
+        self.assertEqual(data, '<ReportsFinStatements/>')
+
+    def test_generic_tick(self):
+        self.assertEqual(self.con.get_financial_ratios('IBM'), self.server.fin_ratios)
+        # the subscription is cancelled from another thread than the socket reader
+        time.sleep(0.1)
+        self.assertEqual(len(self.server.requests('cancel')), 1)
+
+    def test_async_client(self):
+        async def main():
+            client = AsyncIBClient(self.con, max_workers=2)
+            symbols = ['S%03d' % i for i in range(20)]
+            snapshots = await asyncio.gather(*[client.get_tick_snapshot(symbol) for symbol in symbols])
+            for symbol, snapshot in zip(symbols, snapshots):
+                self.assertEqual(snapshot['lastPrice'], self.server.quote(symbol)[4])
+            df = await client.get_price_history(self.stock, '20261016 00:00:00', '3600 S', 'minute')
+            self.assertEqual(len(df), 60)
+
+            # the client can connect again after disconnect()
+            await client.disconnect()
+            self.assertFalse(client.connected)
+            self.assertTrue(await client.connect())
+            snapshot = await client.get_tick_snapshot(self.stock)
+            self.assertEqual(snapshot['lastPrice'], self.server.quote('IBM')[4])
+
+        asyncio.run(main())
+        self.assertEqual(len(self.con.ipc_msg_dict), 0)
+
+    def test_order(self):
+        order_id = self.con.order_amount(self.stock, 100, style=LimitOrder(100.))
+        time.sleep(0.3)
+        self.assertEqual(self.server.requests('placeOrder')[0]['order']['totalQuantity'], 100)
+        self.assertEqual(self.con.order_history[(7, order_id)]['order_exec_obj'].status, 'Filled')
+
+    def test_order_handle(self):
+        fills = []
+        handle = self.con.place_order(self.stock, -100, style=LimitOrder(100.))
+        handle.on_fill(lambda h: fills.append(h.filled))
+        self.assertTrue(handle.wait_filled(5))
+        self.assertEqual([status for _, status in handle.transitions], ['PendingSubmit', 'Submitted', 'Filled'])
+        self.assertEqual(fills, [100.])
+        self.assertEqual(self.con.get_order_status(handle.order_id), 'Filled')
+        self.assertIs(self.con.get_order_handle(handle.order_id), handle)
+        handle.update('Cancelled', 100, 0, 100., 100.)
+        self.assertEqual(handle.status, 'Filled')
+
+        handle = self.con.place_order(self.stock, 100)
+        self.assertTrue(asyncio.run(handle.wait_filled_async(5)))
+
+    def test_modify_order(self):
+        handle = self.con.place_order(self.stock, 100, style=LimitOrder(100.))
+        self.assertEqual(self.con.modify_order(handle.order_id, self.stock, -50, style=LimitOrder(99.5)),
+                         handle.order_id)
+        time.sleep(0.1)
+        order = self.server.requests('placeOrder')[-1]['order']
+        self.assertEqual((order['action'], order['totalQuantity'], order['orderType'], float(order['lmtPrice'])),
+                         ('SELL', 50, 'LMT', 99.5))
+        self.assertEqual(handle.amount, -50)
+
+    def test_order_latency(self):
+        handle = self.con.place_order(self.stock, 100)
+        self.assertTrue(handle.wait_filled(5))
+        time.sleep(0.1)
+        stages = self.con.get_order_latency(handle.order_id)
+        self.assertEqual(list(stages), ['id_allocated', 'place_sent', 'status:Submitted', 'exec_details',
+                                        'status:Filled', 'commission_report'])
+        self.assertGreaterEqual(stages['status:Filled'], 50.)
+
+        stats = self.con.get_order_latency_stats()
+        self.assertEqual(stats.loc['status:Filled', 'count'], 1)
+        self.assertLessEqual(stats.loc['status:Filled', 'p50'], stages['status:Filled'])
+
+    def test_fills(self):
+        basket = self.con.order_basket([(self.stock, 100, LimitOrder(100.)), (self.stock, -50, LimitOrder(101.))])
+        self.assertTrue(basket.wait(5))
+        time.sleep(0.1)
+        df = self.con.get_fills().sort_values('order_id')
+        self.assertEqual(list(df['signed_shares']), [100., -50.])
+        self.assertEqual(list(df['commission']), [0.5, 0.25])
+
+        status, df = self.con.get_executions()
+        self.assertEqual(len(df), 2)
+        summary = self.con.fills.order_summary()
+        self.assertEqual(list(summary['vwap']), [100., 101.])
+
+    def test_portfolio(self):
+        self.server.quotes['IBM'] = {1: 99.99, 2: 100.01, 4: 100.}
+        self.assertTrue(self.con.place_order(self.stock, 100).wait_filled(5))
+        self.assertTrue(self.con.place_order(new_stock_contract('AAPL'), -10).wait_filled(5))
+
+        self.con.setup_account('DU000001', 1000000.)
+        self.assertTrue(self.con.wait_portfolio_ready(5))
+        self.assertEqual(self.con.portfolio.portfolio_value, 1000000.)
+        snapshot = self.con.get_account_snapshot()
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(snapshot.net_liquidation, 1000000.)
+        self.assertEqual(snapshot.currency_values['USD']['TotalCashValue'], 1000000.)
+        df = self.con.portfolio.position_frame()
+        self.assertEqual(list(df['symbol']), ['IBM', 'AAPL'])
+        self.assertEqual(list(df['amount']), [100., -10.])
+        self.assertEqual(df.loc[self.server.con_id('IBM'), 'market_value'], 10000.)
+        self.assertEqual(list(self.con.portfolio.amounts(['AAPL', 'MSFT', 'IBM'])), [-10, 0, 100])
+
+        df = self.con.request_positions()
+        self.assertEqual(list(df['amount']), [100., -10.])
+
+    def test_futures_positions(self):
+        self.con.setup_account('DU000001', 1000000.)
+        portfolio = self.con.portfolio
+        contracts = []
+        for con_id, local_symbol, amount, price in ((1001, 'ESZ6', 5, 6000.), (1002, 'ESH7', -2, 6050.)):
+            contract = new_futures_contract('ES', 'CME', False, local_symbol[-2:], contract_id=con_id)
+            contract.m_localSymbol = local_symbol
+            portfolio.update_positions(Portfolio.position_symbol(contract), contract, amount, price,
+                                       50 * amount * price, price, 0., 0., 'DU000001')
+            contracts.append(contract)
+
+        self.assertEqual(list(self.con._position_amounts(contracts)), [5, -2])
+        self.assertEqual(list(self.con._order_prices(contracts)), [6000., 6050.])
+        self.assertEqual(list(portfolio.amounts(['ESZ6', 'ESH7'])), [5, -2])
+        self.assertEqual(self.con.order_target(contracts[0], 5), -1)
+        # a contract without conId is looked up by the key it is stored under
+        self.assertEqual(list(self.con._position_amounts([new_futures_contract('ESH7', 'CME', True)])), [-2])
+
+        # contracts sharing a symbol are told apart by conId only
+        table = PositionTable()
+        for con_id, amount in ((1001, 5), (1002, -2)):
+            table.update(con_id, 'ES', contracts[0], amount)
+        self.assertEqual(list(table.lookup('amount', [1002, 1001, 1003], 0.)), [-2., 5., 0.])
+        self.assertRaises(ValueError, table.lookup, 'amount', ['ES'], 0.)
+
+    def test_account_summary(self):
+        self.assertEqual(self.con.get_managed_accounts(), ['DU000001'])
+
+        self.server.accounts.append('DU000002')
+        req_id, table = self.con.request_account_summary(['NetLiquidation', 'BuyingPower', 'Cushion'])
+        self.assertTrue(table.ready.is_set())
+        df = table.to_frame()
+        self.assertEqual(list(df.index), ['DU000001', 'DU000002'])
+        self.assertEqual(list(df['NetLiquidation']), [1000000., 1000000.])
+        self.assertEqual(table.total('NetLiquidation', 'USD'), 2000000.)
+
+        self.con.wrapper.accountSummary(req_id, 'DU000002', 'NetLiquidation', '500000.00', 'USD')
+        self.assertEqual(table.total('NetLiquidation'), 1500000.)
+        self.assertEqual(table.totals()[('BuyingPower', 'USD')], 8000000.)
+        self.con.cancel_account_summary(req_id)
+
+    def test_order_ids(self):
+        first = self.con.order_amount(self.stock, 100, style=LimitOrder(100.))
+        second = self.con.order_amount(self.stock, -100, style=LimitOrder(100.))
+        self.assertEqual(second, first + 1)
+        self.assertEqual(self.server.requests('reqIds'), [])
+
+        # an order ID error makes the next order resync with TWS
+        self.con.wrapper.error(second, 103, 'Duplicate order id')
+        third = self.con.order_amount(self.stock, 100, style=LimitOrder(100.))
+        self.assertEqual(len(self.server.requests('reqIds')), 1)
+        self.assertGreater(third, second)
+
+    def test_order_basket(self):
+        orders = [(new_stock_contract('S%02d' % i), 100 if i % 2 else -100, LimitOrder(10.)) for i in range(20)]
+        orders.append((self.stock, 0))
+        basket = self.con.order_basket(orders)
+        self.assertEqual(len(basket), 20)
+        self.assertEqual(basket.order_ids, list(range(basket.order_ids[0], basket.order_ids[0] + 20)))
+
+        self.assertTrue(basket.wait(5))
+        self.assertEqual(basket.fill_ratio, 1.)
+        df = basket.to_frame()
+        self.assertEqual(list(df['filled']), [amount for _, amount, _ in orders[:20]])
+        self.assertEqual(set(df['status']), {'Filled'})
+
+    def test_order_target_weights(self):
+        portfolio = Portfolio('DU000001', 100000.)
+        portfolio.account.net_liquidation = 100000.
+        for symbol, amount, price in (('AAA', 100, 50.), ('BBB', -200, 20.)):
+            contract = new_stock_contract(symbol)
+            portfolio.update_positions(symbol, contract, amount, price, amount * price, price, 0., 0., 'DU000001')
+        self.con.portfolio = portfolio
+
+        contracts = [new_stock_contract(symbol) for symbol in ('AAA', 'BBB', 'CCC')]
+        with self.assertRaises(ValueError):
+            self.con.order_target_weights(contracts, [0.1, 0., 0.2])
+
+        basket = self.con.order_target_weights(contracts, [0.1, 0., 0.2], prices=[np.nan, np.nan, 30.])
+        self.assertEqual(list(basket.to_frame()['amount']), [100, 200, 666])
+        self.assertTrue(basket.wait(5))
+
+        self.assertEqual(self.con.order_target(contracts[0], 100), -1)
+        self.con.order_value(contracts[2], -1000., price=30.)
+        time.sleep(0.1)
+        self.assertEqual(self.server.requests('placeOrder')[-1]['order']['totalQuantity'], 33)
+
+
+if __name__ == "__main__":
+    unittest.main()